@@ -1,100 +1,150 @@
-import http.client
-import ssl
-import urllib.parse
-import json
-from datetime import datetime, timedelta
-
-def log_step(workflow_logs, vdc_name, step_name, status, details):
-    workflow_logs.append({
-        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
-        "vdc_name": vdc_name,
-        "step": step_name,
-        "status": status,
-        "details": details
-    })
-
-def handler(context, inputs):
-    workflow_logs = inputs.get("workflow_logs")
-    VEEAM_URL = inputs.get("vem_url")
-    vdc_name = inputs.get("VDC_name")
-    token = inputs.get("Token")
-    job_id = inputs.get("job_id")
-    missing_vms = inputs.get("missingVMs")  # Input containing list of VMs deleted from vCloud
-
-    print("Connected to Veeam Enterprise Manager!(to remove vCloud deleted VMs)")
-    
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "X-RestSvcSessionId": token
-    }
-    parsed_url = urllib.parse.urlparse(VEEAM_URL)
-    # Parse missing_vms if it's a JSON string
-    if isinstance(missing_vms, str):
-        try:
-            missing_vms = json.loads(missing_vms)
-        except json.JSONDecodeError as e:
-            log_step(workflow_logs, vdc_name, "Parse missingVMs", "failure", f"Error parsing missingVMs: {str(e)}")
-            raise Exception(f"Error parsing missingVMs: {str(e)}")
-    
-    if not missing_vms or not isinstance(missing_vms, list):
-        log_step(workflow_logs, vdc_name, "Check Missing VMs", "success", "No vCloud deleted VMs provided to delete")
-        return {"workflow_logs": workflow_logs}
-    
-    log_step(workflow_logs, vdc_name, "Check Missing VMs", "success", f"Found {len(missing_vms)} vCloud deleted VMs to remove")
-    # Fetch current VMs in the job to get ObjectInJobId
-    conn = http.client.HTTPSConnection(parsed_url.hostname, parsed_url.port, context=ssl._create_unverified_context(),timeout=10)
-    try:
-        job_vm_url = f"/api/jobs/{job_id}/includes"
-        conn.request("GET", job_vm_url, headers=headers)
-        response = conn.getresponse()
-        
-        if response.status != 200:
-            error_msg = f"Failed to fetch VMs from job {job_id}: {response.status} - {response.read().decode()}"
-            log_step(workflow_logs, vdc_name, "Fetch Job VMs", "failure", error_msg)
-            raise Exception(error_msg)
-        
-        job_vms_data = json.loads(response.read().decode())
-        job_vms = {vm["HierarchyObjRef"].split(".")[-1]: vm for vm in job_vms_data.get("ObjectInJobs")}
-        log_step(workflow_logs, vdc_name, "Fetch Job VMs", "success", f"Retrieved {len(job_vms)} VMs from job {job_id}")
-    except Exception as e:
-        log_step(workflow_logs, vdc_name, "Fetch Job VMs", "failure", str(e))
-        raise e
-    finally:
-        conn.close()
-    # Delete vCloud deleted VMs from the job
-    removed_vms = []
-    failed_vms = []
-    
-    for missing_vm in missing_vms:
-        vm_id = missing_vm.get("id")  # Extract full urn
-        job_vm = job_vms.get(vm_id)
-        if not job_vm:
-            failed_vms.append(missing_vm["name"])
-            print(f"VM {missing_vm['name']} (ID: {vm_id}) not found in job, skipping deletion")
-            continue
-        
-        delete_url = f"/api/jobs/{job_id}/includes/{job_vm['ObjectInJobId']}"
-        conn = http.client.HTTPSConnection(parsed_url.hostname, parsed_url.port, context=ssl._create_unverified_context(),timeout=10)
-        try:
-            conn.request("DELETE", delete_url, headers=headers)
-            delete_response = conn.getresponse() 
-            if delete_response.status == 202:
-                removed_vms.append(missing_vm["name"])
-                print(f"Removing VM {missing_vm['name']} (ID: {vm_id}) - Status: {delete_response.status}")
-            else:
-                failed_vms.append(missing_vm["name"])
-                print(f"Failed to remove VM {missing_vm['name']} (ID: {vm_id}) - Status: {delete_response.status}, Response: {delete_response.read().decode()}")
-        except Exception as e:
-            failed_vms.append(missing_vm["name"])
-            print(f"Error removing VM {missing_vm['name']} (ID: {vm_id}): {str(e)}")
-        finally:
-            conn.close()
-    log_details = {
-        "total_vms_processed": len(missing_vms),
-        "vms_removed": removed_vms,
-        "vms_failed": failed_vms
-    }
-    status = "success" if not failed_vms else "partial_success"
-    log_step(workflow_logs, vdc_name, "Remove vCloud Deleted VMs", status, log_details)
-    return {"workflow_logs": workflow_logs}
\ No newline at end of file
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from vro_common import http_pool, inventory, ownership, rate_limit, retry, vbr
+
+DEFAULT_DELETE_CONCURRENCY = 4
+MAX_THROTTLE_RETRIES = 3
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "vdc_name": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def delete_include(url, headers, missing_vm, limiter):
+    vm_id = missing_vm.get("id")
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        limiter.acquire()
+        started = time.monotonic()
+        try:
+            delete_response = http_pool.request("DELETE", url, headers=headers, policy=retry.errors_only_policy())
+        except Exception as e:
+            limiter.on_error()
+            return False, f"Error removing VM {missing_vm['name']} (ID: {vm_id}): {str(e)}"
+        response_data = delete_response.read().decode()
+
+        if delete_response.status == 202:
+            limiter.on_success(time.monotonic() - started)
+            return True, f"Removing VM {missing_vm['name']} (ID: {vm_id}) - Status: {delete_response.status}"
+        limiter.on_error(delete_response.status, delete_response.getheader("Retry-After"))
+        if delete_response.status not in rate_limit.THROTTLE_STATUSES:
+            break
+    return False, f"Failed to remove VM {missing_vm['name']} (ID: {vm_id}) - Status: {delete_response.status}, Response: {response_data}"
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs")
+    VEEAM_URL = inputs.get("vem_url")
+    vdc_name = inputs.get("VDC_name")
+    token = inputs.get("Token")
+    job_id = inputs.get("job_id")
+    missing_vms = inputs.get("missingVMs")  # Input containing list of VMs deleted from vCloud
+
+    print("Connected to Veeam Enterprise Manager!(to remove vCloud deleted VMs)")
+    
+    headers = {
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+        "X-RestSvcSessionId": token
+    }
+    vem_origin = http_pool.origin(VEEAM_URL)
+    # Parse missing_vms if it's a JSON string
+    if isinstance(missing_vms, str):
+        try:
+            missing_vms = json.loads(missing_vms)
+        except json.JSONDecodeError as e:
+            log_step(workflow_logs, vdc_name, "Parse missingVMs", "failure", f"Error parsing missingVMs: {str(e)}")
+            raise Exception(f"Error parsing missingVMs: {str(e)}")
+    
+    if not missing_vms or not isinstance(missing_vms, list):
+        log_step(workflow_logs, vdc_name, "Check Missing VMs", "success", "No vCloud deleted VMs provided to delete")
+        return {"workflow_logs": workflow_logs, "vm_ownership_index": inputs.get("vm_ownership_index")}
+    
+    log_step(workflow_logs, vdc_name, "Check Missing VMs", "success", f"Found {len(missing_vms)} vCloud deleted VMs to remove")
+    # Fetch current VMs in the job to get ObjectInJobId (never a cached copy, as these ids are deleted next)
+    try:
+        job_vm_url = f"/api/jobs/{job_id}/includes"
+        response = http_pool.request("GET", f"{vem_origin}{job_vm_url}", headers=headers, cached=False)
+        
+        if response.status != 200:
+            error_msg = f"Failed to fetch VMs from job {job_id}: {response.status} - {response.read().decode()}"
+            log_step(workflow_logs, vdc_name, "Fetch Job VMs", "failure", error_msg)
+            raise Exception(error_msg)
+        
+        job_vms_data = json.loads(response.read().decode())
+        job_vms = {vm["HierarchyObjRef"].split(".")[-1]: vm for vm in job_vms_data.get("ObjectInJobs")}
+        log_step(workflow_logs, vdc_name, "Fetch Job VMs", "success", f"Retrieved {len(job_vms)} VMs from job {job_id}")
+    except Exception as e:
+        log_step(workflow_logs, vdc_name, "Fetch Job VMs", "failure", str(e))
+        raise e
+    # Delete vCloud deleted VMs from the job
+    index = ownership.OwnershipIndex.from_value(inputs.get("vm_ownership_index"))
+    results = {}
+    to_delete = []
+    for position, missing_vm in enumerate(missing_vms):
+        vm_id = missing_vm.get("id")  # Extract full urn
+        if vm_id not in job_vms:
+            results[position] = (False, f"VM {missing_vm['name']} (ID: {vm_id}) not found in job, skipping deletion")
+        else:
+            to_delete.append(position)
+
+    # Remove them all with a single VBR job update when asked to (bulk_include_update)
+    # and VBR is available
+    vbr_url = inputs.get("vbr_url")
+    vbr_token = inputs.get("Token_VBR")
+    if to_delete and vbr_url and vbr_token and inputs.get("bulk_include_update"):
+        try:
+            _, removed_ids = vbr.update_job_includes(vbr_url, vbr_token, vbr.job_id_from_uid(job_id), remove_vm_ids=[missing_vms[position]["id"] for position in to_delete])
+            removed_keys = {vm_id.lower() for vm_id in removed_ids}
+            for position in to_delete:
+                missing_vm = missing_vms[position]
+                if missing_vm["id"].lower() in removed_keys:
+                    results[position] = (True, f"Removing VM {missing_vm['name']} (ID: {missing_vm['id']}) - Removed with a single VBR job update")
+            to_delete = [position for position in to_delete if position not in results]
+            log_step(workflow_logs, vdc_name, "Update Job Includes", "success", f"{len(removed_keys)} VMs removed from job {job_id} in one VBR update")
+        except Exception as e:
+            log_step(workflow_logs, vdc_name, "Update Job Includes", "warning", f"VBR job update failed, falling back to per-VM VEM deletes: {str(e)}")
+
+    # Otherwise one VEM delete per VM, concurrently under an adaptive rate limit
+    if to_delete:
+        limiter = rate_limit.AdaptiveRateLimiter(
+            initial_rate=inputs.get("delete_initial_rate") or 2.0,
+            max_rate=inputs.get("delete_max_rate") or 10.0
+        )
+        concurrency = inputs.get("delete_concurrency") or DEFAULT_DELETE_CONCURRENCY
+
+        def delete(position):
+            missing_vm = missing_vms[position]
+            delete_url = f"/api/jobs/{job_id}/includes/{job_vms[missing_vm['id']]['ObjectInJobId']}"
+            return delete_include(f"{vem_origin}{delete_url}", headers, missing_vm, limiter)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(int(concurrency), len(to_delete)))) as executor:
+            results.update(zip(to_delete, executor.map(delete, to_delete)))
+        print(f"Include removal rate stats: {limiter.stats}")
+
+    store = inventory.open_store() if inputs.get("use_inventory") else None
+    removed_vms = []
+    failed_vms = []
+    for position, missing_vm in enumerate(missing_vms):
+        removed, message = results[position]
+        if removed:
+            removed_vms.append(missing_vm["name"])
+            if index is not None:
+                index.remove(missing_vm["id"], job_id)
+            if store is not None:
+                store.remove_include(job_id, missing_vm["id"])
+        else:
+            failed_vms.append(missing_vm["name"])
+        print(message)
+    log_details = {
+        "total_vms_processed": len(missing_vms),
+        "vms_removed": removed_vms,
+        "vms_failed": failed_vms
+    }
+    status = "success" if not failed_vms else "partial_success"
+    log_step(workflow_logs, vdc_name, "Remove vCloud Deleted VMs", status, log_details)
+    return {"workflow_logs": workflow_logs, "vm_ownership_index": index.to_value() if index is not None else None}
\ No newline at end of file
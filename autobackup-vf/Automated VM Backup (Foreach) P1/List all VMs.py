@@ -1,132 +1,109 @@
-import http.client
-import urllib.parse
-import base64
-import ssl
-import json
-import re
-from datetime import datetime, timedelta
-
-def log_step(workflow_logs, vdc_name, step_name, status, details):
-    workflow_logs.append({
-        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
-        "vdc_name": vdc_name,
-        "step": step_name,
-        "status": status,
-        "details": details
-    })
-
-def fetch_all_pages(base_url, headers, vdc_name, step_name, workflow_logs):
-    page = 1
-    page_size = 30
-    all_items = []
-    
-    while True:
-        url = f"{base_url}?page={page}&pageSize={page_size}"
-        parsed_url = urllib.parse.urlparse(url)
-        conn = http.client.HTTPSConnection(parsed_url.hostname, context=ssl._create_unverified_context(),timeout=10)
-        try:
-            conn.request("GET", parsed_url.path + "?" + parsed_url.query, headers=headers)
-            response = conn.getresponse()
-            
-            if response.status != 200:
-                error_msg = f"Failed to fetch data: {response.status} {response.reason}"
-                log_step(workflow_logs, vdc_name, step_name, "failure", error_msg)
-                raise Exception(error_msg)
-            
-            data = json.loads(response.read().decode())
-            items = data.get("values", [])
-            all_items.extend(items)
-            
-            log_step(workflow_logs, vdc_name, step_name, "success", f"Fetched {len(items)} items on page {page}, total so far: {len(all_items)}")
-            
-            total_items = data.get("resultTotal")
-            if len(all_items) >= total_items or not items:
-                break
-                
-            page += 1
-        except Exception as e:
-            log_step(workflow_logs, vdc_name, step_name, "failure", f"Error fetching page {page}: {str(e)}")
-            raise e
-        finally:
-            conn.close()
-    
-    return all_items
-
-def handler(context, inputs):
-    workflow_logs = inputs.get("workflow_logs")
-    vcd_token = inputs.get("vCloud_token")
-    url = inputs.get("vCloud_ip")
-    vdc_name = inputs.get("VDC_name")
-    if not vcd_token:
-        error_msg = "No vCD token provided"
-        log_step(workflow_logs, vdc_name, "Authenticate with vCloud Director (Get VMs)", "failure", error_msg)
-        raise Exception(error_msg)
-    
-    log_step(workflow_logs, "N/A", "Authenticate with vCloud Director (Get VMs)", "success", "Using provided vCD token")
-    
-    headers = {"Accept": "application/json;version=39.0", "Authorization": f"Bearer {vcd_token}"}
-    
-    # Step 1: Fetch all compute policies and match by name pattern
-    pvdcCP_id = None
-    PVDC_Name = None
-    compute_policies_url = f"https://{url}/cloudapi/2.0.0/vdcComputePolicies"
-    compute_policies = fetch_all_pages(compute_policies_url, headers, vdc_name, "Fetch Compute Policies", workflow_logs)
-    pattern = f"^{re.escape(vdc_name)}.*defaultpolicy$"
-    for policy in compute_policies:
-        policy_id = policy.get("id")
-        policy_name = policy.get("description")
-        if policy_name is None:
-            continue
-        if re.match(pattern, policy_name.lower()):
-            pvdcCP_id = policy_id
-            PVDC_Name = policy_name
-            log_step(workflow_logs, vdc_name, "Find PVDC Compute Policy", "success", f"Matched compute policy '{policy_name}' (ID: {pvdcCP_id}) by name pattern")
-            break
-    # Step 2: If no match, check VDCs for each policy ending with defaultpolicy
-    if not pvdcCP_id:
-        for policy in compute_policies:
-            policy_id = policy.get("id")
-            policy_name = policy.get("description")
-            if policy_name is None:
-                continue
-            if not policy_name.lower().endswith("defaultpolicy"):
-                continue
-            compute_policy_vdcs_url = f"https://{url}/cloudapi/2.0.0/vdcComputePolicies/{policy_id}/vdcs"
-            parsed_url = urllib.parse.urlparse(compute_policy_vdcs_url)
-            conn = http.client.HTTPSConnection(parsed_url.hostname, context=ssl._create_unverified_context(),timeout=10)
-            try:
-                conn.request("GET", compute_policy_vdcs_url, headers=headers)
-                response = conn.getresponse()
-                
-                if response.status == 200:
-                    vdcs_data = json.loads(response.read().decode())
-                    for vdc in vdcs_data:
-                        vdc_name_from_api = vdc.get("name").lower()
-                        if vdc_name_from_api == vdc_name:
-                            pvdcCP_id = policy_id
-                            PVDC_Name = policy_name
-                            log_step(workflow_logs, vdc_name, "Find PVDC Compute Policy", "success", f"Matched compute policy '{policy_name}' (ID: {pvdcCP_id}) via VDC association")
-                            break
-                    if pvdcCP_id:
-                        break
-                else:
-                    log_step(workflow_logs, vdc_name, "Fetch VDCs for Compute Policy", "failure", f"Failed to get VDCs for policy {policy_name}: {response.status} {response.reason}")
-            except Exception as e:
-                log_step(workflow_logs, vdc_name, "Fetch VDCs for Compute Policy", "failure", f"Error fetching VDCs for policy {policy_name}: {str(e)}")
-            finally:
-                conn.close()
-    if not pvdcCP_id:
-        error_msg = f"No compute policy ending with 'defaultpolicy' found for VDC {vdc_name}"
-        log_step(workflow_logs, vdc_name, "Find PVDC Compute Policy", "failure", error_msg)
-        raise Exception(error_msg)
-    # Step 3: Fetch VMs for the matched compute policy dynamically
-    encoded_pvdcCP_id = urllib.parse.quote(pvdcCP_id)
-    vms_url = f"https://{url}/cloudapi/1.0.0/vdcComputePolicies/{encoded_pvdcCP_id}/vms"
-    vms = fetch_all_pages(vms_url, headers, vdc_name, "Fetch All VMs", workflow_logs)
-    if vms:
-        vm_list = [{"name": vm["name"], "id": vm["id"]} for vm in vms]
-        log_step(workflow_logs, vdc_name, "Get All VMs", "success", f"Retrieved {len(vm_list)} VMs for VDC {vdc_name}")
-    else:
-        vm_list = []
-        log_step(workflow_logs, vdc_name, "Get All VMs", "success", "No VMs found in VDC")
+import urllib.parse
+import base64
+import json
+import re
+from datetime import datetime, timedelta
+from vro_common import compute_policy, inventory, vcd, vm_sync
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "vdc_name": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def fetch_all_pages(base_url, headers, vdc_name, step_name, workflow_logs, page_size=None):
+    return vcd.fetch_all_pages(base_url, headers, log=lambda status, details: log_step(workflow_logs, vdc_name, step_name, status, details), page_size=page_size)
+
+def iter_all_items(base_url, headers, vdc_name, step_name, workflow_logs, page_size=None):
+    return vcd.iter_items(base_url, headers, log=lambda status, details: log_step(workflow_logs, vdc_name, step_name, status, details), page_size=page_size)
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs")
+    vcd_token = inputs.get("vCloud_token")
+    url = inputs.get("vCloud_ip")
+    vdc_name = inputs.get("VDC_name")
+    if not vcd_token:
+        error_msg = "No vCD token provided"
+        log_step(workflow_logs, vdc_name, "Authenticate with vCloud Director (Get VMs)", "failure", error_msg)
+        raise Exception(error_msg)
+    
+    log_step(workflow_logs, "N/A", "Authenticate with vCloud Director (Get VMs)", "success", "Using provided vCD token")
+    
+    headers = {"Accept": "application/json;version=39.0", "Authorization": f"Bearer {vcd_token}"}
+    
+    # Step 1: Fetch all compute policies and match by name pattern
+    pvdcCP_id = None
+    PVDC_Name = None
+    compute_policies_url = f"https://{url}/cloudapi/2.0.0/vdcComputePolicies"
+    compute_policies = fetch_all_pages(compute_policies_url, headers, vdc_name, "Fetch Compute Policies", workflow_logs, inputs.get("page_size"))
+    pattern = f"^{re.escape(vdc_name)}.*defaultpolicy$"
+    for policy in compute_policies:
+        policy_id = policy.get("id")
+        policy_name = policy.get("description")
+        if policy_name is None:
+            continue
+        if re.match(pattern, policy_name.lower()):
+            pvdcCP_id = policy_id
+            PVDC_Name = policy_name
+            log_step(workflow_logs, vdc_name, "Find PVDC Compute Policy", "success", f"Matched compute policy '{policy_name}' (ID: {pvdcCP_id}) by name pattern")
+            break
+    # Step 2: If no match, look the VDC up in the policy <-> VDC index of the policies ending with defaultpolicy
+    store = inventory.open_store() if inputs.get("use_inventory") else None
+    if not pvdcCP_id:
+        policy_index = compute_policy.PolicyVdcIndex(
+            url, headers, compute_policies,
+            log=lambda status, details: log_step(workflow_logs, vdc_name, "Fetch VDCs for Compute Policy", status, details),
+            store=store
+        )
+        match = policy_index.lookup(vdc_name)
+        if match:
+            pvdcCP_id, PVDC_Name = match
+            log_step(workflow_logs, vdc_name, "Find PVDC Compute Policy", "success", f"Matched compute policy '{PVDC_Name}' (ID: {pvdcCP_id}) via VDC association")
+    if not pvdcCP_id:
+        error_msg = f"No compute policy ending with 'defaultpolicy' found for VDC {vdc_name}"
+        log_step(workflow_logs, vdc_name, "Find PVDC Compute Policy", "failure", error_msg)
+        raise Exception(error_msg)
+    # Step 3: Take the VMs from the inventory built once by P3 or from a fresh
+    # inventory store entry, or fetch them for the matched compute policy dynamically
+    vm_inventory = inputs.get("vm_inventory")
+    if isinstance(vm_inventory, str):
+        vm_inventory = json.loads(vm_inventory)
+    vm_list = None
+    if vm_inventory and vdc_name.lower() in vm_inventory:
+        vm_list = [{"name": vm["name"], "id": vm["id"]} for vm in vm_inventory[vdc_name.lower()]]
+        log_step(workflow_logs, vdc_name, "Fetch All VMs", "success", f"Using {len(vm_list)} VMs from the run inventory")
+    elif inputs.get("inventory_sync") == "events":
+        # Replay the vCD audit trail on the VM list kept in the inventory store
+        sync = vm_sync.VmSync(
+            url, headers, inventory.open_store(),
+            log=lambda status, details: log_step(workflow_logs, vdc_name, "Sync VM Inventory", status, details),
+            page_size=inputs.get("page_size"),
+            max_events=inputs.get("max_sync_events") or vm_sync.DEFAULT_MAX_EVENTS,
+            full_resync_interval=inputs.get("full_resync_interval") or vm_sync.DEFAULT_FULL_RESYNC_INTERVAL
+        )
+        synced = sync.sync([vdc_name])
+        print(f"VM inventory sync stats: {sync.stats}")
+        # A VDC the query service does not find is listed through its compute policy below
+        if vdc_name.lower() in synced:
+            vm_list = synced[vdc_name.lower()]
+        else:
+            log_step(workflow_logs, vdc_name, "Sync VM Inventory", "warning", f"VDC {vdc_name} not found by the query service, listing the VMs of its compute policy")
+    elif store is not None and store.is_fresh(f"vms:{vdc_name.lower()}", inputs.get("vm_ttl") or inventory.DEFAULT_VM_TTL):
+        vm_list = store.vms(vdc_name)
+        log_step(workflow_logs, vdc_name, "Fetch All VMs", "success", f"Using {len(vm_list)} VMs from the inventory store")
+    if vm_list is None:
+        encoded_pvdcCP_id = urllib.parse.quote(pvdcCP_id)
+        vms_url = f"https://{url}/cloudapi/1.0.0/vdcComputePolicies/{encoded_pvdcCP_id}/vms"
+        # Stream the pages so only the name/id of each VM is kept in memory
+        vms = iter_all_items(vms_url, headers, vdc_name, "Fetch All VMs", workflow_logs, inputs.get("page_size"))
+        vm_list = [{"name": vm["name"], "id": vm["id"]} for vm in vms]
+        if store is not None:
+            store.replace_vms(vdc_name, vm_list)
+    if vm_list:
+        log_step(workflow_logs, vdc_name, "Get All VMs", "success", f"Retrieved {len(vm_list)} VMs for VDC {vdc_name}")
+    else:
+        log_step(workflow_logs, vdc_name, "Get All VMs", "success", "No VMs found in VDC")
     return {"workflow_logs": workflow_logs, "vms_list": vm_list, "PVDC_name": PVDC_Name,"VDC_name":vdc_name}
\ No newline at end of file
@@ -1,111 +1,169 @@
-import http.client
-import ssl
-import urllib.parse
-import json
-import base64
-import time
-from datetime import datetime, timedelta
-
-def log_step(workflow_logs, vdc_name, step_name, status, details):
-    workflow_logs.append({
-        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
-        "vdc_name": vdc_name,
-        "step": step_name,
-        "status": status,
-        "details": details
-    })
-
-def handler(context, inputs):
-    workflow_logs = inputs.get("workflow_logs")
-    VEEAM_URL = inputs.get("vem_url")
-    headers = {"Accept": "application/json", "Content-Type": "application/json"}
-    vdc_name = inputs.get("VDC_name")
-    print("Connected to Veeam Enterprise Manager!(For 'Add VM to Job' Script)")
-    token = inputs['Token']
-    headers["X-RestSvcSessionId"] = token
-    
-    parsed_url1 = urllib.parse.urlparse(VEEAM_URL)
-    conn = http.client.HTTPSConnection(parsed_url1.hostname, parsed_url1.port, context=ssl._create_unverified_context(),timeout=10)
-    
-    # Step 1: Retrieve Hierarchy Roots
-    try:
-        conn.request("GET", "/api/hierarchyRoots", headers=headers)
-        response = conn.getresponse()
-
-        if response.status != 200:
-            error_msg = f"Failed to retrieve hierarchy roots: {response.status} - {response.read().decode()}"
-            log_step(workflow_logs, vdc_name, "Retrieve Hierarchy Roots", "failure", error_msg)
-            conn.close()
-            raise Exception(error_msg)
-
-        hierarchy_roots = json.loads(response.read().decode())
-        log_step(workflow_logs, vdc_name, "Retrieve Hierarchy Roots", "success", "Hierarchy roots retrieved successfully")
-    except Exception as e:
-        log_step(workflow_logs, vdc_name, "Retrieve Hierarchy Roots", "failure", str(e))
-        raise e
-    finally:
-        conn.close()
-
-    # Step 2: Find the Hierarchy Root ID for "portal-cloud.com"
-    hierarchy_root_id = None
-    for root in hierarchy_roots["Refs"]:
-        if root["Name"] == "portal-dr.focus-multicloud.com":
-            hierarchy_root_id = root["UID"]
-            break
-
-    if not hierarchy_root_id:
-        error_msg = "Hierarchy Root ID for 'portal-cloud.com' not found!"
-        log_step(workflow_logs, vdc_name, "Find Hierarchy Root ID", "failure", error_msg)
-        raise Exception(error_msg)
-
-    log_step(workflow_logs, vdc_name, "Find Hierarchy Root ID", "success", f"Hierarchy Root ID found: {hierarchy_root_id}")
-
-    # Step 3: Read the backup job ID
-    backup_job_id = inputs.get("job_id")
-    if not backup_job_id:
-        error_msg = "Backup job ID not provided!"
-        log_step(workflow_logs, vdc_name, "Read Backup Job ID", "failure", error_msg)
-        raise Exception(error_msg)
-    
-    log_step(workflow_logs, vdc_name, "Read Backup Job ID", "success", f"Backup job ID: {backup_job_id}")
-
-    # Load VM list
-    vm_list = inputs.get("filtered_vms")
-    if not vm_list:
-        log_step(workflow_logs, vdc_name, "Load VM List", "success", "No VMs to add to the job")
-        return {"workflow_logs": workflow_logs}
-
-    # Step 4: Add each VM to the backup job
-    added_vms = []
-    failed_vms = []
-    for vm in vm_list:
-        hierarchy_obj_ref = f"urn:vCloud:Vm:{hierarchy_root_id.split(':')[-1]}.{vm['id']}"
-        payload = {"HierarchyObjRef": hierarchy_obj_ref, "HierarchyObjName": vm['name']}
-        json_payload = json.dumps(payload)
-        endpoint = f"/api/jobs/{backup_job_id}/includes"
-
-        conn = http.client.HTTPSConnection(parsed_url1.hostname, parsed_url1.port, context=ssl._create_unverified_context(),timeout=10)
-        try:
-            conn.request("POST", endpoint, body=json_payload, headers=headers)
-            response = conn.getresponse()
-            response_data = response.read().decode()
-
-            if response.status == 202:
-                added_vms.append(vm['name'])
-                print(f"VM {vm['name']} added with status: {response.status}")
-            else:
-                failed_vms.append(vm['name'])
-                print(f"Failed to add VM {vm['name']} - Status: {response.status}, Response: {response_data}")
-            time.sleep(1)
-        except Exception as e:
-            failed_vms.append(vm['name'])
-            print(f"Error adding VM {vm['name']}: {str(e)}")
-        finally:
-            conn.close()
-
-    # Log the results of adding VMs
-    log_details = {"total_vms_processed": len(vm_list), "vms_added": added_vms, "vms_failed": failed_vms}
-    status = "success" if not failed_vms else "partial_success"
-    log_step(workflow_logs, vdc_name, "Add VMs to Job", status, log_details)
-
-    return {"workflow_logs": workflow_logs}
\ No newline at end of file
+import json
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from vro_common import http_pool, inventory, ownership, rate_limit, retry, tasks, vbr
+
+DEFAULT_SUBMIT_CONCURRENCY = 4
+MAX_THROTTLE_RETRIES = 3
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "vdc_name": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def submit_include(url, headers, vm, hierarchy_root_id, limiter):
+    hierarchy_obj_ref = f"urn:vCloud:Vm:{hierarchy_root_id.split(':')[-1]}.{vm['id']}"
+    payload = {"HierarchyObjRef": hierarchy_obj_ref, "HierarchyObjName": vm['name']}
+    json_payload = json.dumps(payload)
+
+    for attempt in range(MAX_THROTTLE_RETRIES + 1):
+        limiter.acquire()
+        started = time.monotonic()
+        try:
+            response = http_pool.request("POST", url, headers=headers, body=json_payload, policy=retry.errors_only_policy())
+        except Exception as e:
+            limiter.on_error()
+            return False, f"Error adding VM {vm['name']}: {str(e)}", None
+        response_data = response.read().decode()
+
+        if response.status == 202:
+            limiter.on_success(time.monotonic() - started)
+            try:
+                task_id = json.loads(response_data).get("TaskId")
+            except ValueError:
+                task_id = None
+            return True, f"VM {vm['name']} added with status: {response.status}", task_id
+        limiter.on_error(response.status, response.getheader("Retry-After"))
+        # Throttled requests were not processed by VEM, send them again once the limiter backed off
+        if response.status not in rate_limit.THROTTLE_STATUSES:
+            break
+    return False, f"Failed to add VM {vm['name']} - Status: {response.status}, Response: {response_data}", None
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs")
+    VEEAM_URL = inputs.get("vem_url")
+    headers = {"Accept": "application/json", "Content-Type": "application/json"}
+    vdc_name = inputs.get("VDC_name")
+    print("Connected to Veeam Enterprise Manager!(For 'Add VM to Job' Script)")
+    token = inputs['Token']
+    headers["X-RestSvcSessionId"] = token
+    vem_origin = http_pool.origin(VEEAM_URL)
+    
+    # Step 1: Retrieve Hierarchy Roots
+    try:
+        response = http_pool.request("GET", f"{vem_origin}/api/hierarchyRoots", headers=headers)
+
+        if response.status != 200:
+            error_msg = f"Failed to retrieve hierarchy roots: {response.status} - {response.read().decode()}"
+            log_step(workflow_logs, vdc_name, "Retrieve Hierarchy Roots", "failure", error_msg)
+            raise Exception(error_msg)
+
+        hierarchy_roots = json.loads(response.read().decode())
+        log_step(workflow_logs, vdc_name, "Retrieve Hierarchy Roots", "success", "Hierarchy roots retrieved successfully")
+    except Exception as e:
+        log_step(workflow_logs, vdc_name, "Retrieve Hierarchy Roots", "failure", str(e))
+        raise e
+
+    # Step 2: Find the Hierarchy Root ID for "portal-cloud.com"
+    hierarchy_root_id = None
+    for root in hierarchy_roots["Refs"]:
+        if root["Name"] == "portal-dr.focus-multicloud.com":
+            hierarchy_root_id = root["UID"]
+            break
+
+    if not hierarchy_root_id:
+        error_msg = "Hierarchy Root ID for 'portal-cloud.com' not found!"
+        log_step(workflow_logs, vdc_name, "Find Hierarchy Root ID", "failure", error_msg)
+        raise Exception(error_msg)
+
+    log_step(workflow_logs, vdc_name, "Find Hierarchy Root ID", "success", f"Hierarchy Root ID found: {hierarchy_root_id}")
+
+    # Step 3: Read the backup job ID
+    backup_job_id = inputs.get("job_id")
+    if not backup_job_id:
+        error_msg = "Backup job ID not provided!"
+        log_step(workflow_logs, vdc_name, "Read Backup Job ID", "failure", error_msg)
+        raise Exception(error_msg)
+    
+    log_step(workflow_logs, vdc_name, "Read Backup Job ID", "success", f"Backup job ID: {backup_job_id}")
+
+    # Load VM list
+    vm_list = inputs.get("filtered_vms")
+    if not vm_list:
+        log_step(workflow_logs, vdc_name, "Load VM List", "success", "No VMs to add to the job")
+        return {"workflow_logs": workflow_logs, "vm_ownership_index": inputs.get("vm_ownership_index")}
+
+    # Step 4: Add the VMs with a single VBR job update when asked to (bulk_include_update)
+    # and VBR is available; the whole job is written back, see vbr.update_job_includes
+    results = None
+    vbr_url = inputs.get("vbr_url")
+    vbr_token = inputs.get("Token_VBR")
+    if vbr_url and vbr_token and inputs.get("bulk_include_update"):
+        try:
+            added_ids, _ = vbr.update_job_includes(vbr_url, vbr_token, vbr.job_id_from_uid(backup_job_id), add_vms=vm_list)
+            results = [(True, f"VM {vm['name']} added with a single VBR job update", None) for vm in vm_list]
+            log_step(workflow_logs, vdc_name, "Update Job Includes", "success", f"{len(added_ids)} new VMs written to job {backup_job_id} in one VBR update")
+        except Exception as e:
+            log_step(workflow_logs, vdc_name, "Update Job Includes", "warning", f"VBR job update failed, falling back to per-VM VEM includes: {str(e)}")
+
+    # Otherwise one VEM include per VM, concurrently under an adaptive rate limit
+    if results is None:
+        endpoint = f"/api/jobs/{backup_job_id}/includes"
+        limiter = rate_limit.AdaptiveRateLimiter(
+            initial_rate=inputs.get("include_initial_rate") or 2.0,
+            max_rate=inputs.get("include_max_rate") or 10.0
+        )
+        concurrency = inputs.get("include_concurrency") or DEFAULT_SUBMIT_CONCURRENCY
+        with ThreadPoolExecutor(max_workers=max(1, min(int(concurrency), len(vm_list)))) as executor:
+            results = list(executor.map(lambda vm: submit_include(f"{vem_origin}{endpoint}", headers, vm, hierarchy_root_id, limiter), vm_list))
+        print(f"Include submission rate stats: {limiter.stats}")
+
+    # A 202 only means VEM accepted the include: wait for its task when asked to
+    if inputs.get("track_tasks"):
+        def on_complete(state):
+            position = state["context"]
+            if state["state"] == tasks.FINISHED and state["success"]:
+                return
+            vm = vm_list[position]
+            reason = state["message"] if state["state"] == tasks.FINISHED else f"{state['state']}: {state['message']}"
+            results[position] = (False, f"Failed to add VM {vm['name']} - Task {state['task_id']}: {reason}", state["task_id"])
+
+        tracker = tasks.TaskTracker(
+            vem_origin, headers,
+            request_budget=inputs.get("task_poll_budget") or tasks.DEFAULT_REQUEST_BUDGET,
+            timeout=inputs.get("task_timeout") or tasks.DEFAULT_TRACK_TIMEOUT
+        )
+        for position, (added, _, task_id) in enumerate(results):
+            if added and task_id:
+                tracker.add(task_id, position, on_complete)
+        tracker.wait()
+        print(f"Include task polling stats: {tracker.stats}")
+
+    # Keep the run ownership index and the inventory store in step with the includes just added
+    index = ownership.OwnershipIndex.from_value(inputs.get("vm_ownership_index"))
+    store = inventory.open_store() if inputs.get("use_inventory") else None
+    added_vms = []
+    failed_vms = []
+    for vm, (added, message, _) in zip(vm_list, results):
+        if added:
+            added_vms.append(vm['name'])
+            if index is not None:
+                index.add(vm['id'], backup_job_id)
+            if store is not None:
+                store.add_include(backup_job_id, vm['id'])
+        else:
+            failed_vms.append(vm['name'])
+        print(message)
+
+    # Log the results of adding VMs
+    log_details = {"total_vms_processed": len(vm_list), "vms_added": added_vms, "vms_failed": failed_vms}
+    status = "success" if not failed_vms else "partial_success"
+    log_step(workflow_logs, vdc_name, "Add VMs to Job", status, log_details)
+
+    return {"workflow_logs": workflow_logs, "vm_ownership_index": index.to_value() if index is not None else None}
\ No newline at end of file
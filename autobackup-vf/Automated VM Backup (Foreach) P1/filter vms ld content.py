@@ -1,84 +1,76 @@
-import http.client
-import ssl
-import urllib.parse
-import json
-import base64
-from datetime import datetime, timedelta
-
-def log_step(workflow_logs, vdc_name, step_name, status, details):
-    workflow_logs.append({
-        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
-        "vdc_name": vdc_name,
-        "step": step_name,
-        "status": status,
-        "details": details
-    })
-
-def handler(context, inputs):
-    workflow_logs = inputs.get("workflow_logs")
-    VEEAM_URL = inputs.get("vem_url")
-    vdc_name = inputs.get("VDC_name")
-    print("Connected to Veeam Enterprise Manager!(For Filter VMs Script)")
-    token = inputs['Token']
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "X-RestSvcSessionId": token
-    }
-    
-    parsed_url = urllib.parse.urlparse(VEEAM_URL)
-    
-    # Get the list of all backup jobs
-    conn = http.client.HTTPSConnection(parsed_url.hostname, parsed_url.port, context=ssl._create_unverified_context(),timeout=10)
-    try:
-        conn.request("GET", "/api/jobs", headers=headers)
-        response = conn.getresponse()
-        jobs_data = response.read().decode()
-        jobs = json.loads(jobs_data).get("Refs")
-        
-        log_step(workflow_logs, vdc_name, "Retrieve Backup Jobs", "success", f"Retrieved {len(jobs)} backup jobs")
-    except Exception as e:
-        log_step(workflow_logs, vdc_name, "Retrieve Backup Jobs", "failure", str(e))
-        raise e
-    finally:
-        conn.close()
-    
-    backed_up_vms = []
-    for job in jobs:
-        job_id = job["UID"]
-        job_name = job.get("Name").lower()
-        if job_id == "urn:veeam:Job:cc66d047-3cbe-4ad1-ac9d-d1016c69908c" or job_name.endswith("_standard"):
-            continue
-        
-        conn = http.client.HTTPSConnection(parsed_url.hostname, parsed_url.port, context=ssl._create_unverified_context(),timeout=10)
-        try:
-            job_vm_url = f"/api/jobs/{job_id}/includes"
-            conn.request("GET", job_vm_url, headers=headers)
-            job_response = conn.getresponse()
-            job_vms_data = job_response.read().decode()
-            
-            if job_response.status == 200:
-                job_vms = json.loads(job_vms_data).get("ObjectInJobs")
-                for vm in job_vms:
-                    backed_up_vms.append(vm["HierarchyObjRef"].split(".")[1])
-        except Exception as e:
-            log_step(workflow_logs, vdc_name, "Retrieve VMs in Job " + job_id, "failure", str(e))
-        finally:
-            conn.close()
-    
-    print(f"Total VMs already backed up in other jobs: {len(backed_up_vms)}")
-    log_step(workflow_logs, vdc_name, "Check Backed Up VMs", "success", f"Total VMs already backed up in other jobs: {len(backed_up_vms)}")
-    
-    vm_list = inputs.get("oldContent")
-    filtered_vms = []
-    for vm in vm_list:
-        if vm["id"] not in backed_up_vms:
-            filtered_vms.append(vm)
-    
-    print(f"VMs to be added to the backup job: {len(filtered_vms)}")
-    log_step(workflow_logs, vdc_name, "Filter VMs", "success", f"VMs to be added to the backup job: {len(filtered_vms)}")
-    
-    return {
-        "workflow_logs": workflow_logs,
-        "filtered_vms": filtered_vms
+import json
+import base64
+from datetime import datetime, timedelta
+from vro_common import http_pool, inventory, ownership, vem
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "vdc_name": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs")
+    VEEAM_URL = inputs.get("vem_url")
+    vdc_name = inputs.get("VDC_name")
+    print("Connected to Veeam Enterprise Manager!(For Filter VMs Script)")
+    token = inputs['Token']
+    headers = {
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+        "X-RestSvcSessionId": token
+    }
+    
+    vem_origin = http_pool.origin(VEEAM_URL)
+    
+    def ignore_job(job_id, job_name):
+        return job_id == ownership.IGNORED_JOB_UID or job_name.lower().endswith("_standard")
+    
+    # Reuse the VM -> job ownership index built once for the whole P3 run when it is provided
+    index = ownership.OwnershipIndex.from_value(inputs.get("vm_ownership_index"))
+    if index is not None:
+        log_step(workflow_logs, vdc_name, "Retrieve Backup Jobs", "success", f"Using the run ownership index of {len(index.jobs)} backup jobs")
+    else:
+        # Get the list of all backup jobs
+        try:
+            response = http_pool.request("GET", f"{vem_origin}/api/jobs", headers=headers)
+            jobs_data = response.read().decode()
+            jobs = json.loads(jobs_data).get("Refs")
+            
+            log_step(workflow_logs, vdc_name, "Retrieve Backup Jobs", "success", f"Retrieved {len(jobs)} backup jobs")
+        except Exception as e:
+            log_step(workflow_logs, vdc_name, "Retrieve Backup Jobs", "failure", str(e))
+            raise e
+        
+        # Fetch the includes of every job concurrently, or of the stale ones only with use_inventory
+        index, errors = ownership.build_index(
+            vem_origin, headers, jobs, skip_job=ignore_job,
+            max_workers=inputs.get("includes_concurrency") or vem.DEFAULT_INCLUDES_CONCURRENCY,
+            timeout=inputs.get("includes_timeout") or vem.DEFAULT_INCLUDES_TIMEOUT,
+            store=inventory.open_store() if inputs.get("use_inventory") else None,
+            includes_ttl=inputs.get("includes_ttl") or inventory.DEFAULT_INCLUDES_TTL
+        )
+        for job_id, error in errors:
+            log_step(workflow_logs, vdc_name, "Retrieve VMs in Job " + job_id, "failure", str(error))
+    
+    backed_up_vms = index.protected_vm_ids(ignore_job)
+    
+    print(f"Total VMs already backed up in other jobs: {len(backed_up_vms)}")
+    log_step(workflow_logs, vdc_name, "Check Backed Up VMs", "success", f"Total VMs already backed up in other jobs: {len(backed_up_vms)}")
+    
+    vm_list = inputs.get("oldContent")
+    filtered_vms = []
+    for vm in vm_list:
+        if vm["id"] not in backed_up_vms:
+            filtered_vms.append(vm)
+    
+    print(f"VMs to be added to the backup job: {len(filtered_vms)}")
+    log_step(workflow_logs, vdc_name, "Filter VMs", "success", f"VMs to be added to the backup job: {len(filtered_vms)}")
+    
+    return {
+        "workflow_logs": workflow_logs,
+        "filtered_vms": filtered_vms
     }
\ No newline at end of file
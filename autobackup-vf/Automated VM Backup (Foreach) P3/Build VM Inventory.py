@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+from vro_common import inventory, vcd, vm_sync
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "vdc_name": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs") or []
+    vCloud_token = inputs.get("vCloud_token")
+    url = inputs.get("vCloud_ip")
+    vdc_list = inputs.get("vdc_list") or []
+    if not vCloud_token:
+        error_msg = "No vCD token provided"
+        log_step(workflow_logs, "N/A", "Build VM Inventory", "failure", error_msg)
+        raise Exception(error_msg)
+    
+    headers = {"Accept": "application/json;version=39.0", "Authorization": f"Bearer {vCloud_token}"}
+    
+    # Incremental mode: replay the vCD audit trail on the VM lists kept in the inventory store
+    if inputs.get("inventory_sync") == "events":
+        sync = vm_sync.VmSync(
+            url, headers, inventory.open_store(),
+            log=lambda status, details: log_step(workflow_logs, "N/A", "Sync VM Inventory", status, details),
+            page_size=inputs.get("page_size"),
+            max_events=inputs.get("max_sync_events") or vm_sync.DEFAULT_MAX_EVENTS,
+            full_resync_interval=inputs.get("full_resync_interval") or vm_sync.DEFAULT_FULL_RESYNC_INTERVAL
+        )
+        try:
+            vm_inventory = sync.sync(vdc_list)
+        except Exception as e:
+            log_step(workflow_logs, "N/A", "Build VM Inventory", "failure", str(e))
+            raise e
+        print(f"VM inventory sync stats: {sync.stats}")
+        for vdc_name in vdc_list:
+            if vdc_name.lower() not in vm_inventory:
+                log_step(workflow_logs, vdc_name, "Build VM Inventory", "warning", f"VDC {vdc_name} not found by the query service, P1 will list its VMs itself")
+        log_step(workflow_logs, "N/A", "Build VM Inventory", "success",
+                 f"Indexed {sum(len(vms) for vms in vm_inventory.values())} VMs across {len(vm_inventory)} VDCs ({sync.stats['mode']} sync)")
+        return {"workflow_logs": workflow_logs, "vm_inventory": vm_inventory}
+    
+    # VDCs whose VM list in the inventory store is still fresh are not queried again
+    store = inventory.open_store() if inputs.get("use_inventory") else None
+    vm_ttl = inputs.get("vm_ttl") or inventory.DEFAULT_VM_TTL
+    vm_inventory = {}
+    stale_vdcs = []
+    for vdc_name in vdc_list:
+        if store is not None and store.is_fresh(f"vms:{vdc_name.lower()}", vm_ttl):
+            vm_inventory[vdc_name.lower()] = store.vms(vdc_name)
+        else:
+            stale_vdcs.append(vdc_name)
+    if store is not None:
+        log_step(workflow_logs, "N/A", "Build VM Inventory", "info", f"{len(vm_inventory)} VDCs taken from the inventory store, {len(stale_vdcs)} to query")
+    
+    # List the VMs of every other VDC of the run with the vCD query service, consumed by each P1 iteration
+    vdc_hrefs = {}
+    try:
+        if stale_vdcs:
+            vdc_hrefs = vcd.resolve_vdcs(url, headers, stale_vdcs, log=lambda status, details: log_step(workflow_logs, "N/A", "Get All VDCs", status, details))
+            queried = {vdc_name.lower(): [] for vdc_name in vdc_hrefs}
+            vms = vcd.iter_vdc_vms(url, headers, vdc_hrefs, log=lambda status, details: log_step(workflow_logs, "N/A", "Fetch All VMs", status, details), page_size=inputs.get("page_size"))
+            unmatched = 0
+            for vm in vms:
+                if not vm["VDC"]:
+                    unmatched += 1
+                    continue
+                queried[vm["VDC"].lower()].append({"name": vm["name"], "id": vm["id"]})
+            if unmatched:
+                log_step(workflow_logs, "N/A", "Fetch All VMs", "warning", f"{unmatched} VMs skipped: their VDC does not match any requested VDC")
+            if store is not None:
+                for vdc_name, vms in queried.items():
+                    store.replace_vms(vdc_name, vms)
+            vm_inventory.update(queried)
+    except Exception as e:
+        log_step(workflow_logs, "N/A", "Build VM Inventory", "failure", str(e))
+        raise e
+    for vdc_name in stale_vdcs:
+        if vdc_name not in vdc_hrefs:
+            log_step(workflow_logs, vdc_name, "Build VM Inventory", "warning", f"VDC {vdc_name} not found by the query service, P1 will list its VMs itself")
+    log_step(workflow_logs, "N/A", "Build VM Inventory", "success",
+             f"Indexed {sum(len(vms) for vms in vm_inventory.values())} VMs across {len(vm_inventory)} VDCs")
+    
+    return {"workflow_logs": workflow_logs, "vm_inventory": vm_inventory}
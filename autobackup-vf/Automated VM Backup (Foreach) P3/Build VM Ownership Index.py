@@ -0,0 +1,46 @@
+import json
+from datetime import datetime, timedelta
+from vro_common import http_pool, inventory, ownership, vem
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "vdc_name": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs") or []
+    VEEAM_URL = inputs.get("vem_url")
+    headers = {"Accept": "application/json", "X-RestSvcSessionId": inputs['Token']}
+    vem_origin = http_pool.origin(VEEAM_URL)
+    
+    # Get the list of all backup jobs once for the whole run
+    try:
+        response = http_pool.request("GET", f"{vem_origin}/api/jobs", headers=headers)
+        if response.status != 200:
+            raise Exception(f"Failed to fetch backup jobs: {response.status} - {response.read().decode()}")
+        jobs = json.loads(response.read().decode()).get("Refs")
+        log_step(workflow_logs, "N/A", "Retrieve Backup Jobs", "success", f"Retrieved {len(jobs)} backup jobs")
+    except Exception as e:
+        log_step(workflow_logs, "N/A", "Retrieve Backup Jobs", "failure", str(e))
+        raise e
+    
+    # Index VM -> jobs from the includes of every job, consumed by each P1 iteration.
+    # With use_inventory, only the jobs whose stored includes are stale are fetched
+    store = inventory.open_store() if inputs.get("use_inventory") else None
+    index, errors = ownership.build_index(
+        vem_origin, headers, jobs,
+        max_workers=inputs.get("includes_concurrency") or vem.DEFAULT_INCLUDES_CONCURRENCY,
+        timeout=inputs.get("includes_timeout") or vem.DEFAULT_INCLUDES_TIMEOUT,
+        store=store,
+        includes_ttl=inputs.get("includes_ttl") or inventory.DEFAULT_INCLUDES_TTL
+    )
+    for job_id, error in errors:
+        log_step(workflow_logs, "N/A", "Retrieve VMs in Job " + job_id, "failure", str(error))
+    log_step(workflow_logs, "N/A", "Build VM Ownership Index", "success" if not errors else "partial_success",
+             f"Indexed {len(index.vms)} VMs across {len(index.jobs)} backup jobs")
+    
+    return {"workflow_logs": workflow_logs, "vm_ownership_index": index.to_value()}
@@ -0,0 +1,52 @@
+import os
+from datetime import datetime, timedelta
+from vro_common import dag, http_pool, memo, pipeline
+
+P3_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_P1_DIR = os.path.join(P3_DIR, "..", "Automated VM Backup (Foreach) P1")
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "vdc_name": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def handler(context, inputs):
+    p1_dir = inputs.get("p1_actions_dir") or DEFAULT_P1_DIR
+    # GET responses are shared by every step of this run only
+    memo.start_run()
+    graph = dag.Dag()
+    # VDC list (all VDCs, or the ones given and verified) and the VEM job
+    # includes do not depend on each other: both start right away
+    if inputs.get("vdc_names"):
+        graph.add("Verify VDC", pipeline.load_handler(os.path.join(P3_DIR, "Verify VDC .py")), needs=["vdc_names"], provides=["vdc_list"])
+    else:
+        graph.add("Get all the VDC", pipeline.load_handler(os.path.join(p1_dir, "Get all the VDC.py")), provides=["vdc_list"])
+    graph.add("Build VM Ownership Index", pipeline.load_handler(os.path.join(P3_DIR, "Build VM Ownership Index.py")), provides=["vm_ownership_index"])
+    graph.add("Build VM Inventory", pipeline.load_handler(os.path.join(P3_DIR, "Build VM Inventory.py")), needs=["vdc_list"], provides=["vm_inventory"])
+    if inputs.get("run_pipelines"):
+        graph.add("Run P1 Pipelines", pipeline.load_handler(os.path.join(P3_DIR, "Run P1 Pipelines.py")),
+                  needs=["vdc_list", "vm_inventory", "vm_ownership_index"], provides=["vdc_results", "vdc_snapshots", "vm_ownership_index"])
+
+    values, report = graph.run(context, inputs, inputs.get("max_parallel_steps") or dag.DEFAULT_DAG_WORKERS)
+    workflow_logs = values["workflow_logs"]
+    print(f"Step timings: {report['nodes']}")
+    path = " -> ".join(f"{name} ({report['nodes'][name]['duration']}s)" for name in report["critical_path"])
+    log_step(workflow_logs, "N/A", "Critical Path", "info", f"Run took {report['total']}s, bounded by: {path}")
+    log_step(workflow_logs, "N/A", "Request Cache", "info", http_pool.summary())
+    failed = {name: entry["error"] for name, entry in report["nodes"].items() if entry["status"] == dag.FAILED}
+    if failed:
+        log_step(workflow_logs, "N/A", "Prepare P1 Run", "failure", f"Failed steps: {failed}")
+        raise Exception(f"Failed steps: {failed}")
+    return {
+        "workflow_logs": workflow_logs,
+        "vdc_list": values.get("vdc_list"),
+        "vm_ownership_index": values.get("vm_ownership_index"),
+        "vm_inventory": values.get("vm_inventory"),
+        "vdc_results": values.get("vdc_results"),
+        "vdc_snapshots": values.get("vdc_snapshots"),
+        "dag_report": report
+    }
@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from vro_common import http_pool, inventory, ownership, pipeline
+
+DEFAULT_P1_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Automated VM Backup (Foreach) P1")
+# Requests in flight per endpoint, shared by every VDC of the run
+DEFAULT_VCD_REQUESTS = 8
+DEFAULT_VEM_REQUESTS = 4
+DEFAULT_VBR_REQUESTS = 4
+
+P1_ACTIONS = {
+    "list_vms": "List all VMs.py",
+    "search_new": "search job id (new vms).py",
+    "search_missing": "search job id (missing vms).py",
+    "filter_all": "filter vms ld content.py",
+    "filter_added": "filter vms.py",
+    "create_job": "Creat a Standard Backup Job and Add vm to job.py",
+    "add": "add vm to job.py",
+    "verify": "verify added vms.py",
+    "delete": "Delete vCloud Missing Vms.py",
+}
+# "filter vms.py" holds two scripts: the first filters addedVMs against the existing job
+P1_SCRIPT_SECTIONS = {"filter_added": 0}
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "vdc_name": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def merge_index(shared, lock, value, vm_ids):
+    # Copy back what one VDC changed: its own VMs and any job it created
+    if shared is None or not value:
+        return
+    returned = ownership.OwnershipIndex.from_value(value)
+    with lock:
+        shared.jobs.update(returned.jobs)
+        for vm_id in vm_ids:
+            if vm_id in returned:
+                shared.vms[vm_id] = dict(returned.owners(vm_id))
+            else:
+                shared.vms.pop(vm_id, None)
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs") or []
+    vdc_list = inputs.get("vdc_list") or []
+    p1_dir = inputs.get("p1_actions_dir") or DEFAULT_P1_DIR
+    actions = {name: pipeline.load_handler(os.path.join(p1_dir, script), P1_SCRIPT_SECTIONS.get(name)) for name, script in P1_ACTIONS.items()}
+
+    # Per-endpoint caps: every VDC pipeline goes through the same connection pools
+    for url, limit in (
+        (inputs.get("vCloud_ip"), inputs.get("max_vcd_requests") or DEFAULT_VCD_REQUESTS),
+        (inputs.get("vem_url"), inputs.get("max_vem_requests") or DEFAULT_VEM_REQUESTS),
+        (inputs.get("vbr_url"), inputs.get("max_vbr_requests") or DEFAULT_VBR_REQUESTS),
+    ):
+        if url:
+            http_pool.set_limit(url, limit)
+
+    # VM lists of the previous run, per PVDC: given by the workflow (resource
+    # elements /VDCS/<PVDC>.json) or kept in the inventory store
+    snapshots = inputs.get("vdc_snapshots")
+    store = None
+    if snapshots is None:
+        store = inventory.open_store()
+    elif isinstance(snapshots, str):
+        snapshots = json.loads(snapshots)
+    snapshots = dict(snapshots or {})
+
+    vm_inventory = inputs.get("vm_inventory")
+    if isinstance(vm_inventory, str):
+        vm_inventory = json.loads(vm_inventory)
+    shared_index = ownership.OwnershipIndex.from_value(inputs.get("vm_ownership_index"))
+    lock = threading.Lock()
+
+    def index_value():
+        with lock:
+            return shared_index.to_value() if shared_index is not None else None
+
+    def run_vdc(vdc_name):
+        logs = []
+        base = dict(inputs, workflow_logs=logs, VDC_name=vdc_name, vm_inventory=vm_inventory)
+        result = {"VDC_name": vdc_name, "status": "success", "added": 0, "missing": 0}
+        try:
+            listed = actions["list_vms"](context, base)
+            vms_list, pvdc_name = listed["vms_list"], listed["PVDC_name"]
+            with lock:
+                old_vms = snapshots.get(pvdc_name)
+            if old_vms is None and store is not None:
+                old_vms = store.get_meta(f"snapshot:{pvdc_name}")
+            added_vms, missing_vms, switch = pipeline.compare_vms(old_vms or [], vms_list)
+            result.update(added=len(added_vms), missing=len(missing_vms), switch_1=switch)
+            log_step(logs, vdc_name, "Compare VMs", "success" if switch != pipeline.ONLY_MISSING else "warning",
+                     f"New VMs found: {len(added_vms)}, Missing VMs found: {len(missing_vms)}")
+            with lock:
+                snapshots[pvdc_name] = vms_list
+            if store is not None:
+                store.set_meta(f"snapshot:{pvdc_name}", vms_list)
+
+            if added_vms:
+                step = dict(base, switch_1=switch, addedVMs=added_vms, oldContent=added_vms)
+                job_id = actions["search_new"](context, step)["job_id"]
+                # As the Foreach workflow: every VM new -> "filter vms ld content", otherwise
+                # "filter vms", which leaves the VMs already in this VDC's job to it
+                filter_vms = actions["filter_all"] if switch == pipeline.ALL_NEW else actions["filter_added"]
+                filtered_vms = filter_vms(context, dict(step, job_id=job_id, vm_ownership_index=index_value()))["filtered_vms"]
+                if filtered_vms:
+                    step.update(job_id=job_id, filtered_vms=filtered_vms, vm_ownership_index=index_value())
+                    if job_id:
+                        # Verify reads the job includes: wait for the include tasks first
+                        added = actions["add"](context, dict(step, track_tasks=True))
+                        verification = actions["verify"](context, step).get("verification_status", "success")
+                        result["verification"] = verification
+                        if verification != "success":
+                            result["status"] = verification
+                    else:
+                        added = actions["create_job"](context, step)
+                    merge_index(shared_index, lock, added.get("vm_ownership_index"), [vm["id"] for vm in filtered_vms])
+            if missing_vms:
+                step = dict(base, missingVMs=missing_vms)
+                job_id = actions["search_missing"](context, step)["job_id"]
+                if job_id:
+                    removed = actions["delete"](context, dict(step, job_id=job_id, vm_ownership_index=index_value()))
+                    merge_index(shared_index, lock, removed.get("vm_ownership_index"), [vm["id"] for vm in missing_vms])
+        except Exception as e:
+            result.update(status="failure", error=str(e))
+            log_step(logs, vdc_name, "Run P1 Pipeline", "failure", str(e))
+        return result, logs
+
+    # Largest VDCs first, by their size in the run inventory when there is one
+    weight = (lambda vdc_name: len(vm_inventory.get(vdc_name.lower(), []))) if vm_inventory else None
+    log_step(workflow_logs, "N/A", "Run P1 Pipelines", "info", f"Running the P1 chain for {len(vdc_list)} VDCs, {inputs.get('max_parallel_vdcs') or pipeline.DEFAULT_PARALLEL_VDCS} at a time")
+    outcomes = pipeline.run_all(vdc_list, run_vdc, weight, inputs.get("max_parallel_vdcs") or pipeline.DEFAULT_PARALLEL_VDCS)
+
+    # Logs merged VDC by VDC in the order of vdc_list, as the sequential Foreach wrote them
+    vdc_results = []
+    for result, logs in outcomes:
+        workflow_logs.extend(logs)
+        vdc_results.append(result)
+    failed = [result["VDC_name"] for result in vdc_results if result["status"] == "failure"]
+    unverified = [result["VDC_name"] for result in vdc_results if result["status"] == "partial_success"]
+    log_step(workflow_logs, "N/A", "Run P1 Pipelines", "success" if not failed and not unverified else "partial_success",
+             f"Processed {len(vdc_results)} VDCs, failed: {failed}, not fully verified: {unverified}")
+    log_step(workflow_logs, "N/A", "Request Cache", "info", http_pool.summary())
+    return {
+        "workflow_logs": workflow_logs,
+        "vdc_results": vdc_results,
+        "vdc_snapshots": snapshots,
+        "vm_ownership_index": index_value()
+    }
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+from vro_common import sessions
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "context": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs") or []
+    # Only the systems with an address and a user are opened
+    credentials = {}
+    for kind, url, user, password in (
+        (sessions.VCD, inputs.get("vCloud_ip"), inputs.get("vcd_user"), inputs.get("vcd_password")),
+        (sessions.VEM, inputs.get("veeam_url"), inputs.get("vem_user"), inputs.get("vem_password")),
+        (sessions.VBR, inputs.get("VBR_url"), inputs.get("vbr_user"), inputs.get("vbr_password")),
+    ):
+        if url and user:
+            credentials[kind] = {"url": url, "user": user, "password": password}
+    
+    # Logins run concurrently and are skipped for sessions still valid from an earlier workflow
+    manager = sessions.get_manager()
+    try:
+        tokens = manager.tokens(credentials)
+    except Exception as e:
+        log_step(workflow_logs, "All VMs", "Open Sessions", "failure", str(e))
+        raise e
+    log_step(workflow_logs, "All VMs", "Open Sessions", "success", f"Sessions ready for {sorted(credentials)}: {manager.stats}")
+    
+    return dict(tokens, workflow_logs=workflow_logs)
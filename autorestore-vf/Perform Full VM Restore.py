@@ -1,122 +1,215 @@
-import http.client
-import ssl
-import urllib.parse
-import json
-import base64
-from datetime import datetime, timedelta
-
-def log_step(workflow_logs, context, step_name, status, details):
-    workflow_logs.append({
-        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
-        "context": context if context else "All VMs",
-        "step": step_name,
-        "status": status,
-        "details": details
-    })
-
-def make_api_request(conn, method, url, headers, body=None):
-    parsed_url = urllib.parse.urlparse(url)
-    conn.request(method, parsed_url.path + ("?" + parsed_url.query if parsed_url.query else ""), body=body, headers=headers)
-    response = conn.getresponse()
-    return response
-
-def handler(context, inputs):
-    workflow_logs = inputs.get("workflow_logs")
-    veeam_url = inputs.get("veeam_url")
-    restore_points = inputs.get("restore_points")
-    token = inputs.get("Token")
-    restore_options = {
-        "PowerOnAfterRestore": inputs.get("PowerOn", False),
-        "VmNewNameSuffix": None,
-        "HierarchyRootName": "portal-dr.focus-multicloud.com"
-    }
-    headers = {
-        "Accept": "application/json",
-        "X-RestSvcSessionId": token,
-        "Content-Type": "application/json"
-    }
-    log_step(workflow_logs, "All VMs", "Authenticate Veeam", "success", "Authenticated successfully")
-    # Fetch HierarchyRootUid from HierarchyRootName
-    hierarchy_root_id = None
-    if restore_options["HierarchyRootName"]:
-        hierarchy_url = f"{veeam_url}/hierarchyRoots"
-        conn = http.client.HTTPSConnection(urllib.parse.urlparse(hierarchy_url).hostname, urllib.parse.urlparse(hierarchy_url).port, context=ssl._create_unverified_context(),timeout=10)
-        try:
-            response = make_api_request(conn, "GET", hierarchy_url, headers)
-            if response.status == 200:
-                hierarchy_data = json.loads(response.read().decode())
-                hierarchy_roots = hierarchy_data.get("Refs")
-                for root in hierarchy_roots:
-                    if root["Name"].lower() == restore_options["HierarchyRootName"].lower():
-                        hierarchy_root_id = root["UID"]
-                        log_step(workflow_logs, "All VMs", "Fetch HierarchyRoot", "success", f"Found HierarchyRoot ID: {hierarchy_root_id} for {restore_options['HierarchyRootName']}")
-                        break
-                if not hierarchy_root_id:
-                    log_step(workflow_logs, "All VMs", "Fetch HierarchyRoot", "warning", f"No HierarchyRoot found for name: {restore_options['HierarchyRootName']}")
-            else:
-                error_msg = f"Failed to fetch hierarchyRoots: {response.status} - {response.read().decode()}"
-                log_step(workflow_logs, "All VMs", "Fetch HierarchyRoot", "failure", error_msg)
-                raise Exception(error_msg)
-        finally:
-            conn.close()
-
-    # Perform restore for each VM
-    restore_results = []
-    for rp in restore_points:
-        vm_name = rp["vm_name"]
-        restore_point_id = rp["restore_point_id"]
-        log_step(workflow_logs, vm_name, "Start Restore", "info", f"Starting restore for {vm_name} (Restore Point ID: {restore_point_id})")
-
-        # Construct nested payload
-        payload = {
-            "VmRestoreSpec": {
-                "PowerOnAfterRestore": restore_options["PowerOnAfterRestore"],
-                "VmRestoreParameters": {
-                    "VmRestorePointUid": restore_point_id
-                }
-            }
-        }
-
-        # Add VmNewName with suffix if provided
-        if restore_options["VmNewNameSuffix"]:
-            payload["VmRestoreSpec"]["VmRestoreParameters"]["VmNewName"] = vm_name
-
-        # Add HierarchyRootUid if found
-        if hierarchy_root_id:
-            payload["VmRestoreSpec"]["HierarchyRootUid"] = hierarchy_root_id
-
-        json_payload = json.dumps(payload)
-
-        # Send restore request
-        restore_url = f"{veeam_url}/vmRestorePoints/{restore_point_id}?action=restore"
-        conn = http.client.HTTPSConnection(urllib.parse.urlparse(restore_url).hostname, urllib.parse.urlparse(restore_url).port , context=ssl._create_unverified_context(),timeout=10)
-        try:
-            response = make_api_request(conn, "POST", restore_url, headers, json_payload)
-            if response.status == 202:
-                response_data = json.loads(response.read().decode())
-                task_id = response_data.get("TaskId")
-                restore_results.append({
-                    "vm_name": vm_name,
-                    "vm_id": rp["vm_id"],
-                    "restore_point_id": restore_point_id,
-                    "task_id": task_id,
-                    "status": "Started",
-                    "creation_time": rp["creation_time"]
-                })
-                log_step(workflow_logs, vm_name, "Perform Restore", "success", f"Restore started for {vm_name}. Task ID: {task_id}")
-            else:
-                error_msg = f"Failed to start restore for {vm_name}: {response.status} - {response.read().decode()}"
-                log_step(workflow_logs, vm_name, "Perform Restore", "failure", error_msg)
-                restore_results.append({
-                    "vm_name": vm_name,
-                    "vm_id": rp["vm_id"],
-                    "restore_point_id": restore_point_id,
-                    "task_id": None,
-                    "status": f"Failed: {response.status}",
-                    "creation_time": rp["creation_time"]
-                })
-        finally:
-            conn.close()
-    print("Restore Results = ",restore_results)
-    log_step(workflow_logs, "All VMs", "Finalize Restore", "success", f"Processed {len(restore_results)} restore operations")
+import json
+import base64
+from datetime import datetime, timedelta
+from vro_common import dispatch, http_pool, tasks
+
+DEFAULT_RESTORES_PER_REPOSITORY = 2
+DEFAULT_CONCURRENT_RESTORES = 8
+
+def log_step(workflow_logs, context, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "context": context if context else "All VMs",
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def make_api_request(method, url, headers, body=None, timeout=http_pool.DEFAULT_TIMEOUT):
+    return http_pool.request(method, url, headers=headers, body=body, timeout=timeout)
+
+def restore_result(rp, task_id, status):
+    return {
+        "vm_name": rp["vm_name"],
+        "vm_id": rp["vm_id"],
+        "restore_point_id": rp["restore_point_id"],
+        "task_id": task_id,
+        "status": status,
+        "creation_time": rp["creation_time"]
+    }
+
+def start_restore(veeam_url, headers, rp, restore_options, hierarchy_root_id, workflow_logs):
+    vm_name = rp["vm_name"]
+    restore_point_id = rp["restore_point_id"]
+    log_step(workflow_logs, vm_name, "Start Restore", "info", f"Starting restore for {vm_name} (Restore Point ID: {restore_point_id})")
+
+    # Construct nested payload
+    payload = {
+        "VmRestoreSpec": {
+            "PowerOnAfterRestore": restore_options["PowerOnAfterRestore"],
+            "VmRestoreParameters": {
+                "VmRestorePointUid": restore_point_id
+            }
+        }
+    }
+
+    # Add VmNewName with suffix if provided
+    if restore_options["VmNewNameSuffix"]:
+        payload["VmRestoreSpec"]["VmRestoreParameters"]["VmNewName"] = vm_name
+
+    # Add HierarchyRootUid if found
+    if hierarchy_root_id:
+        payload["VmRestoreSpec"]["HierarchyRootUid"] = hierarchy_root_id
+
+    json_payload = json.dumps(payload)
+
+    # Send restore request
+    restore_url = f"{veeam_url}/vmRestorePoints/{restore_point_id}?action=restore"
+    response = make_api_request("POST", restore_url, headers, json_payload)
+    if response.status == 202:
+        response_data = json.loads(response.read().decode())
+        task_id = response_data.get("TaskId")
+        log_step(workflow_logs, vm_name, "Perform Restore", "success", f"Restore started for {vm_name}. Task ID: {task_id}")
+        return restore_result(rp, task_id, "Started")
+    error_msg = f"Failed to start restore for {vm_name}: {response.status} - {response.read().decode()}"
+    log_step(workflow_logs, vm_name, "Perform Restore", "failure", error_msg)
+    return restore_result(rp, None, f"Failed: {response.status}")
+
+def apply_task_state(workflow_logs, result, state):
+    if state["state"] == tasks.FINISHED and state["success"]:
+        result["status"] = "Success"
+        log_step(workflow_logs, result["vm_name"], "Restore Completed", "success", f"Restore finished for {result['vm_name']}. Task ID: {state['task_id']}")
+    elif state["state"] == tasks.FINISHED:
+        result["status"] = f"Failed: {state['message']}"
+        log_step(workflow_logs, result["vm_name"], "Restore Completed", "failure", f"Restore failed for {result['vm_name']}: {state['message']}")
+    else:
+        result["status"] = state["state"]
+        log_step(workflow_logs, result["vm_name"], "Restore Completed", "warning", f"Restore of {result['vm_name']} not confirmed: {state['message']}")
+
+def fetch_backup_repositories(veeam_url, headers, workflow_logs):
+    # Backup name -> repository name, from one /backups?format=Entity call
+    response = make_api_request("GET", f"{veeam_url}/backups?format=Entity", headers)
+    if response.status != 200:
+        log_step(workflow_logs, "All VMs", "Fetch Backup Repositories", "warning", f"Failed to fetch backup repositories, restores grouped together: {response.status} - {response.read().decode()}")
+        return {}
+    backups = json.loads(response.read().decode()).get("Backups") or []
+    if isinstance(backups, dict):
+        backups = backups.get("Backups") or []
+    repositories = {}
+    for backup in backups:
+        links = backup.get("Links") or []
+        if isinstance(links, dict):
+            links = links.get("Links") or []
+        repository = next((link.get("Name") for link in links if link.get("Type") == "RepositoryReference"), None)
+        if repository:
+            repositories[backup.get("Name")] = repository
+    log_step(workflow_logs, "All VMs", "Fetch Backup Repositories", "success", f"Found the repository of {len(repositories)} backups")
+    return repositories
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs")
+    veeam_url = inputs.get("veeam_url")
+    restore_points = inputs.get("restore_points")
+    token = inputs.get("Token")
+    restore_options = {
+        "PowerOnAfterRestore": inputs.get("PowerOn", False),
+        "VmNewNameSuffix": None,
+        "HierarchyRootName": "portal-dr.focus-multicloud.com"
+    }
+    headers = {
+        "Accept": "application/json",
+        "X-RestSvcSessionId": token,
+        "Content-Type": "application/json"
+    }
+    log_step(workflow_logs, "All VMs", "Authenticate Veeam", "success", "Authenticated successfully")
+    # Fetch HierarchyRootUid from HierarchyRootName
+    hierarchy_root_id = None
+    if restore_options["HierarchyRootName"]:
+        hierarchy_url = f"{veeam_url}/hierarchyRoots"
+        response = make_api_request("GET", hierarchy_url, headers)
+        if response.status == 200:
+            hierarchy_data = json.loads(response.read().decode())
+            hierarchy_roots = hierarchy_data.get("Refs")
+            for root in hierarchy_roots:
+                if root["Name"].lower() == restore_options["HierarchyRootName"].lower():
+                    hierarchy_root_id = root["UID"]
+                    log_step(workflow_logs, "All VMs", "Fetch HierarchyRoot", "success", f"Found HierarchyRoot ID: {hierarchy_root_id} for {restore_options['HierarchyRootName']}")
+                    break
+            if not hierarchy_root_id:
+                log_step(workflow_logs, "All VMs", "Fetch HierarchyRoot", "warning", f"No HierarchyRoot found for name: {restore_options['HierarchyRootName']}")
+        else:
+            error_msg = f"Failed to fetch hierarchyRoots: {response.status} - {response.read().decode()}"
+            log_step(workflow_logs, "All VMs", "Fetch HierarchyRoot", "failure", error_msg)
+            raise Exception(error_msg)
+
+    # Parallel mode: restores grouped by backup repository, run under per-repository
+    # and global caps, each slot refilled as soon as its restore session stops.
+    # Proxies are not a group: VBR picks the restore proxy when the restore runs
+    # and VEM does not expose it beforehand, each proxy's own task slots apply.
+    if inputs.get("parallel_restore"):
+        repositories = fetch_backup_repositories(veeam_url, headers, workflow_logs)
+        dispatcher = dispatch.SlotDispatcher(
+            per_group_limit=inputs.get("max_restores_per_repository") or DEFAULT_RESTORES_PER_REPOSITORY,
+            global_limit=inputs.get("max_concurrent_restores") or DEFAULT_CONCURRENT_RESTORES
+        )
+        # Optional VM name -> size (any unit): biggest restores start first
+        size_hints = inputs.get("restore_size_hints") or {}
+        groups = [repositories.get(rp.get("backup_name"), "default") for rp in restore_points]
+        for position, (rp, repository) in enumerate(zip(restore_points, groups)):
+            dispatcher.add(repository, position, float(size_hints.get(rp["vm_name"], 1.0)))
+        log_step(workflow_logs, "All VMs", "Dispatch Restores", "info", f"Dispatching {len(restore_points)} restores over {len(set(groups))} repositories (max {dispatcher.per_group_limit} per repository, {dispatcher.global_limit} overall)")
+
+        results = [None] * len(restore_points)
+        tracker = tasks.TaskTracker(
+            http_pool.origin(veeam_url), headers,
+            request_budget=inputs.get("task_poll_budget") or tasks.DEFAULT_REQUEST_BUDGET,
+            timeout=inputs.get("task_timeout") or tasks.DEFAULT_TRACK_TIMEOUT
+        )
+
+        def start_ready():
+            # Also runs from on_complete inside tracker.wait(): a restore that cannot
+            # be started is recorded as failed instead of ending the tracking
+            ready = dispatcher.next_items()
+            while ready:
+                for repository, position in ready:
+                    rp = restore_points[position]
+                    try:
+                        results[position] = start_restore(veeam_url, headers, rp, restore_options, hierarchy_root_id, workflow_logs)
+                    except Exception as e:
+                        log_step(workflow_logs, rp["vm_name"], "Perform Restore", "failure", f"Failed to start restore for {rp['vm_name']}: {str(e)}")
+                        results[position] = restore_result(rp, None, f"Failed: {str(e)}")
+                    if results[position]["task_id"]:
+                        tracker.add(results[position]["task_id"], (repository, position), on_complete, follow_session=True)
+                    else:
+                        dispatcher.release(repository)
+                ready = dispatcher.next_items()
+
+        def on_complete(state):
+            repository, position = state["context"]
+            apply_task_state(workflow_logs, results[position], state)
+            dispatcher.release(repository)
+            # A timed out restore may still hold its slot: only a finished one lets the next restore in
+            if state["state"] == tasks.FINISHED:
+                start_ready()
+
+        start_ready()
+        tracker.wait()
+        print(f"Restore task polling stats: {tracker.stats}")
+        for position, rp in enumerate(restore_points):
+            if results[position] is None:
+                log_step(workflow_logs, rp["vm_name"], "Perform Restore", "warning", f"Restore not started for {rp['vm_name']}: earlier restores did not finish in time")
+                results[position] = restore_result(rp, None, "Not started")
+        restore_results = results
+    else:
+        # Perform restore for each VM
+        restore_results = [
+            start_restore(veeam_url, headers, rp, restore_options, hierarchy_root_id, workflow_logs)
+            for rp in restore_points
+        ]
+
+        # Follow the restore tasks and their restore sessions until they end when asked to, instead of reporting "Started"
+        if inputs.get("track_tasks"):
+            tracker = tasks.TaskTracker(
+                http_pool.origin(veeam_url), headers,
+                request_budget=inputs.get("task_poll_budget") or tasks.DEFAULT_REQUEST_BUDGET,
+                timeout=inputs.get("task_timeout") or tasks.DEFAULT_TRACK_TIMEOUT
+            )
+            for result in restore_results:
+                if result["task_id"]:
+                    tracker.add(result["task_id"], result, lambda state: apply_task_state(workflow_logs, state["context"], state), follow_session=True)
+            tracker.wait()
+            print(f"Restore task polling stats: {tracker.stats}")
+
+    print("Restore Results = ",restore_results)
+    log_step(workflow_logs, "All VMs", "Finalize Restore", "success", f"Processed {len(restore_results)} restore operations")
     return {"Restore_Results": json.dumps({"restore_results": restore_results}, indent=4), "workflow_logs": workflow_logs}
\ No newline at end of file
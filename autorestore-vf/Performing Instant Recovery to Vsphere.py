@@ -1,91 +1,192 @@
-import http.client
-import ssl
-import urllib.parse
-import json
-import base64
-from datetime import datetime, timedelta
-
-def log_step(workflow_logs, context, step_name, status, details):
-    workflow_logs.append({
-        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
-        "context": context if context else "All VMs",
-        "step": step_name,
-        "status": status,
-        "details": details
-    })
-
-def make_api_request(conn, method, url, headers, body=None):
-    parsed_url = urllib.parse.urlparse(url)
-    conn.request(method, parsed_url.path + ("?" + parsed_url.query if parsed_url.query else ""), body=body, headers=headers)
-    response = conn.getresponse()
-    return response
-
-def handler(context, inputs):
-    workflow_logs = inputs.get("workflow_logs")
-    vbr_url = inputs.get("VBR_url")
-    restore_points = inputs.get("restore_points")
-    token = inputs.get("Token_VBR")
-    log_step(workflow_logs, "All VMs", "Authenticate VBR", "success", "Authenticated successfully")
-    # Update headers with session token
-    headers = {
-        "x-api-version": "1.1-rev2",
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-
-    # Process each restore point for instant recovery
-    restore_results = []
-    for lrp in restore_points:
-        vm_name = lrp["vm_name"]
-        restore_point_id = lrp["restore_point_id"]
-        creation_time = lrp["creation_time"]
-        log_step(workflow_logs, vm_name, "Start Instant Recovery", "info", f"Initiating instant recovery for {vm_name} from restore point {restore_point_id} (Created: {creation_time})")
-
-        # Extract restore point ID
-        object_restore_point_id = restore_point_id[25:] if restore_point_id.startswith("urn:veeam:VmRestorePoint:") else restore_point_id
-
-        # Prepare request body for instant recovery
-        restore_body = {
-            "restorePointId": object_restore_point_id,
-            "type": "OriginalLocation",
-            "vmTagsRestoreEnabled": True,
-            "secureRestore": {
-                "antivirusScanEnabled": True,
-                "virusDetectionAction": "DisableNetwork",
-                "entireVolumeScanEnabled": True
-            },
-            "nicsEnabled": False,
-            "PowerUp": True,
-            "reason": "Instant Recovery to VMware vSphere"
-        }
-
-        # Send POST request to start instant recovery
-        restore_url = f"{vbr_url}/api/v1/restore/instantRecovery/vSphere/vm"
-        conn = http.client.HTTPSConnection(urllib.parse.urlparse(restore_url).hostname, urllib.parse.urlparse(restore_url).port, context=ssl._create_unverified_context())
-        try:
-            response = make_api_request(conn, "POST", restore_url, headers, json.dumps(restore_body))
-            if response.status == 201:
-                response_data = json.loads(response.read().decode())
-                restore_results.append({
-                    "vm_name": vm_name,
-                    "restore_point_id": restore_point_id,
-                    "status": "Success",
-                    "creation_time": creation_time,
-                    "response": response_data
-                })
-                log_step(workflow_logs, vm_name, "Perform Instant Recovery", "success", f"Successfully started instant recovery for {vm_name}")
-            else:
-                error_msg = f"Failed to start instant recovery for {vm_name}: {response.status} - {response.read().decode()}"
-                log_step(workflow_logs, vm_name, "Perform Instant Recovery", "failure", error_msg)
-                restore_results.append({
-                    "vm_name": vm_name,
-                    "restore_point_id": restore_point_id,
-                    "status": f"Failed: {response.status}",
-                    "creation_time": creation_time,
-                    "response": None
-                })
-        finally:
-            conn.close()
-    print("Restore Results = ",restore_results)
-    log_step(workflow_logs, "All VMs", "Finalize Instant Recovery", "success", f"Processed {len(restore_results)} instant recovery operations")
+import json
+import base64
+import time
+from datetime import datetime, timedelta
+from vro_common import dispatch, http_pool, vbr
+
+DEFAULT_IR_REQUEST_TIMEOUT = 120
+DEFAULT_MOUNTS_PER_HOST = 4
+DEFAULT_CONCURRENT_MOUNTS = 16
+DEFAULT_MOUNT_POLL_INTERVAL = 10
+DEFAULT_MOUNT_TIMEOUT = 4 * 3600
+MOUNTED_STATES = ("Mounted", "Migrating")
+FAILED_STATES = ("Failed", "Dismounting", "Dismounted")
+
+def log_step(workflow_logs, context, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "context": context if context else "All VMs",
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def make_api_request(method, url, headers, body=None, timeout=http_pool.DEFAULT_TIMEOUT):
+    return http_pool.request(method, url, headers=headers, body=body, timeout=timeout)
+
+def start_instant_recovery(vbr_url, headers, lrp, workflow_logs, timeout):
+    vm_name = lrp["vm_name"]
+    restore_point_id = lrp["restore_point_id"]
+    creation_time = lrp["creation_time"]
+    log_step(workflow_logs, vm_name, "Start Instant Recovery", "info", f"Initiating instant recovery for {vm_name} from restore point {restore_point_id} (Created: {creation_time})")
+
+    # Prepare request body for instant recovery
+    restore_body = {
+        "restorePointId": vbr_restore_point_id(restore_point_id),
+        "type": "OriginalLocation",
+        "vmTagsRestoreEnabled": True,
+        "secureRestore": {
+            "antivirusScanEnabled": True,
+            "virusDetectionAction": "DisableNetwork",
+            "entireVolumeScanEnabled": True
+        },
+        "nicsEnabled": False,
+        "PowerUp": True,
+        "reason": "Instant Recovery to VMware vSphere"
+    }
+
+    # Send POST request to start instant recovery
+    restore_url = f"{vbr_url}/api/v1/restore/instantRecovery/vSphere/vm"
+    try:
+        response = make_api_request("POST", restore_url, headers, json.dumps(restore_body), timeout=timeout)
+    except Exception as e:
+        error_msg = f"Failed to start instant recovery for {vm_name}: {str(e)}"
+        log_step(workflow_logs, vm_name, "Perform Instant Recovery", "failure", error_msg)
+        return {
+            "vm_name": vm_name,
+            "restore_point_id": restore_point_id,
+            "status": f"Failed: {str(e)}",
+            "creation_time": creation_time,
+            "response": None
+        }
+    if response.status == 201:
+        response_data = json.loads(response.read().decode())
+        log_step(workflow_logs, vm_name, "Perform Instant Recovery", "success", f"Successfully started instant recovery for {vm_name}")
+        return {
+            "vm_name": vm_name,
+            "restore_point_id": restore_point_id,
+            "status": "Success",
+            "creation_time": creation_time,
+            "response": response_data
+        }
+    error_msg = f"Failed to start instant recovery for {vm_name}: {response.status} - {response.read().decode()}"
+    log_step(workflow_logs, vm_name, "Perform Instant Recovery", "failure", error_msg)
+    return {
+        "vm_name": vm_name,
+        "restore_point_id": restore_point_id,
+        "status": f"Failed: {response.status}",
+        "creation_time": creation_time,
+        "response": None
+    }
+
+def session_state(vbr_url, token, session_id, mounts):
+    # Mount state of an instant recovery session; a session that stopped before
+    # its mount showed up is reported with its result
+    mount = mounts.get(session_id)
+    if mount:
+        return mount.get("state")
+    try:
+        session = vbr.get_json(vbr_url, token, f"/api/v1/sessions/{session_id}")
+    except Exception:
+        return None
+    if session.get("state") != "Stopped":
+        return None
+    result = (session.get("result") or {}).get("result")
+    return "Mounted" if result in ("Success", "Warning") else "Failed"
+
+def vbr_restore_point_id(restore_point_id):
+    # Extract restore point ID
+    return restore_point_id[25:] if restore_point_id.startswith("urn:veeam:VmRestorePoint:") else restore_point_id
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs")
+    vbr_url = inputs.get("VBR_url")
+    restore_points = inputs.get("restore_points")
+    token = inputs.get("Token_VBR")
+    log_step(workflow_logs, "All VMs", "Authenticate VBR", "success", "Authenticated successfully")
+    # Update headers with session token
+    headers = {
+        "x-api-version": "1.1-rev2",
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+
+    request_timeout = inputs.get("ir_request_timeout") or DEFAULT_IR_REQUEST_TIMEOUT
+
+    # Scheduled mode: keep at most N mounts in progress per vPower NFS host (mount
+    # server of the repository) and start the next recovery when one is mounted
+    if inputs.get("schedule_mounts"):
+        try:
+            mount_servers = vbr.mount_server_by_restore_point(vbr_url, token, [vbr_restore_point_id(lrp["restore_point_id"]) for lrp in restore_points])
+        except Exception as e:
+            log_step(workflow_logs, "All VMs", "Resolve vPower NFS Hosts", "warning", f"Failed to resolve mount servers, recoveries grouped together: {str(e)}")
+            mount_servers = {}
+        dispatcher = dispatch.SlotDispatcher(
+            per_group_limit=inputs.get("max_mounts_per_host") or DEFAULT_MOUNTS_PER_HOST,
+            global_limit=inputs.get("max_concurrent_mounts") or DEFAULT_CONCURRENT_MOUNTS
+        )
+        for position, lrp in enumerate(restore_points):
+            dispatcher.add(mount_servers.get(vbr_restore_point_id(lrp["restore_point_id"]), "default"), position)
+        log_step(workflow_logs, "All VMs", "Schedule Instant Recovery", "info", f"Scheduling {len(restore_points)} recoveries over {len(set(mount_servers.values())) or 1} vPower NFS hosts (max {dispatcher.per_group_limit} mounts in progress per host, {dispatcher.global_limit} overall)")
+
+        results = [None] * len(restore_points)
+        active = {}  # position -> (mount server, session id)
+        poll_interval = inputs.get("mount_poll_interval") or DEFAULT_MOUNT_POLL_INTERVAL
+        deadline = time.monotonic() + (inputs.get("mount_timeout") or DEFAULT_MOUNT_TIMEOUT)
+
+        def start_ready():
+            ready = dispatcher.next_items()
+            while ready:
+                for mount_server, position in ready:
+                    results[position] = start_instant_recovery(vbr_url, headers, restore_points[position], workflow_logs, request_timeout)
+                    session_id = (results[position]["response"] or {}).get("id")
+                    if session_id:
+                        results[position]["status"] = "Mounting"
+                        active[position] = (mount_server, session_id)
+                    else:
+                        dispatcher.release(mount_server)
+                ready = dispatcher.next_items()
+
+        start_ready()
+        while active and time.monotonic() < deadline:
+            time.sleep(poll_interval)
+            try:
+                mounts = vbr.instant_recovery_mounts(vbr_url, token)
+            except Exception as e:
+                log_step(workflow_logs, "All VMs", "Track Instant Recovery", "warning", str(e))
+                continue
+            for position, (mount_server, session_id) in list(active.items()):
+                vm_name = restore_points[position]["vm_name"]
+                state = session_state(vbr_url, token, session_id, mounts)
+                if state in MOUNTED_STATES:
+                    results[position]["status"] = "Success"
+                    log_step(workflow_logs, vm_name, "Instant Recovery Mounted", "success", f"{vm_name} is mounted and running from the backup ({state})")
+                elif state in FAILED_STATES:
+                    results[position]["status"] = f"Failed: {state}"
+                    log_step(workflow_logs, vm_name, "Instant Recovery Mounted", "failure", f"Instant recovery of {vm_name} ended in state {state}")
+                else:
+                    continue
+                del active[position]
+                dispatcher.release(mount_server)
+            start_ready()
+
+        for position in active:
+            vm_name = restore_points[position]["vm_name"]
+            log_step(workflow_logs, vm_name, "Instant Recovery Mounted", "warning", f"Instant recovery of {vm_name} still mounting after the scheduler timeout")
+        for position, lrp in enumerate(restore_points):
+            if results[position] is None:
+                log_step(workflow_logs, lrp["vm_name"], "Perform Instant Recovery", "warning", f"Instant recovery not started for {lrp['vm_name']}: no mount slot freed before the scheduler timeout")
+                results[position] = {
+                    "vm_name": lrp["vm_name"],
+                    "restore_point_id": lrp["restore_point_id"],
+                    "status": "Not started",
+                    "creation_time": lrp["creation_time"],
+                    "response": None
+                }
+        restore_results = results
+    else:
+        # Process each restore point for instant recovery
+        restore_results = [start_instant_recovery(vbr_url, headers, lrp, workflow_logs, request_timeout) for lrp in restore_points]
+    print("Restore Results = ",restore_results)
+    log_step(workflow_logs, "All VMs", "Finalize Instant Recovery", "success", f"Processed {len(restore_results)} instant recovery operations")
     return {"Restore_Results": json.dumps({"restore_results": restore_results}, indent=4), "workflow_logs": workflow_logs}
\ No newline at end of file
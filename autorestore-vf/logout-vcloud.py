@@ -1,49 +1,46 @@
-import http.client
-import urllib.parse
-import ssl
-from datetime import datetime, timedelta
-
-def log_step(workflow_logs, vdc_name, step_name, status, details):
-    workflow_logs.append({
-        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
-        "context": vdc_name,
-        "step": step_name,
-        "status": status,
-        "details": details
-    })
-
-def handler(context, inputs):
-    workflow_logs = inputs.get("workflow_logs")
-    vCloud_token = inputs.get("vCloud_token")
-    url = inputs.get("vCloud_ip")
-    vdc_name = "All VDCs"
-    
-    log_step(workflow_logs, vdc_name, "Authenticate with vCloud Director (Logout)", "success", "Using provided vCD token")
-    print("Authenticate with vCloud Director (Logout)")
-    headers = {
-        "Accept": "application/json;version=39.0",
-        "Authorization": f"Bearer {vCloud_token}"
-    }
-    
-    logout_url = f"https://{url}/cloudapi/1.0.0/sessions/current"
-    parsed_url = urllib.parse.urlparse(logout_url)
-    
-    conn = http.client.HTTPSConnection(parsed_url.hostname, context=ssl._create_unverified_context(), timeout=10)
-    try:
-        conn.request("DELETE", parsed_url.path, headers=headers)
-        response = conn.getresponse()
-        
-        if response.status != 204:  # 204 No Content is expected for a successful logout
-            error_msg = f"Failed to logout: {response.status} {response.reason}"
-            log_step(workflow_logs, vdc_name, "Logout from vCloud Director", "failure", error_msg)
-            raise Exception(error_msg)
-        
-        log_step(workflow_logs, vdc_name, "Logout from vCloud Director", "success", "Successfully logged out from vCloud Director")
-    
-    except Exception as e:
-        log_step(workflow_logs, vdc_name, "Logout from vCloud Director", "failure", f"Error during logout: {str(e)}")
-        raise e
-    finally:
-        conn.close()
-    
+from datetime import datetime, timedelta
+from vro_common import http_pool, sessions
+
+def log_step(workflow_logs, vdc_name, step_name, status, details):
+    workflow_logs.append({
+        "timestamp": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+        "context": vdc_name,
+        "step": step_name,
+        "status": status,
+        "details": details
+    })
+
+def handler(context, inputs):
+    workflow_logs = inputs.get("workflow_logs")
+    vCloud_token = inputs.get("vCloud_token")
+    url = inputs.get("vCloud_ip")
+    vdc_name = "All VDCs"
+    # Sessions opened by the session manager stay open for the next workflows
+    if vCloud_token and sessions.get_manager().is_managed(vCloud_token):
+        log_step(workflow_logs, vdc_name, "Logout from vCloud Director", "success", "Session kept open by the session manager for reuse")
+        return {"workflow_logs": workflow_logs}
+    
+    log_step(workflow_logs, vdc_name, "Authenticate with vCloud Director (Logout)", "success", "Using provided vCD token")
+    print("Authenticate with vCloud Director (Logout)")
+    headers = {
+        "Accept": "application/json;version=39.0",
+        "Authorization": f"Bearer {vCloud_token}"
+    }
+    
+    logout_url = f"https://{url}/cloudapi/1.0.0/sessions/current"
+    
+    try:
+        response = http_pool.request("DELETE", logout_url, headers=headers)
+        
+        if response.status != 204:  # 204 No Content is expected for a successful logout
+            error_msg = f"Failed to logout: {response.status} {response.reason}"
+            log_step(workflow_logs, vdc_name, "Logout from vCloud Director", "failure", error_msg)
+            raise Exception(error_msg)
+        
+        log_step(workflow_logs, vdc_name, "Logout from vCloud Director", "success", "Successfully logged out from vCloud Director")
+    
+    except Exception as e:
+        log_step(workflow_logs, vdc_name, "Logout from vCloud Director", "failure", f"Error during logout: {str(e)}")
+        raise e
+    
     return {"workflow_logs": workflow_logs}
\ No newline at end of file
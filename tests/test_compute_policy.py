@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from vro_common import compute_policy, http_pool, pipeline
+
+LIST_ALL_VMS = os.path.join(os.path.dirname(__file__), "..", "autobackup-vf", "Automated VM Backup (Foreach) P1", "List all VMs.py")
+POLICIES = [
+    {"id": "urn:vcloud:vdcComputePolicy:1", "description": "Gold-defaultpolicy"},
+    {"id": "urn:vcloud:vdcComputePolicy:2", "description": "Silver-defaultpolicy"},
+    {"id": "urn:vcloud:vdcComputePolicy:3", "description": "Large VMs"},
+]
+POLICY_VDCS = {"1": [{"name": "Customer-A"}], "2": [{"name": "Customer-B"}, {"name": "Customer-A"}]}
+
+
+class FakeResponse:
+    status = 200
+    reason = "OK"
+
+    def __init__(self, body):
+        self._body = json.dumps(body).encode()
+
+    def read(self, amount=None):
+        return self._body
+
+
+class FakeVcd:
+    def __init__(self):
+        self.urls = []
+
+    def request(self, method, url, headers=None, **kwargs):
+        self.urls.append(url)
+        path = url.split("?", 1)[0]
+        if path.endswith("/vdcComputePolicies"):
+            return FakeResponse({"values": POLICIES, "resultTotal": len(POLICIES), "pageCount": 1})
+        if path.endswith("/vdcs"):
+            return FakeResponse(POLICY_VDCS[path.rsplit("/", 2)[-2].rsplit(":", 1)[-1]])
+        return FakeResponse({"values": [{"name": "vm-1", "id": "urn:vcloud:vm:1"}], "resultTotal": 1, "pageCount": 1})
+
+    def sweeps(self):
+        return [url for url in self.urls if url.endswith("/vdcs")]
+
+
+class PolicyVdcIndexTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_path = os.path.join(directory.name, "policies.json")
+        self.vcd = FakeVcd()
+        for patcher in (mock.patch.dict(os.environ, {"VRO_POLICY_CACHE": self.cache_path}),
+                        mock.patch.object(http_pool, "request", side_effect=self.vcd.request)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def index(self, policies=POLICIES):
+        return compute_policy.PolicyVdcIndex("vcd.example", {}, policies)
+
+    def test_first_policy_in_listing_order_wins(self):
+        index = self.index()
+        self.assertEqual(index.lookup("customer-a"), ("urn:vcloud:vdcComputePolicy:1", "Gold-defaultpolicy"))
+        self.assertEqual(index.lookup("CUSTOMER-B"), ("urn:vcloud:vdcComputePolicy:2", "Silver-defaultpolicy"))
+        self.assertEqual(len(self.vcd.sweeps()), 2)
+
+    def test_second_run_of_list_all_vms_does_not_sweep_again(self):
+        handler = pipeline.load_handler(LIST_ALL_VMS)
+        inputs = {"vCloud_token": "token", "vCloud_ip": "vcd.example", "VDC_name": "Customer-B"}
+        first = handler(None, dict(inputs, workflow_logs=[]))
+        swept = len(self.vcd.sweeps())
+        second = handler(None, dict(inputs, workflow_logs=[]))
+        self.assertEqual(swept, 2)
+        self.assertEqual(len(self.vcd.sweeps()), swept)
+        self.assertEqual(second["PVDC_name"], first["PVDC_name"])
+        self.assertEqual(second["PVDC_name"], "Silver-defaultpolicy")
+        self.assertEqual(os.stat(self.cache_path).st_mode & 0o777, 0o600)
+
+    def test_cache_not_used_when_the_policies_change(self):
+        self.index().lookup("customer-a")
+        self.index(POLICIES[:1]).lookup("customer-a")
+        self.assertEqual(len(self.vcd.sweeps()), 3)
+
+    def test_unknown_vdc_sweeps_again_once(self):
+        self.index().lookup("customer-a")
+        index = self.index()
+        self.assertIsNone(index.lookup("customer-c"))
+        self.assertEqual(len(self.vcd.sweeps()), 4)
+
+    def test_partial_sweep_is_not_saved(self):
+        failing = {"urn:vcloud:vdcComputePolicy:2"}
+
+        def request(method, url, headers=None, **kwargs):
+            if any(policy_id in url for policy_id in failing):
+                raise ConnectionError("reset")
+            return self.vcd.request(method, url, headers)
+
+        with mock.patch.object(http_pool, "request", side_effect=request):
+            self.assertIsNotNone(self.index().lookup("customer-a"))
+        self.assertFalse(os.path.exists(self.cache_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
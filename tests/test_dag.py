@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+
+from vro_common import dag
+
+
+def node(provides=None, delay=0.0, log=None, fail=False):
+    # Handler returning fixed outputs after `delay` seconds
+    def handler(context, inputs):
+        time.sleep(delay)
+        if log is not None:
+            inputs["workflow_logs"].append(log)
+        if fail:
+            raise RuntimeError("node failed")
+        return dict(provides or {})
+    return handler
+
+
+class DagTest(unittest.TestCase):
+    def test_node_waits_for_its_inputs(self):
+        seen = {}
+
+        def consumer(context, inputs):
+            seen.update(inputs)
+            return {"c": inputs["a"] + inputs["b"]}
+
+        graph = dag.Dag()
+        graph.add("consumer", consumer, needs=("a", "b"), provides=("c",))
+        graph.add("a", node({"a": 1}, delay=0.05), provides=("a",))
+        graph.add("b", node({"b": 2}), provides=("b",))
+        values, report = graph.run(None, {"x": 0})
+        self.assertEqual((seen["a"], seen["b"], values["c"], values["x"]), (1, 2, 3, 0))
+        self.assertTrue(all(entry["status"] == dag.DONE for entry in report["nodes"].values()))
+        self.assertGreaterEqual(report["nodes"]["consumer"]["start"], report["nodes"]["a"]["end"])
+
+    def test_independent_nodes_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def meet(context, inputs):
+            # Only passes when the three nodes are running at the same time
+            barrier.wait()
+            return {}
+
+        graph = dag.Dag()
+        for name in ("a", "b", "c"):
+            graph.add(name, meet)
+        _, report = graph.run(None, {}, max_workers=3)
+        self.assertEqual({entry["status"] for entry in report["nodes"].values()}, {dag.DONE})
+
+    def test_failure_skips_the_nodes_behind_it(self):
+        graph = dag.Dag()
+        graph.add("a", node(fail=True), provides=("a",))
+        graph.add("b", node({"b": 1}), needs=("a",), provides=("b",))
+        graph.add("c", node({"c": 1}), needs=("b",), provides=("c",))
+        graph.add("other", node({"other": 1}), provides=("other",))
+        values, report = graph.run(None, {})
+        statuses = {name: entry["status"] for name, entry in report["nodes"].items()}
+        self.assertEqual(statuses, {"a": dag.FAILED, "b": dag.SKIPPED, "c": dag.SKIPPED, "other": dag.DONE})
+        self.assertEqual(report["nodes"]["a"]["error"], "node failed")
+        self.assertEqual(values["other"], 1)
+        self.assertNotIn("c", values)
+
+    def test_rejects_cycles(self):
+        graph = dag.Dag()
+        graph.add("a", node(), needs=("b",), provides=("a",))
+        graph.add("b", node(), needs=("a",), provides=("b",))
+        with self.assertRaises(ValueError):
+            graph.run(None, {})
+
+    def test_rejects_a_key_provided_twice(self):
+        graph = dag.Dag()
+        graph.add("a", node(), provides=("k",))
+        graph.add("b", node(), provides=("k",))
+        with self.assertRaises(ValueError):
+            graph.dependencies()
+
+    def test_node_updating_a_key_runs_between_its_provider_and_consumers(self):
+        seen = {}
+
+        def update(context, inputs):
+            return {"index": inputs["index"] + ["updated"]}
+
+        def consume(context, inputs):
+            seen["index"] = inputs["index"]
+            return {}
+
+        graph = dag.Dag()
+        graph.add("consumer", consume, needs=("index",))
+        graph.add("update", update, needs=("index",), provides=("index",))
+        graph.add("build", node({"index": ["built"]}, delay=0.02), provides=("index",))
+        values, _ = graph.run(None, {})
+        self.assertEqual(seen["index"], ["built", "updated"])
+        self.assertEqual(values["index"], ["built", "updated"])
+
+    def test_rejects_two_updates_of_a_key(self):
+        graph = dag.Dag()
+        graph.add("a", node(), provides=("k",))
+        graph.add("b", node(), needs=("k",), provides=("k",))
+        graph.add("c", node(), needs=("k",), provides=("k",))
+        with self.assertRaises(ValueError):
+            graph.dependencies()
+
+    def test_critical_path_follows_the_slowest_chain(self):
+        graph = dag.Dag()
+        graph.add("fast", node({"fast": 1}), provides=("fast",))
+        graph.add("slow", node({"slow": 1}, delay=0.1), provides=("slow",))
+        graph.add("join", node({"join": 1}), needs=("fast", "slow"), provides=("join",))
+        _, report = graph.run(None, {})
+        self.assertEqual(report["critical_path"], ["slow", "join"])
+
+    def test_logs_merged_in_the_order_nodes_were_added(self):
+        graph = dag.Dag()
+        graph.add("first", node(delay=0.05, log="first"))
+        graph.add("second", node(log="second"))
+        values, _ = graph.run(None, {"workflow_logs": ["start"]})
+        self.assertEqual(values["workflow_logs"], ["start", "first", "second"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from vro_common import dispatch
+
+
+class SlotDispatcherTest(unittest.TestCase):
+    def test_per_group_and_global_caps(self):
+        dispatcher = dispatch.SlotDispatcher(per_group_limit=2, global_limit=3)
+        for item in range(4):
+            dispatcher.add("a", f"a{item}")
+            dispatcher.add("b", f"b{item}")
+        started = dispatcher.next_items()
+        self.assertEqual(len(started), 3)
+        self.assertTrue(all(sum(1 for group, _ in started if group == name) <= 2 for name in ("a", "b")))
+        self.assertEqual(dispatcher.next_items(), [])
+        self.assertEqual(dispatcher.pending(), 5)
+
+    def test_release_lets_the_next_item_of_the_group_in(self):
+        dispatcher = dispatch.SlotDispatcher(per_group_limit=1, global_limit=10)
+        for item in ("a0", "a1"):
+            dispatcher.add("a", item)
+        self.assertEqual(dispatcher.next_items(), [("a", "a0")])
+        self.assertEqual(dispatcher.next_items(), [])
+        dispatcher.release("a")
+        self.assertEqual(dispatcher.next_items(), [("a", "a1")])
+        dispatcher.release("a")
+        self.assertEqual((dispatcher.running, dispatcher.pending()), (0, 0))
+
+    def test_heaviest_items_first_equal_weights_in_order(self):
+        dispatcher = dispatch.SlotDispatcher(per_group_limit=1, global_limit=1)
+        for item, weight in (("small", 1), ("big", 9), ("medium-1", 5), ("medium-2", 5)):
+            dispatcher.add("a", item, weight)
+        order = []
+        while dispatcher.pending():
+            [(group, item)] = dispatcher.next_items()
+            order.append(item)
+            dispatcher.release(group)
+        self.assertEqual(order, ["big", "medium-1", "medium-2", "small"])
+
+    def test_group_with_most_queued_weight_served_first(self):
+        dispatcher = dispatch.SlotDispatcher(per_group_limit=1, global_limit=1)
+        dispatcher.add("light", "l", 1)
+        dispatcher.add("heavy", "h1", 3)
+        dispatcher.add("heavy", "h2", 3)
+        self.assertEqual(dispatcher.next_items(), [("heavy", "h1")])
+
+    def test_limits_are_at_least_one(self):
+        dispatcher = dispatch.SlotDispatcher(per_group_limit=0, global_limit=0)
+        dispatcher.add("a", "a0")
+        self.assertEqual(dispatcher.next_items(), [("a", "a0")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import gzip
+import io
+import json
+import os
+import unittest
+from unittest import mock
+
+from vro_common import http_pool, json_stream
+
+CHUNK_SIZES = (1, 2, 3, 7, 64, 4096)
+
+
+class ChunkedStream:
+    # Byte stream handing out at most `size` bytes per read, as a socket would
+    def __init__(self, data, size):
+        self._data = io.BytesIO(data)
+        self._size = size
+
+    def read(self, amount=-1):
+        if amount is None or amount < 0:
+            return self._data.read(self._size)
+        return self._data.read(min(amount, self._size))
+
+
+class IterArrayCases:
+    # Shapes both backends must read the same way
+    def items(self, document, key="Refs", fields=None, chunk_size=7, read_size=None):
+        data = document if isinstance(document, bytes) else json.dumps(document).encode()
+        stream = ChunkedStream(data, read_size or chunk_size)
+        return list(json_stream.iter_array(stream, key, fields=fields, chunk_size=chunk_size))
+
+    def test_every_chunk_size_gives_the_same_items(self):
+        refs = [{"Name": f"vm-{i}", "UID": f"urn:veeam:VmRestorePoint:{i}", "Size": i * 1.5, "Tags": [i, None, True]} for i in range(50)]
+        document = {"Links": [{"Href": "x"}], "Refs": refs, "Total": 50}
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size):
+                self.assertEqual(self.items(document, chunk_size=size), refs)
+
+    def test_number_cut_by_the_chunk_end(self):
+        # "12345" must not be read as 1, 12... when a chunk ends inside it
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size):
+                self.assertEqual(self.items(b'{"Refs": [12345, 678.25e1]}', chunk_size=size), [12345, 6782.5])
+
+    def test_multibyte_character_split_across_chunks(self):
+        refs = [{"Name": "vm-été-東京-😀"}]
+        for size in CHUNK_SIZES:
+            with self.subTest(chunk_size=size):
+                self.assertEqual(self.items({"Refs": refs}, chunk_size=size), refs)
+
+    def test_nested_refs_shape(self):
+        refs = [{"Name": "a"}, {"Name": "b"}]
+        self.assertEqual(self.items({"Refs": {"Other": [1, 2], "Refs": refs}}, chunk_size=1), refs)
+
+    def test_whitespace_and_escapes(self):
+        data = b' \n{ "Other" : "a \\" } [" ,\n  "Refs" :\t[ {"Name" : "x\\u00e9"} ,\n {"Name": "y"} ] }\n'
+        self.assertEqual(self.items(data, chunk_size=2), [{"Name": "xé"}, {"Name": "y"}])
+
+    def test_fields_keeps_only_the_given_keys(self):
+        refs = [{"Name": "a", "UID": "1", "Links": [{"Href": "h"}]}]
+        self.assertEqual(self.items({"Refs": refs}, fields=("Name", "UID", "Missing")), [{"Name": "a", "UID": "1", "Missing": None}])
+
+    def test_top_level_array(self):
+        self.assertEqual(self.items([1, {"a": 2}, "3"], key=None, chunk_size=1), [1, {"a": 2}, "3"])
+
+    def test_empty_or_absent_array(self):
+        self.assertEqual(self.items({"Refs": []}), [])
+        self.assertEqual(self.items({"Other": [1]}), [])
+
+
+@mock.patch.dict(os.environ, {"VRO_JSON_BACKEND": "stdlib"})
+class StdlibIterArrayTest(IterArrayCases, unittest.TestCase):
+    def test_backend_is_stdlib(self):
+        self.assertEqual(json_stream.backend(), "stdlib")
+
+    def test_empty_body(self):
+        self.assertEqual(self.items(b""), [])
+
+    def test_truncated_document_raises(self):
+        with self.assertRaises(ValueError):
+            self.items(b'{"Refs": [{"Name": "a"}, {"Name": ', chunk_size=4)
+
+    def test_items_are_yielded_before_the_end_is_read(self):
+        stream = ChunkedStream(b'{"Refs": [1, 2, ' + b" " * 100000 + b"3]}", 16)
+        items = json_stream.iter_array(stream, chunk_size=16)
+        self.assertEqual(next(items), 1)
+        self.assertLess(stream._data.tell(), 100)
+
+
+@unittest.skipIf(json_stream.ijson is None, "ijson is not installed")
+@mock.patch.dict(os.environ, {"VRO_JSON_BACKEND": "ijson"})
+class IjsonIterArrayTest(IterArrayCases, unittest.TestCase):
+    def test_backend_is_ijson(self):
+        self.assertEqual(json_stream.backend(), "ijson")
+
+
+class FakeRawResponse:
+    # http.client response handing out at most `size` bytes per read
+    status, reason = 200, "OK"
+
+    def __init__(self, body, size):
+        self.headers = [("Content-Type", "application/json"), ("Content-Encoding", "gzip")]
+        self.stream = ChunkedStream(gzip.compress(body), size)
+        self.reads = 0
+
+    def getheaders(self):
+        return self.headers
+
+    def read(self, amount=None):
+        self.reads += 1
+        return self.stream._data.read() if amount is None else self.stream.read(amount)
+
+
+class FakePool:
+    def __init__(self):
+        self.stats = {"wire_bytes": 0, "body_bytes": 0}
+
+
+class StreamedResponseTest(unittest.TestCase):
+    REFS = [{"Name": f"vm-{i}", "UID": str(i)} for i in range(200)]
+
+    def response(self):
+        return http_pool.StreamedResponse(FakePool(), None, FakeRawResponse(json.dumps({"Refs": self.REFS}).encode(), 5))
+
+    def test_read_zero_consumes_nothing(self):
+        # ijson probes the stream type with read(0)
+        response = self.response()
+        self.assertEqual(response.read(0), b"")
+        first = response.read(64)
+        reads = response._response.reads
+        self.assertEqual(response.read(0), b"")
+        self.assertEqual(response._response.reads, reads)
+        self.assertEqual(json.loads(first + response.read()), {"Refs": self.REFS})
+
+    def test_every_backend_reads_the_gzip_stream(self):
+        backends = ["stdlib"] if json_stream.ijson is None else ["stdlib", "ijson"]
+        for name in backends:
+            with self.subTest(backend=name), mock.patch.dict(os.environ, {"VRO_JSON_BACKEND": name}):
+                self.assertEqual(list(json_stream.iter_array(self.response(), fields=("Name",), chunk_size=16)),
+                                 [{"Name": ref["Name"]} for ref in self.REFS])
+
+
+if __name__ == "__main__":
+    unittest.main()
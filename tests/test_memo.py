@@ -0,0 +1,153 @@
+import threading
+import unittest
+from unittest import mock
+
+from vro_common import http_pool, memo
+
+VEM = "https://vem.example:9398"
+VBR = "https://vbr.example:9419"
+SESSION = {"Accept": "application/json", "X-RestSvcSessionId": "session-1"}
+
+
+class FakeResponse:
+    def __init__(self, status=200, body=b"{}"):
+        self.status = status
+        self.reason = "OK"
+        self._body = body
+
+    def read(self, amount=None):
+        return self._body
+
+    def getheader(self, name, default=None):
+        return default
+
+    def getheaders(self):
+        return []
+
+
+class Fetcher:
+    # Counts the requests that reached the "server"
+    def __init__(self, status=200):
+        self.calls = 0
+        self.status = status
+
+    def __call__(self):
+        self.calls += 1
+        return FakeResponse(self.status)
+
+
+class MemoTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(memo, "_enabled", True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        memo.start_run()
+        self.addCleanup(memo.start_run)
+
+    def test_repeated_get_is_served_from_the_cache(self):
+        fetch = Fetcher()
+        first = memo.get(f"{VEM}/api/jobs", SESSION, fetch)
+        self.assertIs(memo.get(f"{VEM}/api/jobs", SESSION, fetch), first)
+        self.assertEqual(fetch.calls, 1)
+        self.assertEqual(memo.stats["jobs"], {"hits": 1, "misses": 1, "invalidations": 0})
+
+    def test_one_entry_per_session(self):
+        fetch = Fetcher()
+        memo.get(f"{VEM}/api/jobs", SESSION, fetch)
+        memo.get(f"{VEM}/api/jobs", dict(SESSION, **{"X-RestSvcSessionId": "session-2"}), fetch)
+        self.assertEqual(fetch.calls, 2)
+
+    def test_uncached_resources_and_errors_are_not_kept(self):
+        fetch, failing = Fetcher(), Fetcher(status=500)
+        for _ in range(2):
+            memo.get(f"{VEM}/api/tasks/task-1", SESSION, fetch)
+            memo.get(f"{VEM}/api/backups", SESSION, failing)
+        self.assertEqual((fetch.calls, failing.calls), (2, 2))
+
+    def test_cached_false_reads_again_and_stores_the_new_copy(self):
+        fetch = Fetcher()
+        memo.get(f"{VEM}/api/jobs", SESSION, fetch)
+        fresh = memo.get(f"{VEM}/api/jobs", SESSION, fetch, cached=False)
+        self.assertIs(memo.get(f"{VEM}/api/jobs", SESSION, fetch), fresh)
+        self.assertEqual(fetch.calls, 2)
+
+    def test_entry_expires_after_its_ttl(self):
+        fetch = Fetcher()
+        with mock.patch.object(memo.time, "monotonic", return_value=1000.0):
+            memo.get(f"{VEM}/api/jobs", SESSION, fetch)
+        with mock.patch.object(memo.time, "monotonic", return_value=1000.0 + 301):
+            memo.get(f"{VEM}/api/jobs", SESSION, fetch)
+        self.assertEqual(fetch.calls, 2)
+
+    def test_write_to_jobs_drops_jobs_and_includes_on_every_server(self):
+        fetches = {path: Fetcher() for path in ("/api/jobs", "/api/jobs/1/includes", "/api/hierarchyRoots")}
+        for path, fetch in fetches.items():
+            memo.get(f"{VEM}{path}", SESSION, fetch)
+        # A job updated on VBR changes what VEM lists
+        memo.invalidate(f"{VBR}/api/v1/jobs/1")
+        for path, fetch in fetches.items():
+            memo.get(f"{VEM}{path}", SESSION, fetch)
+        self.assertEqual({path: fetch.calls for path, fetch in fetches.items()},
+                         {"/api/jobs": 2, "/api/jobs/1/includes": 2, "/api/hierarchyRoots": 1})
+        self.assertEqual(memo.stats["jobs"]["invalidations"], 1)
+
+    def test_write_to_includes_keeps_the_job_list(self):
+        jobs, includes = Fetcher(), Fetcher()
+        memo.get(f"{VEM}/api/jobs", SESSION, jobs)
+        memo.get(f"{VEM}/api/jobs/1/includes", SESSION, includes)
+        memo.invalidate(f"{VEM}/api/jobs/1/includes/abc")
+        memo.get(f"{VEM}/api/jobs", SESSION, jobs)
+        memo.get(f"{VEM}/api/jobs/1/includes", SESSION, includes)
+        self.assertEqual((jobs.calls, includes.calls), (1, 2))
+
+    def test_concurrent_identical_gets_send_one_request(self):
+        release = threading.Event()
+        calls = []
+
+        def slow_fetch():
+            calls.append(1)
+            release.wait(5)
+            return FakeResponse()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(memo.get(f"{VEM}/api/jobs", SESSION, slow_fetch))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+
+
+class FakePool:
+    scheme, host, port = "https", "vem.example", 9398
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, path, body=None, headers=None, timeout=None, stream=False):
+        self.requests.append((method, path))
+        return FakeResponse(202 if method != "GET" else 200)
+
+
+class HttpPoolInvalidationTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = FakePool()
+        for patcher in (mock.patch.object(memo, "_enabled", True), mock.patch.object(http_pool, "get_pool", return_value=self.pool)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        memo.start_run()
+        self.addCleanup(memo.start_run)
+
+    def test_write_through_http_pool_invalidates_the_cache(self):
+        url = f"{VEM}/api/jobs/1"
+        http_pool.request("GET", url, headers=SESSION)
+        http_pool.request("GET", url, headers=SESSION)
+        http_pool.request("POST", f"{url}?action=start", headers=SESSION)
+        http_pool.request("GET", url, headers=SESSION)
+        self.assertEqual(self.pool.requests, [("GET", "/api/jobs/1"), ("POST", "/api/jobs/1?action=start"), ("GET", "/api/jobs/1")])
+
+
+if __name__ == "__main__":
+    unittest.main()
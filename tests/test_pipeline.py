@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from vro_common import pipeline
+
+
+def vms(*ids):
+    return [{"id": vm_id, "name": f"vm-{vm_id}"} for vm_id in ids]
+
+
+class CompareVmsTest(unittest.TestCase):
+    def test_no_change(self):
+        self.assertEqual(pipeline.compare_vms(vms(1, 2), vms(2, 1)), ([], [], pipeline.NO_CHANGE))
+
+    def test_first_run_is_all_new(self):
+        added, missing, switch = pipeline.compare_vms([], vms(1, 2))
+        self.assertEqual((added, missing, switch), (vms(1, 2), [], pipeline.ALL_NEW))
+
+    def test_only_missing(self):
+        added, missing, switch = pipeline.compare_vms(vms(1, 2, 3), vms(2))
+        self.assertEqual((added, missing, switch), ([], vms(1, 3), pipeline.ONLY_MISSING))
+
+    def test_new_and_missing(self):
+        added, missing, switch = pipeline.compare_vms(vms(1, 2), vms(2, 3))
+        self.assertEqual((added, missing, switch), (vms(3), vms(1), pipeline.NEW_AND_MISSING))
+
+    def test_new_vms_next_to_known_ones_are_not_all_new(self):
+        # Same rule as the workflow: ALL_NEW only when every current VM is new
+        self.assertEqual(pipeline.compare_vms(vms(1), vms(1, 2))[2], pipeline.NEW_AND_MISSING)
+
+    def test_all_replaced(self):
+        # Every VM new but some missing too: not a first run
+        self.assertEqual(pipeline.compare_vms(vms(1), vms(2))[2], pipeline.NEW_AND_MISSING)
+
+    def test_keeps_listing_order(self):
+        added, _, _ = pipeline.compare_vms(vms(5), vms(9, 5, 7, 3))
+        self.assertEqual([vm["id"] for vm in added], [9, 7, 3])
+
+
+class RunAllTest(unittest.TestCase):
+    def test_results_in_input_order(self):
+        self.assertEqual(pipeline.run_all([3, 1, 2], lambda item: item * 10, weight=lambda item: item), [30, 10, 20])
+
+    def test_empty(self):
+        self.assertEqual(pipeline.run_all([], lambda item: item), [])
+
+
+class LoadHandlerTest(unittest.TestCase):
+    def test_loads_one_section_of_a_multi_script_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "two scripts.py")
+            with open(path, "w") as f:
+                f.write("def handler(context, inputs):\n    return 'first'\n\n" + "#" * 40 + "\n\ndef handler(context, inputs):\n    return 'second'\n")
+            self.assertEqual(pipeline.load_handler(path, 0)(None, {}), "first")
+            self.assertEqual(pipeline.load_handler(path, 1)(None, {}), "second")
+            self.assertEqual(pipeline.load_handler(path)(None, {}), "second")
+
+
+if __name__ == "__main__":
+    unittest.main()
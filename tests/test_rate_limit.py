@@ -0,0 +1,63 @@
+import email.utils
+import time
+import unittest
+
+from vro_common import rate_limit
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+    def test_delta_seconds(self):
+        self.assertEqual(rate_limit.parse_retry_after("12"), 12.0)
+        self.assertEqual(rate_limit.parse_retry_after(3), 3.0)
+        self.assertEqual(rate_limit.parse_retry_after("-5"), 0.0)
+
+    def test_http_date(self):
+        value = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(rate_limit.parse_retry_after(value), 60, delta=2)
+        past = email.utils.formatdate(time.time() - 60, usegmt=True)
+        self.assertEqual(rate_limit.parse_retry_after(past), 0.0)
+
+    def test_missing_or_invalid(self):
+        for value in (None, "", "soon"):
+            self.assertEqual(rate_limit.parse_retry_after(value), 0.0)
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+    def test_additive_increase_up_to_the_maximum(self):
+        limiter = rate_limit.AdaptiveRateLimiter(initial_rate=2.0, max_rate=3.0, increase=0.5)
+        limiter.on_success(0.1)
+        self.assertEqual(limiter.rate, 2.5)
+        for _ in range(5):
+            limiter.on_success(0.1)
+        self.assertEqual((limiter.rate, limiter.stats["peak_rate"]), (3.0, 3.0))
+
+    def test_multiplicative_decrease_down_to_the_minimum(self):
+        limiter = rate_limit.AdaptiveRateLimiter(initial_rate=4.0, min_rate=0.5, decrease=0.5)
+        limiter.on_error(429)
+        self.assertEqual(limiter.rate, 2.0)
+        limiter.on_error(500)
+        limiter.on_error()
+        limiter.on_error()
+        self.assertEqual(limiter.rate, 0.5)
+        self.assertEqual((limiter.stats["throttled"], limiter.stats["errors"]), (1, 3))
+
+    def test_slow_success_slows_down(self):
+        limiter = rate_limit.AdaptiveRateLimiter(initial_rate=4.0, slow_threshold=1.0)
+        limiter.on_success(2.0)
+        self.assertEqual((limiter.rate, limiter.stats["slow"]), (2.0, 1))
+
+    def test_retry_after_pushes_the_next_slot(self):
+        limiter = rate_limit.AdaptiveRateLimiter(initial_rate=10.0)
+        limiter.on_error(503, "30")
+        self.assertGreaterEqual(limiter._next_slot - time.monotonic(), 29)
+
+    def test_acquire_spaces_requests_by_the_rate(self):
+        limiter = rate_limit.AdaptiveRateLimiter(initial_rate=20.0)
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 20.0 - 0.01)
+
+
+if __name__ == "__main__":
+    unittest.main()
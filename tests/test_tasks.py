@@ -0,0 +1,161 @@
+import json
+import threading
+import unittest
+from unittest import mock
+
+from vro_common import http_pool, tasks
+
+VEM = "https://vem.example:9398"
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self._body = json.dumps(body).encode()
+
+    def read(self, amount=None):
+        return self._body
+
+
+class FakeVem:
+    # Answers GET /api/tasks/{id}: "Running" for `running[id]` polls, then the
+    # task's result; a task listed in `failing` answers 500 instead
+    def __init__(self, tracker=None, running=None, results=None, failing=()):
+        self.tracker = tracker
+        self.running = dict(running or {})
+        self.results = dict(results or {})
+        self.failing = set(failing)
+        self.polls = {}
+        self.intervals = {}
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, **kwargs):
+        task_id = url.rsplit("/", 1)[-1]
+        with self._lock:
+            self.polls[task_id] = self.polls.get(task_id, 0) + 1
+            if self.tracker is not None:
+                self.intervals.setdefault(task_id, []).append(self.tracker._intervals[task_id])
+            if task_id in self.failing:
+                self.failing.discard(task_id)
+                return FakeResponse(500, {"Message": "busy"})
+            if self.polls[task_id] <= self.running.get(task_id, 0):
+                return FakeResponse(200, {"State": "Running"})
+        success, message = self.results.get(task_id, (True, "done"))
+        return FakeResponse(200, {"State": "Finished", "Result": {"Success": str(success).lower(), "Message": message}})
+
+
+class TaskTrackerTest(unittest.TestCase):
+    def tracker(self, vem, **kwargs):
+        options = dict(initial_interval=0.01, max_interval=0.04, backoff=2.0, timeout=5)
+        options.update(kwargs)
+        tracker = tasks.TaskTracker(VEM, {"X-RestSvcSessionId": "s"}, **options)
+        vem.tracker = tracker
+        patcher = mock.patch.object(http_pool, "request", side_effect=vem.request)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return tracker
+
+    def test_poll_interval_backs_off_up_to_the_maximum(self):
+        vem = FakeVem(running={"t1": 4})
+        tracker = self.tracker(vem)
+        tracker.add("t1")
+        states = tracker.wait()
+        self.assertEqual(vem.intervals["t1"], [0.01, 0.02, 0.04, 0.04, 0.04])
+        self.assertEqual((states["t1"]["state"], states["t1"]["success"], states["t1"]["polls"]), (tasks.FINISHED, True, 5))
+
+    def test_on_complete_called_once_per_task_with_its_result(self):
+        vem = FakeVem(running={"ok": 1, "ko": 2}, results={"ko": (False, "Repository is full")})
+        tracker = self.tracker(vem)
+        completed = []
+        tracker.add("ok", context="vm-1", on_complete=completed.append)
+        tracker.add("ko", context="vm-2", on_complete=completed.append)
+        tracker.wait()
+        self.assertEqual(sorted((state["context"], state["success"], state["message"]) for state in completed),
+                         [("vm-1", True, "done"), ("vm-2", False, "Repository is full")])
+
+    def test_poll_errors_are_retried(self):
+        vem = FakeVem(failing={"t1"})
+        tracker = self.tracker(vem)
+        tracker.add("t1")
+        states = tracker.wait()
+        self.assertEqual((states["t1"]["state"], states["t1"]["success"]), (tasks.FINISHED, True))
+        self.assertEqual((tracker.stats["errors"], vem.polls["t1"]), (1, 2))
+
+    def test_request_budget_exhausted(self):
+        vem = FakeVem(running={"t1": 100, "t2": 100})
+        tracker = self.tracker(vem, request_budget=5)
+        completed = []
+        tracker.add("t1", on_complete=completed.append)
+        tracker.add("t2", on_complete=completed.append)
+        states = tracker.wait()
+        self.assertEqual(sum(vem.polls.values()), 5)
+        self.assertEqual({state["state"] for state in states.values()}, {tasks.UNKNOWN})
+        self.assertEqual(len(completed), 2)
+
+    def test_timeout_settles_running_tasks(self):
+        vem = FakeVem(running={"t1": 10000})
+        tracker = self.tracker(vem, timeout=0.2)
+        completed = []
+        tracker.add("t1", on_complete=completed.append)
+        states = tracker.wait()
+        self.assertEqual((states["t1"]["state"], states["t1"]["success"]), (tasks.TIMEOUT, None))
+        self.assertEqual(len(completed), 1)
+
+    def test_follow_session_completes_when_the_restore_session_stops(self):
+        session = f"{VEM}/api/restoreSessions/rs-1?format=Entity"
+        answers = {
+            f"{VEM}/api/tasks/t1": [{"State": "Running"}, {"State": "Finished", "Result": {"Success": "true"}, "Links": [{"Href": session, "Type": "RestoreSession"}]}],
+            f"{VEM}/api/tasks/t2": [{"State": "Finished", "Result": {"Success": "true"}, "Links": [{"Href": f"{VEM}/api/restoreSessions/rs-2", "Type": "RestoreSessionReference"}]}],
+            session: [{"State": "Working", "Result": "None"}, {"State": "Stopped", "Result": "Success"}],
+            f"{VEM}/api/restoreSessions/rs-2": [{"State": "Stopped", "Result": "Failed"}],
+        }
+        requested = []
+
+        def request(method, url, headers=None, **kwargs):
+            requested.append(url)
+            pending = answers[url]
+            return FakeResponse(200, pending.pop(0) if len(pending) > 1 else pending[0])
+
+        tracker = tasks.TaskTracker(VEM, {}, initial_interval=0.01, max_interval=0.02, timeout=5)
+        completed = []
+        with mock.patch.object(http_pool, "request", side_effect=request):
+            tracker.add("t1", on_complete=completed.append, follow_session=True)
+            tracker.add("t2", on_complete=completed.append, follow_session=True)
+            states = tracker.wait()
+        self.assertEqual(requested.count(session), 2)
+        self.assertEqual((states["t1"]["state"], states["t1"]["success"], states["t1"]["session"]), (tasks.FINISHED, True, session))
+        self.assertEqual((states["t2"]["success"], states["t2"]["message"]), (False, "Restore session ended with result Failed"))
+        self.assertEqual(len(completed), 2)
+
+    def test_without_follow_session_the_task_result_is_final(self):
+        vem = FakeVem()
+        tracker = self.tracker(vem)
+        tracker.add("t1")
+        self.assertEqual(tracker.wait()["t1"]["session"], None)
+        self.assertEqual(vem.polls["t1"], 1)
+
+    def test_polls_in_flight_capped_by_max_workers(self):
+        active, peak = [0], [0]
+        lock = threading.Lock()
+        vem = FakeVem()
+
+        def slow_request(method, url, headers=None, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            threading.Event().wait(0.02)
+            with lock:
+                active[0] -= 1
+            return vem.request(method, url, headers)
+
+        tracker = tasks.TaskTracker(VEM, {}, initial_interval=0.0, max_workers=2, timeout=5)
+        with mock.patch.object(http_pool, "request", side_effect=slow_request):
+            for index in range(6):
+                tracker.add(f"t{index}")
+            states = tracker.wait()
+        self.assertEqual(peak[0], 2)
+        self.assertEqual({state["state"] for state in states.values()}, {tasks.FINISHED})
+
+
+if __name__ == "__main__":
+    unittest.main()
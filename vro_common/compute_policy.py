@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from vro_common import http_pool, inventory
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_TTL = 7 * 24 * 3600  # seconds, the policy <-> VDC mapping almost never changes
+DEFAULT_SWEEP_WORKERS = 8
+POLICY_SUFFIX = "defaultpolicy"
+
+_cache_lock = threading.Lock()
+
+
+def _cache_path():
+    return os.environ.get("VRO_POLICY_CACHE") or os.path.join(inventory.private_dir(), "compute_policy_cache.json")
+
+
+def _cache_ttl():
+    return float(os.environ.get("VRO_POLICY_CACHE_TTL") or DEFAULT_CACHE_TTL)
+
+
+def _load_cache(path):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache.get("hosts") or {}
+
+
+def _save_cache(path, hosts):
+    # Write to a temporary file (created 0600) first so a concurrent reader never sees half a file
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".policy_cache_")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": CACHE_VERSION, "hosts": hosts}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class PolicyVdcIndex:
+    # Lower-cased VDC name -> (policy id, policy name) for every "*defaultpolicy"
+    # compute policy, built by one concurrent sweep of /vdcComputePolicies/{id}/vdcs.
+    # The map is kept per vCD host, in the store (inventory) when one is given or
+    # else in a JSON file, and reused until it is older than the TTL or the set
+    # of default policies changes.
+    def __init__(self, vcd_host, headers, compute_policies, log=None, max_workers=DEFAULT_SWEEP_WORKERS, store=None, ttl=None, cache_path=None):
+        self.vcd_host = vcd_host
+        self.headers = headers
+        self.log = log
+        self.max_workers = max_workers
+        self.store = store
+        self.cache_path = cache_path
+        self.ttl = _cache_ttl() if ttl is None else ttl
+        self.policies = [
+            policy for policy in compute_policies
+            if policy.get("description") and policy["description"].lower().endswith(POLICY_SUFFIX)
+        ]
+        self.fingerprint = sorted(policy.get("id") for policy in self.policies)
+        self.vdcs = None
+        self.from_cache = False
+
+    def _cached_vdcs(self):
+        if self.store is None:
+            with _cache_lock:
+                entry = _load_cache(self.cache_path or _cache_path()).get(self.vcd_host)
+            if not entry or entry.get("policies") != self.fingerprint or time.time() - entry.get("created", 0) > self.ttl:
+                return None
+            return {vdc_name: tuple(match) for vdc_name, match in entry.get("vdcs", {}).items()}
+        key = f"policies:{self.vcd_host}"
+        if self.store.get_meta(key) != self.fingerprint or not self.store.is_fresh(key, self.ttl):
+            return None
+        return self.store.policy_vdcs(self.vcd_host)
+
+    def _fetch_policy_vdcs(self, policy):
+        url = f"https://{self.vcd_host}/cloudapi/2.0.0/vdcComputePolicies/{policy.get('id')}/vdcs"
+        try:
+            response = http_pool.request("GET", url, headers=self.headers)
+            if response.status != 200:
+                return policy, None, f"Failed to get VDCs for policy {policy.get('description')}: {response.status} - {response.read().decode()}"
+            return policy, json.loads(response.read().decode()), None
+        except Exception as e:
+            return policy, None, f"Error fetching VDCs for policy {policy.get('description')}: {str(e)}"
+
+    def refresh(self):
+        vdcs = {}
+        complete = True
+        if self.policies:
+            with ThreadPoolExecutor(max_workers=max(1, min(int(self.max_workers), len(self.policies)))) as executor:
+                results = list(executor.map(self._fetch_policy_vdcs, self.policies))
+            # Policies are walked in listing order, the first one holding a VDC wins
+            for policy, policy_vdcs, error in results:
+                if error:
+                    complete = False
+                    if self.log:
+                        self.log("failure", error)
+                    continue
+                for vdc in policy_vdcs:
+                    vdcs.setdefault(vdc.get("name").lower(), (policy.get("id"), policy.get("description")))
+        self.vdcs = vdcs
+        self.from_cache = False
+        # A partial sweep is used for this run but never persisted
+        if complete and self.store is not None:
+            self.store.replace_policy_vdcs(self.vcd_host, vdcs, self.fingerprint)
+        elif complete:
+            with _cache_lock:
+                path = self.cache_path or _cache_path()
+                hosts = _load_cache(path)
+                hosts[self.vcd_host] = {"created": time.time(), "policies": self.fingerprint, "vdcs": vdcs}
+                _save_cache(path, hosts)
+        return vdcs
+
+    def lookup(self, vdc_name):
+        # Returns (policy id, policy name) or None
+        if self.vdcs is None:
+            self.vdcs = self._cached_vdcs()
+            self.from_cache = self.vdcs is not None
+            if self.vdcs is None:
+                self.refresh()
+        match = self.vdcs.get(vdc_name.lower())
+        if match is None and self.from_cache:
+            # VDC created since the cache was written: sweep again once
+            self.refresh()
+            match = self.vdcs.get(vdc_name.lower())
+        return match
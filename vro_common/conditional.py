@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+from vro_common import memo
+
+# Large collections worth a conditional GET: the body is kept with its ETag /
+# Last-Modified and served again when the server answers 304 Not Modified
+CONDITIONAL_PATHS = [
+    re.compile(r"/api/(jobs|backups|vmRestorePoints|query)/?"),
+    re.compile(r"/api/jobs/[^/]+/includes/?"),
+    re.compile(r"/api/v1/(jobs|backups|backupInfrastructure/repositories)/?"),
+    re.compile(r"/cloudapi/\d+\.\d+\.\d+/(vdcs|vms|vdcComputePolicies)/?"),
+]
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # bodies kept in memory, least recently used dropped first
+
+_settings = {
+    "max_bytes": int(os.environ.get("VRO_VALIDATOR_CACHE_BYTES", DEFAULT_MAX_BYTES)),
+    # Bodies are also written here, so the next workflow run can revalidate them
+    "cache_dir": os.environ.get("VRO_VALIDATOR_CACHE_DIR") or None,
+}
+_entries = OrderedDict()  # key -> {"etag", "last_modified", "headers", "body"}
+_size = 0
+_lock = threading.Lock()
+stats = {"revalidated": 0, "not_modified": 0, "bytes_saved": 0}
+
+
+def is_conditional(url):
+    path = urllib.parse.urlparse(url).path
+    return any(pattern.fullmatch(path) for pattern in CONDITIONAL_PATHS)
+
+
+def _key(url, headers):
+    # One entry per session too: a body is never served to another user. Only
+    # the hash of the key is kept, so the session token is not written to disk.
+    headers = {name.lower(): value for name, value in (headers or {}).items()}
+    parts = [url, headers.get("accept") or ""] + [headers.get(name) or "" for name in memo.SESSION_HEADERS]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _write_private(path, data):
+    # Bodies hold inventory data: readable by the vRO runtime user only
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+        f.write(data)
+
+
+def _disk_path(key):
+    return os.path.join(_settings["cache_dir"], key) if _settings["cache_dir"] else None
+
+
+def _lookup(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries.move_to_end(key)
+            return entry
+    path = _disk_path(key)
+    if not path:
+        return None
+    try:
+        with open(path + ".json") as f:
+            entry = json.load(f)
+        with open(path + ".body", "rb") as f:
+            entry["body"] = f.read()
+    except (OSError, ValueError):
+        return None
+    _remember(key, entry, write=False)
+    return entry
+
+
+def _remember(key, entry, write=True):
+    global _size
+    with _lock:
+        previous = _entries.pop(key, None)
+        if previous is not None:
+            _size -= len(previous["body"])
+        _entries[key] = entry
+        _size += len(entry["body"])
+        while _size > _settings["max_bytes"] and len(_entries) > 1:
+            _, dropped = _entries.popitem(last=False)
+            _size -= len(dropped["body"])
+    path = _disk_path(key) if write else None
+    if path:
+        try:
+            os.makedirs(_settings["cache_dir"], mode=0o700, exist_ok=True)
+            _write_private(path + ".body.tmp", entry["body"])
+            _write_private(path + ".json.tmp", json.dumps({name: value for name, value in entry.items() if name != "body"}).encode())
+            os.replace(path + ".body.tmp", path + ".body")
+            os.replace(path + ".json.tmp", path + ".json")
+        except OSError:
+            pass
+
+
+def request(url, headers, send, make_response):
+    # send(headers) makes the GET; make_response(status, reason, headers, body)
+    # builds what the caller gets back. A 304 is turned into the stored 200.
+    key = _key(url, headers)
+    entry = _lookup(key)
+    headers = dict(headers or {})
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        stats["revalidated"] += 1
+    response = send(headers)
+    if response.status == 304 and entry is not None:
+        stats["not_modified"] += 1
+        stats["bytes_saved"] += len(entry["body"])
+        return make_response(200, "OK", [tuple(header) for header in entry["headers"]], entry["body"])
+    if response.status == 200:
+        etag, last_modified = response.getheader("ETag"), response.getheader("Last-Modified")
+        if etag or last_modified:
+            _remember(key, {"etag": etag, "last_modified": last_modified, "headers": response.getheaders(), "body": response.read()})
+    return response
+
+
+def summary():
+    return f"{stats['not_modified']}/{stats['revalidated']} collections not modified, {stats['bytes_saved']} bytes not downloaded again"
@@ -0,0 +1,118 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+
+DEFAULT_DAG_WORKERS = 4
+
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Dag:
+    # Runs vRO action handlers as a graph: each node names the input keys it
+    # needs and the output keys it provides, a node starts as soon as the nodes
+    # providing its inputs are done, and independent nodes run concurrently.
+    # A node that needs and provides the same key updates it: it runs after the
+    # key's provider and the other nodes needing the key wait for the update.
+    # Every node logs into its own workflow_logs list; the lists are merged in
+    # the order the nodes were added once the run is over.
+    def __init__(self):
+        self.nodes = {}
+
+    def add(self, name, handler, needs=(), provides=()):
+        self.nodes[name] = {"handler": handler, "needs": tuple(needs), "provides": tuple(provides)}
+        return self
+
+    def dependencies(self):
+        producers = {}
+        updaters = {}
+        for name, node in self.nodes.items():
+            for key in node["provides"]:
+                owners = updaters if key in node["needs"] else producers
+                if key in owners:
+                    raise ValueError(f"Key {key} provided by both {owners[key]} and {name}")
+                owners[key] = name
+
+        def provider(name, key):
+            if key in updaters and updaters[key] != name:
+                return updaters[key]
+            return producers.get(key)
+
+        dependencies = {
+            name: {provider(name, key) for key in node["needs"] if provider(name, key) not in (None, name)}
+            for name, node in self.nodes.items()
+        }
+        # Kahn's walk only to reject cycles before anything runs
+        remaining = {name: set(needed) for name, needed in dependencies.items()}
+        while remaining:
+            ready = [name for name, needed in remaining.items() if not needed]
+            if not ready:
+                raise ValueError(f"Dependency cycle between {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for needed in remaining.values():
+                needed.difference_update(ready)
+        return dependencies
+
+    def run(self, context, inputs, max_workers=DEFAULT_DAG_WORKERS):
+        # Returns (values, report): the inputs plus every provided key, and
+        # per-node timings with the critical path of the run
+        dependencies = self.dependencies()
+        values = dict(inputs)
+        logs = {name: [] for name in self.nodes}
+        report = {"nodes": {}, "critical_path": [], "total": 0.0}
+        waiting = dict(dependencies)
+        started = time.monotonic()
+
+        def execute(name, node_inputs):
+            node_started = time.monotonic()
+            try:
+                return name, self.nodes[name]["handler"](context, node_inputs) or {}, None, node_started
+            except Exception as e:
+                return name, None, e, node_started
+
+        executor = ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+        in_flight = set()
+        try:
+            while waiting or in_flight:
+                for name in [name for name, needed in waiting.items() if all(report["nodes"].get(dep, {}).get("status") == DONE for dep in needed)]:
+                    del waiting[name]
+                    # Inputs are copied here, on the only thread that writes values
+                    in_flight.add(executor.submit(execute, name, dict(values, workflow_logs=logs[name])))
+                # Nodes behind a failed or skipped one never start
+                for name in [name for name, needed in waiting.items() if any(report["nodes"].get(dep, {}).get("status") in (FAILED, SKIPPED) for dep in needed)]:
+                    del waiting[name]
+                    report["nodes"][name] = {"status": SKIPPED, "start": None, "end": None, "duration": 0.0}
+                if not in_flight:
+                    continue
+                done, in_flight = wait_futures(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, outputs, error, node_started = future.result()
+                    ended = time.monotonic()
+                    entry = {"status": DONE if error is None else FAILED, "start": round(node_started - started, 3), "end": round(ended - started, 3), "duration": round(ended - node_started, 3)}
+                    if error is None:
+                        for key in self.nodes[name]["provides"]:
+                            values[key] = outputs.get(key)
+                        # Handlers that start a new list when given an empty one return it instead
+                        if isinstance(outputs.get("workflow_logs"), list):
+                            logs[name] = outputs["workflow_logs"]
+                    else:
+                        entry["error"] = str(error)
+                    report["nodes"][name] = entry
+        finally:
+            executor.shutdown(wait=True)
+        report["total"] = round(time.monotonic() - started, 3)
+
+        # Critical path: from the node that ended last, walk back through the
+        # dependency that ended last, i.e. the one its start was waiting for
+        ran = {name: entry for name, entry in report["nodes"].items() if entry["end"] is not None}
+        # Ends are rounded to the millisecond: on a tie the node that started later waited on the other
+        current = max(ran, key=lambda name: (ran[name]["end"], ran[name]["start"])) if ran else None
+        while current:
+            report["critical_path"].insert(0, current)
+            gating = [dep for dep in dependencies[current] if dep in ran]
+            current = max(gating, key=lambda name: (ran[name]["end"], ran[name]["start"])) if gating else None
+        values["workflow_logs"] = list(inputs.get("workflow_logs") or [])
+        for name in self.nodes:
+            values["workflow_logs"].extend(logs[name])
+        return values, report
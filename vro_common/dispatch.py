@@ -0,0 +1,55 @@
+from collections import deque
+
+DEFAULT_PER_GROUP_LIMIT = 2
+DEFAULT_GLOBAL_LIMIT = 8
+
+
+class SlotDispatcher:
+    # Hands out queued work items under a per-group cap (repository, proxy,
+    # vPower NFS host...) and a global cap. Heaviest items start first and the
+    # group with the most queued weight is served first, so the longest chains
+    # of work begin early and the run does not end on one overloaded group.
+    def __init__(self, per_group_limit=DEFAULT_PER_GROUP_LIMIT, global_limit=DEFAULT_GLOBAL_LIMIT):
+        self.per_group_limit = max(1, int(per_group_limit))
+        self.global_limit = max(1, int(global_limit))
+        self._queues = {}
+        self._queued_weight = {}
+        self._running = {}
+        self.running = 0
+
+    def add(self, group, item, weight=1.0):
+        self._queues.setdefault(group, []).append((weight, item))
+        self._queued_weight[group] = self._queued_weight.get(group, 0.0) + weight
+        self._running.setdefault(group, 0)
+
+    def pending(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _sorted_queue(self, group):
+        queue = self._queues[group]
+        if not isinstance(queue, deque):
+            # Stable sort: equal weights keep their submission order
+            queue = self._queues[group] = deque(sorted(queue, key=lambda entry: -entry[0]))
+        return queue
+
+    def next_items(self):
+        # Returns [(group, item)] that may start now and counts them as running
+        started = []
+        while self.running < self.global_limit:
+            ready = [
+                group for group, queue in self._queues.items()
+                if queue and self._running[group] < self.per_group_limit
+            ]
+            if not ready:
+                break
+            group = max(ready, key=lambda name: self._queued_weight[name])
+            weight, item = self._sorted_queue(group).popleft()
+            self._queued_weight[group] -= weight
+            self._running[group] += 1
+            self.running += 1
+            started.append((group, item))
+        return started
+
+    def release(self, group):
+        self._running[group] -= 1
+        self.running -= 1
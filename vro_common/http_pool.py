@@ -0,0 +1,361 @@
+import http.client
+import os
+import ssl
+import threading
+import time
+import urllib.parse
+import zlib
+
+from vro_common import conditional, memo, retry, tls
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_IDLE_TIMEOUT = 30  # seconds a keep-alive socket may stay unused
+DEFAULT_TIMEOUT = 10
+ACCEPT_ENCODING = "gzip, deflate"
+
+# Errors raised when a kept-alive socket was closed by the server while idle
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+    ssl.SSLEOFError,
+    ssl.SSLZeroReturnError,
+)
+
+_settings = {
+    "pool_size": int(os.environ.get("VRO_HTTP_POOL_SIZE", DEFAULT_POOL_SIZE)),
+    "idle_timeout": float(os.environ.get("VRO_HTTP_IDLE_TIMEOUT", DEFAULT_IDLE_TIMEOUT)),
+}
+_pools = {}
+_pools_lock = threading.Lock()
+_host_limits = {}  # (scheme, host, port) -> concurrent requests allowed, overrides pool_size
+_request_listeners = []  # called with the headers of every request, e.g. to see which session is in use
+
+
+class PooledResponse:
+    # Fully-read response: the socket is back in the pool once this exists,
+    # so handlers can keep using .status / .reason / .read() / .getheader()
+    def __init__(self, status, reason, headers, data):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.data = data
+
+    def read(self):
+        return self.data
+
+    def getheader(self, name, default=None):
+        for key, value in self.headers:
+            if key.lower() == name.lower():
+                return value
+        return default
+
+    def getheaders(self):
+        return list(self.headers)
+
+    # Same use as a StreamedResponse, for the error answers of stream()
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def decode_body(data, headers):
+    # Undoes Content-Encoding: callers always read the plain body
+    encoding = next((value.strip().lower() for name, value in headers if name.lower() == "content-encoding"), None)
+    if not data or encoding not in ("gzip", "x-gzip", "deflate"):
+        return data, headers
+    if encoding == "deflate":
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header
+            data = zlib.decompress(data, -zlib.MAX_WBITS)
+    else:
+        data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return data, [(name, value) for name, value in headers if name.lower() not in ("content-encoding", "content-length")]
+
+
+class StreamedResponse:
+    # Response whose body is read from the socket as the caller asks for it,
+    # decompressed on the fly. The connection goes back to the pool on close().
+    DRAIN_LIMIT = 64 * 1024  # unread bytes still drained at close() to keep the socket
+
+    def __init__(self, pool, conn, response):
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.getheaders()
+        self._pool = pool
+        self._conn = conn
+        self._response = response
+        encoding = (self.getheader("Content-Encoding") or "").strip().lower()
+        # 32 + MAX_WBITS reads both the gzip and the zlib header
+        self._decoder = zlib.decompressobj(32 + zlib.MAX_WBITS) if encoding in ("gzip", "x-gzip", "deflate") else None
+        self._raw_deflate = encoding == "deflate"
+        self._closed = False
+
+    def getheader(self, name, default=None):
+        return PooledResponse.getheader(self, name, default)
+
+    def getheaders(self):
+        return list(self.headers)
+
+    def _decode(self, data, final):
+        if self._decoder is None:
+            return data
+        try:
+            output = self._decoder.decompress(data)
+        except zlib.error:
+            if not self._raw_deflate:
+                raise
+            # Raw deflate without the zlib header
+            self._decoder, self._raw_deflate = zlib.decompressobj(-zlib.MAX_WBITS), False
+            output = self._decoder.decompress(data)
+        return output + self._decoder.flush() if final else output
+
+    def read(self, amount=None):
+        if amount is None:
+            data = self._response.read()
+            self._pool.stats["wire_bytes"] += len(data)
+            data = self._decode(data, True)
+            self._pool.stats["body_bytes"] += len(data)
+            return data
+        if amount == 0:
+            # ijson probes the stream type with read(0): nothing may be consumed
+            return b""
+        while True:
+            data = self._response.read(amount)
+            self._pool.stats["wire_bytes"] += len(data)
+            output = self._decode(data, not data)
+            # A compressed chunk can decode to nothing yet: keep reading
+            if output or not data:
+                self._pool.stats["body_bytes"] += len(output)
+                return output
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        reusable = False
+        try:
+            if not self._response.isclosed():
+                self._response.read(self.DRAIN_LIMIT)
+            reusable = self._response.isclosed() and not self._response.will_close
+        except Exception:
+            reusable = False
+        self._pool._checkin(self._conn, reusable)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConnectionPool:
+    def __init__(self, scheme, host, port, pool_size=DEFAULT_POOL_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._idle = []  # [(conn, last_used)]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self.stats = {"created": 0, "reused": 0, "reconnects": 0, "wire_bytes": 0, "body_bytes": 0}
+
+    def _new_connection(self, timeout):
+        self.stats["created"] += 1
+        if self.scheme == "https":
+            # Shared TLS context, resumed TLS sessions and certificate pins
+            return tls.ResumingHTTPSConnection(self.host, self.port, timeout=timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _evict_expired(self, now):
+        fresh = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.idle_timeout:
+                conn.close()
+            else:
+                fresh.append((conn, last_used))
+        self._idle = fresh
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict_expired(time.monotonic())
+
+    def _checkout(self, timeout):
+        self._slots.acquire()
+        with self._lock:
+            self._evict_expired(time.monotonic())
+            if self._idle:
+                conn, _ = self._idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                self.stats["reused"] += 1
+                return conn, True
+        return self._new_connection(timeout), False
+
+    def _checkin(self, conn, reusable):
+        if reusable:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        else:
+            conn.close()
+        self._slots.release()
+
+    def request(self, method, path, body=None, headers=None, timeout=DEFAULT_TIMEOUT, stream=False):
+        # stream=True leaves a successful body on the socket (StreamedResponse);
+        # error bodies are always read, they are small
+        headers = dict(headers or {})
+        if not any(name.lower() == "accept-encoding" for name in headers):
+            headers["Accept-Encoding"] = ACCEPT_ENCODING
+        while True:
+            conn, reused = self._checkout(timeout)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                if stream and response.status < 400:
+                    return StreamedResponse(self, conn, response)
+                data = response.read()
+            except STALE_CONNECTION_ERRORS:
+                self._checkin(conn, False)
+                if not reused:
+                    raise
+                # The server dropped an idle keep-alive socket, retry on a new one
+                self.stats["reconnects"] += 1
+                continue
+            except Exception:
+                self._checkin(conn, False)
+                raise
+            self._checkin(conn, not response.will_close)
+            response_headers = response.getheaders()
+            self.stats["wire_bytes"] += len(data)
+            data, response_headers = decode_body(data, response_headers)
+            self.stats["body_bytes"] += len(data)
+            return PooledResponse(response.status, response.reason, response_headers, data)
+
+    def close(self):
+        with self._lock:
+            for conn, _ in self._idle:
+                conn.close()
+            self._idle = []
+
+
+def configure(pool_size=None, idle_timeout=None):
+    # Only affects pools created after the call
+    if pool_size is not None:
+        _settings["pool_size"] = int(pool_size)
+    if idle_timeout is not None:
+        _settings["idle_timeout"] = float(idle_timeout)
+
+
+def origin(url):
+    # "https://host:9398/api" -> "https://host:9398"
+    parsed_url = urllib.parse.urlparse(url)
+    return f"{parsed_url.scheme or 'https'}://{parsed_url.netloc}"
+
+
+def _pool_key(url):
+    parsed_url = urllib.parse.urlparse(url if "//" in url else f"https://{url}")
+    scheme = parsed_url.scheme or "https"
+    return scheme, parsed_url.hostname, parsed_url.port or (443 if scheme == "https" else 80)
+
+
+def set_limit(url, max_concurrent):
+    # Caps the requests in flight to one endpoint for every caller of the process.
+    # A pool already open is replaced: requests running on it finish normally.
+    key = _pool_key(url)
+    with _pools_lock:
+        _host_limits[key] = max(1, int(max_concurrent))
+        pool = _pools.pop(key, None)
+    if pool is not None:
+        pool.close()
+
+
+def on_request(listener):
+    if listener not in _request_listeners:
+        _request_listeners.append(listener)
+
+
+def _notify(headers):
+    for listener in _request_listeners:
+        try:
+            listener(headers or {})
+        except Exception as e:
+            print(f"Request listener failed: {str(e)}")
+
+
+def get_pool(url):
+    key = _pool_key(url)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            scheme, host, port = key
+            pool = ConnectionPool(scheme, host, port, _host_limits.get(key, _settings["pool_size"]), _settings["idle_timeout"])
+            _pools[key] = pool
+        return pool
+
+
+def request(method, url, headers=None, body=None, timeout=DEFAULT_TIMEOUT, policy=None, idempotent=None, cached=True):
+    # Retried by the policy (default: retry.default_policy()) behind the circuit
+    # breaker of the endpoint; idempotent overrides the class given by the method.
+    # GETs of the resources listed in memo are served from the run cache
+    # (cached=False forces a new read), writes invalidate it. The collections
+    # listed in conditional are revalidated with their ETag / Last-Modified.
+    parsed_url = urllib.parse.urlparse(url)
+    path = (parsed_url.path or "/") + ("?" + parsed_url.query if parsed_url.query else "")
+    pool = get_pool(url)
+    _notify(headers)
+
+    def send(request_headers=headers):
+        return (policy or retry.default_policy()).call(
+            method, lambda: pool.request(method, path, body=body, headers=request_headers, timeout=timeout),
+            f"{pool.scheme}://{pool.host}:{pool.port}", idempotent)
+
+    if method.upper() == "GET":
+        # Run cache first, then a conditional GET revalidating the stored body
+        if conditional.is_conditional(url):
+            return memo.get(url, headers, lambda: conditional.request(url, headers, send, PooledResponse), cached)
+        return memo.get(url, headers, send, cached)
+    if method.upper() == "HEAD":
+        return send()
+    try:
+        return send()
+    finally:
+        memo.invalidate(url)
+
+
+def stream(method, url, headers=None, body=None, timeout=DEFAULT_TIMEOUT, policy=None, idempotent=None):
+    # Like request(), but a successful body is left on the socket: use the result
+    # as a context manager and read it in chunks. Bypasses the run and validator
+    # caches; the retry policy only covers getting the response headers.
+    parsed_url = urllib.parse.urlparse(url)
+    path = (parsed_url.path or "/") + ("?" + parsed_url.query if parsed_url.query else "")
+    pool = get_pool(url)
+    _notify(headers)
+    return (policy or retry.default_policy()).call(
+        method, lambda: pool.request(method, path, body=body, headers=headers, timeout=timeout, stream=True),
+        f"{pool.scheme}://{pool.host}:{pool.port}", idempotent)
+
+
+def summary():
+    # Run cache, conditional GETs and compression, for the logs
+    with _pools_lock:
+        wire = sum(pool.stats["wire_bytes"] for pool in _pools.values())
+        plain = sum(pool.stats["body_bytes"] for pool in _pools.values())
+    return f"{memo.summary()}; {conditional.summary()}; {wire} bytes received for {plain} bytes of content"
+
+
+def close_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+SCHEMA_VERSION = 2
+# Seconds before a stored collection is fetched again
+DEFAULT_VDC_TTL = 24 * 3600
+DEFAULT_VM_TTL = 0  # VM lists drive the nightly compare: refreshed every run unless told otherwise
+DEFAULT_INCLUDES_TTL = 15 * 60  # written through by the add/remove steps, but also changed from the VEM console
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT, updated_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS vdcs (name TEXT PRIMARY KEY, id TEXT);
+CREATE TABLE IF NOT EXISTS vms (id TEXT PRIMARY KEY, name TEXT NOT NULL, vdc TEXT NOT NULL, vapp TEXT);
+CREATE INDEX IF NOT EXISTS vms_vdc ON vms (vdc);
+CREATE INDEX IF NOT EXISTS vms_vapp ON vms (vapp);
+CREATE TABLE IF NOT EXISTS jobs (uid TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS includes (job_uid TEXT NOT NULL, vm_id TEXT NOT NULL, object_in_job_id TEXT, PRIMARY KEY (job_uid, vm_id));
+CREATE INDEX IF NOT EXISTS includes_vm ON includes (vm_id);
+CREATE TABLE IF NOT EXISTS policy_vdcs (vcd_host TEXT NOT NULL, vdc TEXT NOT NULL, policy_id TEXT NOT NULL, policy_name TEXT, PRIMARY KEY (vcd_host, vdc));
+"""
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def private_dir():
+    # Directory of the temp dir only the vRO runtime user can enter
+    directory = os.path.join(tempfile.gettempdir(), f"vro_inventory-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not os.path.isdir(directory) or os.path.islink(directory) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"Inventory directory {directory} is not private to the current user")
+    return directory
+
+
+def _db_path():
+    return os.environ.get("VRO_INVENTORY_DB") or os.path.join(private_dir(), "inventory.sqlite3")
+
+
+def open_store(path=None):
+    # One store per database file and process, shared by every action of the run
+    path = path or _db_path()
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = InventoryStore(path)
+        return store
+
+
+class InventoryStore:
+    # Inventory kept between runs: VDCs, VMs per VDC, backup jobs, job includes
+    # and compute policy <-> VDC mappings. Every collection has a "refreshed at"
+    # entry in meta so callers can reuse it while it is younger than their TTL.
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        # Created readable by its owner only; SQLite gives its journals the same mode
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._db:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                # Older layout: start again from an empty inventory
+                for table in ("meta", "vdcs", "vms", "jobs", "includes", "policy_vdcs"):
+                    self._db.execute(f"DROP TABLE IF EXISTS {table}")
+                self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # Freshness bookkeeping
+
+    def refreshed_at(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT updated_at FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self, key, ttl):
+        refreshed_at = self.refreshed_at(key)
+        return refreshed_at is not None and time.time() - refreshed_at < ttl
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def _touch(self, key, value=None):
+        self._db.execute(
+            "INSERT OR REPLACE INTO meta (key, value, updated_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value) if value is not None else None, time.time())
+        )
+
+    def set_meta(self, key, value):
+        with self._lock, self._db:
+            self._touch(key, value)
+
+    # VDCs
+
+    def vdcs(self):
+        with self._lock:
+            return [{"name": name, "id": vdc_id} for name, vdc_id in self._db.execute("SELECT name, id FROM vdcs ORDER BY rowid")]
+
+    def replace_vdcs(self, vdcs):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM vdcs")
+            self._db.executemany("INSERT OR REPLACE INTO vdcs (name, id) VALUES (?, ?)", [(vdc["name"], vdc.get("id")) for vdc in vdcs])
+            self._touch("vdcs")
+
+    # VMs
+
+    def vms(self, vdc_name):
+        with self._lock:
+            rows = self._db.execute("SELECT id, name FROM vms WHERE vdc = ? ORDER BY rowid", (vdc_name.lower(),))
+            return [{"name": name, "id": vm_id} for vm_id, name in rows]
+
+    def replace_vms(self, vdc_name, vms, state=None):
+        # state: optional JSON value kept with the refresh time (see vm_sync)
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM vms WHERE vdc = ?", (vdc_name.lower(),))
+            self._db.executemany("INSERT OR REPLACE INTO vms (id, name, vdc, vapp) VALUES (?, ?, ?, ?)", [(vm["id"], vm["name"], vdc_name.lower(), vm.get("vApp")) for vm in vms])
+            self._touch(f"vms:{vdc_name.lower()}", state)
+
+    def upsert_vm(self, vm_id, name, vdc_name, vapp=None):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO vms (id, name, vdc, vapp) VALUES (?, ?, ?, ?)", (vm_id, name, vdc_name.lower(), vapp))
+
+    def remove_vms(self, vdc_names, vm_ids=(), vapp_ids=()):
+        # Drops the given VMs and every VM of the given vApps from the given VDCs only.
+        # vApps are matched on their uuid ("urn:vcloud:vapp:<uuid>" or "<uuid>"), as
+        # the stored hrefs carry whatever public address vCD answered with
+        vdc_names = [vdc_name.lower() for vdc_name in vdc_names]
+        in_vdcs = f"vdc IN ({','.join('?' * len(vdc_names))})"
+        with self._lock, self._db:
+            self._db.executemany(f"DELETE FROM vms WHERE id = ? AND {in_vdcs}", [(vm_id, *vdc_names) for vm_id in vm_ids])
+            self._db.executemany(f"DELETE FROM vms WHERE lower(vapp) LIKE ? AND {in_vdcs}",
+                                 [(f"%/vapp-{vapp_id.rsplit(':', 1)[-1].lower()}", *vdc_names) for vapp_id in vapp_ids])
+
+    # Backup jobs and their includes
+
+    def replace_jobs(self, jobs):
+        with self._lock, self._db:
+            uids = [job["UID"] for job in jobs]
+            self._db.execute("DELETE FROM jobs")
+            self._db.executemany("INSERT INTO jobs (uid, name) VALUES (?, ?)", [(job["UID"], job.get("Name")) for job in jobs])
+            # Includes of jobs that no longer exist are dropped with them
+            self._db.execute(f"DELETE FROM includes WHERE job_uid NOT IN ({','.join('?' * len(uids))})", uids)
+            self._touch("jobs")
+
+    def includes(self, job_uid):
+        with self._lock:
+            rows = self._db.execute("SELECT vm_id, object_in_job_id FROM includes WHERE job_uid = ? ORDER BY rowid", (job_uid,))
+            return [(vm_id, object_in_job_id) for vm_id, object_in_job_id in rows]
+
+    def replace_includes(self, job_uid, includes):
+        # includes: [(vm_id, object_in_job_id)]
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM includes WHERE job_uid = ?", (job_uid,))
+            self._db.executemany("INSERT OR REPLACE INTO includes (job_uid, vm_id, object_in_job_id) VALUES (?, ?, ?)", [(job_uid, vm_id, object_in_job_id) for vm_id, object_in_job_id in includes])
+            self._touch(f"includes:{job_uid}")
+
+    def add_include(self, job_uid, vm_id, object_in_job_id=None):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO includes (job_uid, vm_id, object_in_job_id) VALUES (?, ?, ?)", (job_uid, vm_id, object_in_job_id))
+
+    def remove_include(self, job_uid, vm_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM includes WHERE job_uid = ? AND vm_id = ?", (job_uid, vm_id))
+
+    # Compute policy <-> VDC
+
+    def policy_vdcs(self, vcd_host):
+        with self._lock:
+            rows = self._db.execute("SELECT vdc, policy_id, policy_name FROM policy_vdcs WHERE vcd_host = ?", (vcd_host,))
+            return {vdc: (policy_id, policy_name) for vdc, policy_id, policy_name in rows}
+
+    def replace_policy_vdcs(self, vcd_host, mapping, fingerprint):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM policy_vdcs WHERE vcd_host = ?", (vcd_host,))
+            self._db.executemany(
+                "INSERT INTO policy_vdcs (vcd_host, vdc, policy_id, policy_name) VALUES (?, ?, ?, ?)",
+                [(vcd_host, vdc, policy_id, policy_name) for vdc, (policy_id, policy_name) in mapping.items()]
+            )
+            self._touch(f"policies:{vcd_host}", fingerprint)
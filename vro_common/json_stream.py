@@ -0,0 +1,134 @@
+import codecs
+import json
+import os
+import re
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Only the compiled ijson backends are faster than the stdlib path below
+FAST_IJSON_BACKENDS = ("yajl2_c", "yajl2_cffi")
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_decoder = json.JSONDecoder()
+
+
+def backend():
+    # VRO_JSON_BACKEND: auto (default), ijson or stdlib
+    choice = os.environ.get("VRO_JSON_BACKEND", "auto").lower()
+    if ijson is None or choice == "stdlib":
+        return "stdlib"
+    if choice == "ijson" or getattr(ijson, "backend", "") in FAST_IJSON_BACKENDS:
+        return "ijson"
+    return "stdlib"
+
+
+class _Reader:
+    # Text window over a byte stream: only the part not parsed yet is kept
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        self.eof = not chunk
+        self.text = self.text[self.pos:] + self._utf8.decode(chunk, final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}, found '{self.peek()}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # Value cut by the end of the chunk: read more and parse it again
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the window may go on in the next chunk,
+            # including one cut right after its "." or exponent ("678." + "25e1")
+            if not self.eof and (end == len(self.text) or (isinstance(value, (int, float)) and self.text[end] in ".eE+-")):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_stdlib(stream, key, chunk_size):
+    reader = _Reader(stream, chunk_size)
+    # Skip the other members of the object until `key`; VEM may wrap the array
+    # in a second object with the same key ({"Refs": {"Refs": [...]}})
+    while key is not None and reader.peek() == "{":
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                return
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.value()
+            if reader.peek() == ",":
+                reader.pos += 1
+    if reader.peek() != "[":
+        return
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value()
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in the array, found '{separator}'")
+
+
+def _iter_ijson(stream, key):
+    # Same shapes as the stdlib path: the array under `key`, or under `key` twice
+    prefixes = ("item",) if key is None else (f"{key}.item", f"{key}.{key}.item")
+    try:
+        events = ijson.parse(stream, use_float=True)
+    except TypeError:
+        # ijson older than 3.1
+        events = ijson.parse(stream)
+    for prefix, event, _ in events:
+        item_prefix = f"{prefix}.item" if prefix else "item"
+        if event == "start_array" and item_prefix in prefixes:
+            return ijson.items(events, item_prefix)
+    return iter(())
+
+
+def iter_array(stream, key="Refs", fields=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Yields the entries of the array `key` of the top-level object (or of the
+    # top-level array when key is None) as they are read from `stream`, any object
+    # with read(size) returning bytes. With `fields`, only those keys are kept.
+    items = _iter_ijson(stream, key) if backend() == "ijson" else _iter_stdlib(stream, key, chunk_size)
+    for item in items:
+        if fields is not None and isinstance(item, dict):
+            item = {name: item.get(name) for name in fields}
+        yield item
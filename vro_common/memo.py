@@ -0,0 +1,111 @@
+import os
+import re
+import threading
+import time
+import urllib.parse
+
+# Resource types whose GET responses are kept for the run: (path pattern, type, TTL
+# in seconds). Anything else (tasks, sessions, restore points...) is never cached.
+RESOURCE_TTLS = [
+    (re.compile(r"/api/hierarchyRoots/?"), "hierarchy_roots", 3600),
+    (re.compile(r"/api/v1/backupInfrastructure/repositories/?"), "repositories", 600),
+    (re.compile(r"/api/jobs/[^/]+/includes(/.*)?"), "includes", 60),
+    (re.compile(r"/api/(v1/)?jobs(/[^/]+)?/?"), "jobs", 300),
+    (re.compile(r"/api/backups/?"), "backups", 300),
+]
+# A write to one type drops the cached entries of these types, on every server:
+# a job created on VBR shows up in the VEM job list, a VBR job update changes
+# the includes VEM reports for it
+INVALIDATES = {
+    "jobs": ("jobs", "includes"),
+    "includes": ("includes",),
+    "repositories": ("repositories",),
+    "backups": ("backups",),
+    "hierarchy_roots": ("hierarchy_roots",),
+}
+# Headers that carry the session: one cached copy per session
+SESSION_HEADERS = ("x-restsvcsessionid", "authorization", "x-vcloud-authorization")
+
+_enabled = os.environ.get("VRO_REQUEST_CACHE", "1").lower() not in ("0", "false", "no")
+_entries = {}  # key -> (type, expires_at, response)
+_inflight = {}  # key -> Event set once the first caller stored the response
+_lock = threading.Lock()
+stats = {}
+
+
+def resource_type(url):
+    path = urllib.parse.urlparse(url).path
+    for pattern, kind, ttl in RESOURCE_TTLS:
+        if pattern.fullmatch(path):
+            return kind, ttl
+    return None, 0
+
+
+def _key(url, headers):
+    headers = {name.lower(): value for name, value in (headers or {}).items()}
+    return (url, headers.get("accept"), tuple(headers.get(name) for name in SESSION_HEADERS))
+
+
+def _count(kind, event):
+    entry = stats.setdefault(kind, {"hits": 0, "misses": 0, "invalidations": 0})
+    entry[event] += 1
+
+
+def get(url, headers, fetch, cached=True):
+    # fetch() sends the GET. cached=False skips the cached copy but stores the
+    # new one, for callers waiting on a change (a job being created...)
+    kind, ttl = resource_type(url)
+    if not _enabled or not kind or ttl <= 0:
+        return fetch()
+    key = _key(url, headers)
+    while True:
+        with _lock:
+            entry = _entries.get(key)
+            if cached and entry is not None and entry[1] > time.monotonic():
+                _count(kind, "hits")
+                return entry[2]
+            waiting = _inflight.get(key)
+            if waiting is None:
+                # Only one caller fetches, the concurrent ones wait for its answer
+                waiting = _inflight[key] = threading.Event()
+                _count(kind, "misses")
+                break
+        waiting.wait()
+        cached = True
+    try:
+        response = fetch()
+        if response.status == 200:
+            with _lock:
+                _entries[key] = (kind, time.monotonic() + ttl, response)
+        return response
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        waiting.set()
+
+
+def invalidate(url):
+    # Called after any write: drops what the write may have changed
+    kind, _ = resource_type(url)
+    if not kind:
+        return
+    dropped = INVALIDATES.get(kind, (kind,))
+    with _lock:
+        for key in [key for key, entry in _entries.items() if entry[0] in dropped]:
+            del _entries[key]
+        _count(kind, "invalidations")
+
+
+def start_run():
+    # New run: nothing cached by a previous one is trusted
+    with _lock:
+        _entries.clear()
+        stats.clear()
+
+
+def summary():
+    with _lock:
+        hits = sum(entry["hits"] for entry in stats.values())
+        misses = sum(entry["misses"] for entry in stats.values())
+        per_type = ", ".join(f"{kind} {entry['hits']}/{entry['hits'] + entry['misses']}" for kind, entry in sorted(stats.items()))
+    return f"{hits} hits, {misses} misses ({per_type or 'no cacheable request'})"
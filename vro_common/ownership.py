@@ -0,0 +1,89 @@
+import json
+
+from vro_common import inventory, vem
+
+# Job excluded from the "already protected elsewhere" check by every filter step
+IGNORED_JOB_UID = "urn:veeam:Job:cc66d047-3cbe-4ad1-ac9d-d1016c69908c"
+
+
+def vm_id_from_ref(hierarchy_obj_ref):
+    # "urn:vCloud:Vm:<root>.urn:vcloud:vm:<uuid>" -> "urn:vcloud:vm:<uuid>"
+    return hierarchy_obj_ref.split(".")[-1]
+
+
+class OwnershipIndex:
+    # VM id -> {job id: ObjectInJobId}, plus the name of every known job.
+    # Built once per P3 run and passed from one P1 iteration to the next as a
+    # plain dict (to_value / from_value) so vRO can carry it as an attribute.
+    def __init__(self, jobs=None, vms=None):
+        self.jobs = dict(jobs or {})
+        self.vms = {vm_id: dict(owners) for vm_id, owners in (vms or {}).items()}
+
+    @classmethod
+    def from_value(cls, value):
+        if not value:
+            return None
+        if isinstance(value, str):
+            value = json.loads(value)
+        return cls(value.get("jobs"), value.get("vms"))
+
+    def to_value(self):
+        return {"jobs": self.jobs, "vms": self.vms}
+
+    def __contains__(self, vm_id):
+        return vm_id in self.vms
+
+    def owners(self, vm_id):
+        return self.vms.get(vm_id, {})
+
+    def set_job(self, job_id, job_name):
+        self.jobs[job_id] = job_name
+
+    def add(self, vm_id, job_id, object_in_job_id=None):
+        self.vms.setdefault(vm_id, {})[job_id] = object_in_job_id
+
+    def remove(self, vm_id, job_id):
+        owners = self.vms.get(vm_id)
+        if owners is None:
+            return
+        owners.pop(job_id, None)
+        if not owners:
+            del self.vms[vm_id]
+
+    def protected_vm_ids(self, ignore_job):
+        # VMs included in at least one job for which ignore_job(job_id, job_name) is False
+        return {
+            vm_id for vm_id, owners in self.vms.items()
+            if any(not ignore_job(job_id, self.jobs.get(job_id) or "") for job_id in owners)
+        }
+
+
+def build_index(vem_origin, headers, jobs, skip_job=None, max_workers=vem.DEFAULT_INCLUDES_CONCURRENCY, timeout=vem.DEFAULT_INCLUDES_TIMEOUT,
+                store=None, includes_ttl=inventory.DEFAULT_INCLUDES_TTL):
+    # jobs: the "Refs" of /api/jobs. Returns (index, [(job_id, error)]).
+    # With an inventory store, the includes of a job refreshed less than
+    # includes_ttl seconds ago are read from it instead of VEM.
+    index = OwnershipIndex()
+    job_ids = []
+    for job in jobs:
+        index.set_job(job["UID"], job.get("Name"))
+        if skip_job and skip_job(job["UID"], job.get("Name") or ""):
+            continue
+        if store is not None and store.is_fresh(f"includes:{job['UID']}", includes_ttl):
+            for vm_id, object_in_job_id in store.includes(job["UID"]):
+                index.add(vm_id, job["UID"], object_in_job_id)
+            continue
+        job_ids.append(job["UID"])
+    if store is not None:
+        store.replace_jobs(jobs)
+    errors = []
+    for job_id, job_vms, error in vem.fetch_job_includes(vem_origin, headers, job_ids, max_workers=max_workers, timeout=timeout):
+        if error:
+            errors.append((job_id, error))
+            continue
+        includes = [(vm_id_from_ref(vm["HierarchyObjRef"]), vm.get("ObjectInJobId")) for vm in job_vms or []]
+        for vm_id, object_in_job_id in includes:
+            index.add(vm_id, job_id, object_in_job_id)
+        if store is not None:
+            store.replace_includes(job_id, includes)
+    return index, errors
@@ -0,0 +1,76 @@
+import importlib.util
+import os
+import re
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PARALLEL_VDCS = 4
+
+# Values of switch_1 set by "Compare and Store VMs.js"
+NO_CHANGE = 0
+ALL_NEW = 1
+NEW_AND_MISSING = -1
+ONLY_MISSING = -2
+
+# Line separating the scripts of a file holding several vRO actions ("filter vms.py")
+SCRIPT_SEPARATOR = re.compile(r"^#{10,}\s*$", re.MULTILINE)
+
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def load_handler(path, section=None):
+    # handler() of a vRO action script, loaded once per path. With `section`, only
+    # that script (0 for the first) of a file holding several ones is loaded.
+    path = os.path.abspath(path)
+    with _handlers_lock:
+        handler = _handlers.get((path, section))
+        if handler is None:
+            name = "vro_action_" + str(len(_handlers))
+            if section is None:
+                spec = importlib.util.spec_from_file_location(name, path)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+            else:
+                with open(path, encoding="utf-8") as f:
+                    source = SCRIPT_SEPARATOR.split(f.read())[section]
+                module = types.ModuleType(name)
+                module.__file__ = path
+                exec(compile(source, path, "exec"), module.__dict__)
+            handler = _handlers[(path, section)] = module.handler
+        return handler
+
+
+def compare_vms(old_vms, current_vms):
+    # Same result as "Compare and Store VMs.js": (addedVMs, missingVMs, switch_1)
+    old_ids = {vm["id"] for vm in old_vms}
+    current_ids = {vm["id"] for vm in current_vms}
+    added = [vm for vm in current_vms if vm["id"] not in old_ids]
+    missing = [vm for vm in old_vms if vm["id"] not in current_ids]
+    if not added and not missing:
+        switch = NO_CHANGE
+    elif len(added) == len(current_vms) and not missing:
+        switch = ALL_NEW
+    elif not added:
+        switch = ONLY_MISSING
+    else:
+        switch = NEW_AND_MISSING
+    return added, missing, switch
+
+
+def run_all(items, run_one, weight=None, max_workers=DEFAULT_PARALLEL_VDCS):
+    # Runs run_one(item) for every item on a shared pool and returns the results
+    # in input order. Idle workers always take the next item of one shared queue,
+    # heaviest first, so a long item never holds up the short ones behind it.
+    items = list(items)
+    order = sorted(range(len(items)), key=lambda position: -(weight(items[position]) if weight else 0))
+    results = [None] * len(items)
+
+    def run(position):
+        results[position] = run_one(items[position])
+
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(items) or 1))) as executor:
+        for future in [executor.submit(run, position) for position in order]:
+            future.result()
+    return results
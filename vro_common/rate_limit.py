@@ -0,0 +1,66 @@
+import email.utils
+import threading
+import time
+
+# Statuses meaning "slow down", the request was not processed
+THROTTLE_STATUSES = (429, 503)
+
+
+class AdaptiveRateLimiter:
+    # AIMD limiter: the allowed request rate grows by `increase` req/s after each
+    # fast success and is multiplied by `decrease` after an error, a throttling
+    # answer or a response slower than `slow_threshold` seconds.
+    def __init__(self, initial_rate=2.0, min_rate=0.2, max_rate=10.0, increase=0.5, decrease=0.5, slow_threshold=5.0):
+        self.rate = float(initial_rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+        self.stats = {"success": 0, "slow": 0, "errors": 0, "throttled": 0, "peak_rate": self.rate}
+
+    def acquire(self):
+        # Reserve the next send slot and sleep until it is due
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _slow_down(self, pause=0.0):
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._next_slot = max(self._next_slot, time.monotonic() + max(pause, 1.0 / self.rate))
+
+    def on_success(self, latency):
+        with self._lock:
+            if latency > self.slow_threshold:
+                self.stats["slow"] += 1
+                self._slow_down()
+            else:
+                self.stats["success"] += 1
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                self.stats["peak_rate"] = max(self.stats["peak_rate"], self.rate)
+
+    def on_error(self, status=None, retry_after=None):
+        with self._lock:
+            if status in THROTTLE_STATUSES:
+                self.stats["throttled"] += 1
+            else:
+                self.stats["errors"] += 1
+            self._slow_down(parse_retry_after(retry_after))
+
+
+def parse_retry_after(value):
+    # Seconds to wait, from the delta-seconds or the HTTP-date form
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return 0.0
@@ -0,0 +1,179 @@
+import http.client
+import os
+import random
+import ssl
+import threading
+import time
+
+from vro_common import rate_limit
+
+# Methods that can be sent twice without changing the result
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+# Statuses worth another try: any of them for an idempotent call, only the
+# throttling ones (request not processed) for the others
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+# Statuses counted as the server struggling by the circuit breaker
+FAILURE_STATUSES = (500, 502, 503, 504)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_settings = {
+    "max_attempts": int(os.environ.get("VRO_RETRY_ATTEMPTS", 4)),
+    "base_delay": float(os.environ.get("VRO_RETRY_BASE_DELAY", 0.5)),
+    "max_delay": float(os.environ.get("VRO_RETRY_MAX_DELAY", 30)),
+    "failure_threshold": int(os.environ.get("VRO_BREAKER_THRESHOLD", 5)),
+    "reset_timeout": float(os.environ.get("VRO_BREAKER_RESET", 30)),
+}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    # Opens after `failure_threshold` failures in a row: calls then fail at once
+    # for `reset_timeout` seconds, after which a single probe call is let through
+    # and closes the circuit again if it succeeds.
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or _settings["failure_threshold"]
+        self.reset_timeout = reset_timeout or _settings["reset_timeout"]
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.stats = {"failures": 0, "opened": 0, "rejected": 0}
+
+    def before(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.stats["rejected"] += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            raise CircuitOpenError(f"Circuit open for {self.name}: too many failures, next try in {retry_in:.0f}s")
+
+    def on_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def on_failure(self):
+        with self._lock:
+            self.stats["failures"] += 1
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.stats["opened"] += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(endpoint):
+    with _breakers_lock:
+        circuit = _breakers.get(endpoint)
+        if circuit is None:
+            circuit = _breakers[endpoint] = CircuitBreaker(endpoint)
+        return circuit
+
+
+def _retryable_error(error, idempotent):
+    if isinstance(error, (CircuitOpenError, ssl.SSLCertVerificationError)):
+        return False
+    if not idempotent:
+        # Only when the request never reached the server
+        return isinstance(error, ConnectionRefusedError)
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=None, base_delay=None, max_delay=None, max_retry_after=120.0, statuses=None):
+        self.max_attempts = max(1, int(max_attempts or _settings["max_attempts"]))
+        self.base_delay = _settings["base_delay"] if base_delay is None else base_delay
+        self.max_delay = _settings["max_delay"] if max_delay is None else max_delay
+        self.max_retry_after = max_retry_after  # a longer Retry-After is returned to the caller instead
+        self.statuses = statuses  # None: by idempotency class
+        self.stats = {"retries": 0, "gave_up": 0}
+
+    def backoff(self, attempt):
+        # Exponential backoff with full jitter: VDCs retrying together spread out
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, method, send, endpoint, idempotent=None):
+        # send() makes one attempt and returns the response; the endpoint names the
+        # circuit breaker. Returns the last response once retries are exhausted.
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_statuses = self.statuses if self.statuses is not None else RETRY_STATUSES if idempotent else rate_limit.THROTTLE_STATUSES
+        circuit = breaker(endpoint)
+        attempt = 0
+        while True:
+            circuit.before()
+            last = attempt == self.max_attempts - 1
+            try:
+                response = send()
+            except Exception as e:
+                circuit.on_failure()
+                if last or not _retryable_error(e, idempotent):
+                    self.stats["gave_up"] += 1
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                if response.status in FAILURE_STATUSES:
+                    circuit.on_failure()
+                else:
+                    circuit.on_success()
+                if response.status not in retry_statuses or last:
+                    return response
+                retry_after = rate_limit.parse_retry_after(response.getheader("Retry-After"))
+                if retry_after > self.max_retry_after:
+                    return response
+                delay = max(self.backoff(attempt), retry_after)
+            self.stats["retries"] += 1
+            attempt += 1
+            time.sleep(delay)
+
+
+_default = None
+_errors_only = None
+
+
+def default_policy():
+    global _default
+    if _default is None:
+        _default = RetryPolicy()
+    return _default
+
+
+def errors_only_policy():
+    # For handlers running their own throttling loop (AIMD limiter): connection
+    # errors are still retried, every status goes back to the limiter
+    global _errors_only
+    if _errors_only is None:
+        _errors_only = RetryPolicy(statuses=())
+    return _errors_only
+
+
+def configure(max_attempts=None, base_delay=None, max_delay=None, failure_threshold=None, reset_timeout=None):
+    # Only affects policies and breakers created after the call
+    global _default, _errors_only
+    for key, value in (("max_attempts", max_attempts), ("base_delay", base_delay), ("max_delay", max_delay),
+                       ("failure_threshold", failure_threshold), ("reset_timeout", reset_timeout)):
+        if value is not None:
+            _settings[key] = value
+    _default = None
+    _errors_only = None
@@ -0,0 +1,351 @@
+import atexit
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from vro_common import http_pool
+
+VCD = "vcd"
+VEM = "vem"
+VBR = "vbr"
+
+# Seconds a session stays valid without being used (vCD and VEM) or, for VBR,
+# when the token response has no expires_in
+DEFAULT_SESSION_TTL = {VCD: 30 * 60, VEM: 15 * 60, VBR: 15 * 60}
+DEFAULT_REFRESH_MARGIN = 120  # refresh this long before a session would expire
+DEFAULT_IDLE_TIMEOUT = 10 * 60  # log out a session no request used in that long
+REFRESH_CHECK_INTERVAL = 30
+# Headers carrying a session token; the Authorization value is "Bearer <token>"
+TOKEN_HEADERS = ("x-restsvcsessionid", "authorization", "x-vcloud-authorization")
+VBR_API_VERSION = "1.1-rev2"
+VCD_ACCEPT = "application/*;version=39.0"
+
+# Where the inputs of the handlers expect each token
+TOKEN_INPUTS = {VCD: "vCloud_token", VEM: "Token", VBR: "Token_VBR"}
+
+
+def _basic(user, password):
+    return "Basic " + base64.b64encode(f"{user}:{password}".encode()).decode()
+
+
+def _cache_path():
+    # Sessions are only shared between processes when this is set
+    return os.environ.get("VRO_SESSION_CACHE")
+
+
+class Session:
+    def __init__(self, kind, url, user, token=None, session_id=None, refresh_token=None, expires_at=0.0, last_used=0.0,
+                 previous_tokens=None):
+        self.kind = kind
+        self.url = url
+        self.user = user
+        self.token = token
+        self.session_id = session_id  # VEM logonSession id, needed to log out
+        self.refresh_token = refresh_token  # VBR only
+        self.expires_at = expires_at
+        self.last_used = last_used  # last login, hand-out or request made with the session's token
+        self.previous_tokens = previous_tokens or []  # [token, expires_at] of VBR tokens replaced by a refresh
+
+    @property
+    def key(self):
+        return f"{self.kind}|{self.url}|{self.user}"
+
+    def to_value(self):
+        return dict(vars(self))
+
+
+def login(kind, url, user, password, timeout=http_pool.DEFAULT_TIMEOUT):
+    # One login; returns a Session or raises. A login is not idempotent (a repeated
+    # one opens a second session): only throttled or refused attempts are retried
+    now = time.time()
+    if kind == VCD:
+        response = http_pool.request("POST", f"https://{url}/cloudapi/1.0.0/sessions/provider",
+                                     headers={"Accept": VCD_ACCEPT, "Authorization": _basic(f"{user}@system", password)}, timeout=timeout)
+        body = response.read().decode()
+        token = response.getheader("X-VMWARE-VCLOUD-ACCESS-TOKEN")
+        if response.status != 200 or not token:
+            raise Exception(f"vCloud Director login failed: {response.status} - {body}")
+        return Session(kind, url, user, token, expires_at=now + DEFAULT_SESSION_TTL[VCD], last_used=now)
+    if kind == VEM:
+        response = http_pool.request("POST", f"{url}/sessionMngr/?v=latest",
+                                     headers={"Accept": "application/json", "Authorization": _basic(user, password)}, timeout=timeout)
+        body = response.read().decode()
+        token = response.getheader("X-RestSvcSessionId")
+        if response.status != 201 or not token:
+            raise Exception(f"Veeam Enterprise Manager login failed: {response.status} - {body}")
+        session_id = json.loads(body).get("SessionId") if body else None
+        return Session(kind, url, user, token, session_id=session_id, expires_at=now + DEFAULT_SESSION_TTL[VEM], last_used=now)
+    return _vbr_token(url, user, {"grant_type": "password", "username": user, "password": password}, timeout)
+
+
+def _vbr_token(url, user, form, timeout=http_pool.DEFAULT_TIMEOUT):
+    now = time.time()
+    response = http_pool.request("POST", f"{url}/api/oauth2/token",
+                                 headers={"Content-Type": "application/x-www-form-urlencoded", "x-api-version": VBR_API_VERSION},
+                                 body=urllib.parse.urlencode(form), timeout=timeout)
+    body = response.read().decode()
+    if response.status != 200:
+        raise Exception(f"Veeam Backup & Replication login failed: {response.status} - {body}")
+    data = json.loads(body)
+    expires_in = data.get("expires_in") or DEFAULT_SESSION_TTL[VBR]
+    return Session(VBR, url, user, data.get("access_token"), refresh_token=data.get("refresh_token"),
+                   expires_at=now + float(expires_in), last_used=now)
+
+
+def keep_alive(session, timeout=http_pool.DEFAULT_TIMEOUT):
+    # Extends a session without changing its token, so handlers already holding
+    # it keep working. Returns False when the session is no longer valid.
+    now = time.time()
+    if session.kind == VBR:
+        if not session.refresh_token:
+            return False
+        # A refreshed VBR token is a new token; the previous one stays valid until it
+        # expires and is kept with the session, as handlers may still hold it
+        refreshed = _vbr_token(session.url, session.user, {"grant_type": "refresh_token", "refresh_token": session.refresh_token}, timeout)
+        session.previous_tokens = [entry for entry in session.previous_tokens if entry[1] > now] + [[session.token, session.expires_at]]
+        session.token, session.refresh_token, session.expires_at = refreshed.token, refreshed.refresh_token, refreshed.expires_at
+        return True
+    if session.kind == VCD:
+        response = http_pool.request("GET", f"https://{session.url}/cloudapi/1.0.0/sessions/current",
+                                     headers={"Accept": "application/json;version=39.0", "Authorization": f"Bearer {session.token}"}, timeout=timeout)
+    else:
+        response = http_pool.request("GET", f"{session.url}/logonSessions/{session.session_id}",
+                                     headers={"Accept": "application/json", "X-RestSvcSessionId": session.token}, timeout=timeout)
+    response.read()
+    if response.status != 200:
+        return False
+    session.expires_at = now + DEFAULT_SESSION_TTL[session.kind]
+    return True
+
+
+def logout(session, timeout=http_pool.DEFAULT_TIMEOUT):
+    if session.kind == VCD:
+        response = http_pool.request("DELETE", f"https://{session.url}/cloudapi/1.0.0/sessions/current",
+                                     headers={"Accept": "application/json;version=39.0", "Authorization": f"Bearer {session.token}"}, timeout=timeout)
+    elif session.kind == VEM:
+        response = http_pool.request("DELETE", f"{session.url}/logonSessions/{session.session_id}",
+                                     headers={"Accept": "application/json", "X-RestSvcSessionId": session.token}, timeout=timeout)
+    else:
+        response = http_pool.request("POST", f"{session.url}/api/oauth2/logout",
+                                     headers={"x-api-version": VBR_API_VERSION, "Authorization": f"Bearer {session.token}"}, timeout=timeout)
+    response.read()
+    return response.status in (200, 204)
+
+
+class SessionManager:
+    # Keeps one session per (system, url, user) for the whole process and,
+    # with VRO_SESSION_CACHE, for the next workflows too. Missing sessions are
+    # opened concurrently; a background thread extends the ones close to
+    # expiry and logs out the ones no request used in idle_timeout seconds.
+    # Every request made through http_pool with a session's token counts as a use.
+    def __init__(self, refresh_margin=DEFAULT_REFRESH_MARGIN, idle_timeout=DEFAULT_IDLE_TIMEOUT, cache_path=None):
+        self.refresh_margin = refresh_margin
+        self.idle_timeout = idle_timeout
+        self.cache_path = cache_path or _cache_path()
+        self._sessions = {}
+        self._lock = threading.RLock()
+        self._refresher = None
+        self._stop = threading.Event()
+        self._touch_saved = 0.0
+        self.stats = {"logins": 0, "reused": 0, "refreshes": 0, "logouts": 0}
+
+    # Shared cache file
+
+    def _load(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for value in entries:
+            session = Session(**value)
+            current = self._sessions.get(session.key)
+            if current is None or current.last_used < session.last_used:
+                self._sessions[session.key] = session
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".sessions_")
+        try:
+            # Tokens are credentials: readable by the vRO runtime user only
+            os.chmod(tmp_path, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump([session.to_value() for session in self._sessions.values()], f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    # Sessions
+
+    def _usable(self, session, now):
+        return session is not None and session.token and session.expires_at - now > self.refresh_margin
+
+    def _ensure(self, kind, url, user, password):
+        key = Session(kind, url, user).key
+        with self._lock:
+            session = self._sessions.get(key)
+        now = time.time()
+        if self._usable(session, now):
+            self.stats["reused"] += 1
+        else:
+            refreshed = False
+            if session is not None and session.expires_at > now:
+                try:
+                    refreshed = keep_alive(session)
+                except Exception:
+                    refreshed = False
+            if refreshed:
+                self.stats["refreshes"] += 1
+            else:
+                session = login(kind, url, user, password)
+                self.stats["logins"] += 1
+        session.last_used = now
+        with self._lock:
+            self._sessions[key] = session
+        return session
+
+    def tokens(self, credentials):
+        # credentials: {kind: {"url", "user", "password"}} -> {input name: token}
+        with self._lock:
+            self._load()
+        with ThreadPoolExecutor(max_workers=max(1, len(credentials))) as executor:
+            futures = {
+                kind: executor.submit(self._ensure, kind, entry["url"], entry["user"], entry["password"])
+                for kind, entry in credentials.items()
+            }
+            sessions = {kind: future.result() for kind, future in futures.items()}
+        with self._lock:
+            self._save()
+        self.start_refresher()
+        return {TOKEN_INPUTS[kind]: session.token for kind, session in sessions.items()}
+
+    def _find(self, token):
+        now = time.time()
+        for session in self._sessions.values():
+            if session.token == token or any(entry[0] == token and entry[1] > now for entry in session.previous_tokens):
+                return session
+        return None
+
+    def touch(self, token):
+        # Marks the session of `token` as used now. With the cache file the use is
+        # written at most every REFRESH_CHECK_INTERVAL, for the refresher of
+        # another process.
+        now = time.time()
+        with self._lock:
+            session = self._find(token)
+            if session is None:
+                return
+            session.last_used = now
+            if self.cache_path and now - self._touch_saved > REFRESH_CHECK_INTERVAL:
+                self._touch_saved = now
+                self._load()
+                self._save()
+
+    def touch_headers(self, headers):
+        # http_pool request listener: finds the token among the request headers
+        if not self._sessions:
+            return
+        for name, value in headers.items():
+            if value and name.lower() in TOKEN_HEADERS:
+                self.touch(value.split(" ", 1)[1] if value.startswith("Bearer ") else value)
+
+    def is_managed(self, token):
+        # True when the logout actions must leave the session of `token` open:
+        # it is shared with the next workflows through the cache file and logged
+        # out by the manager once idle. Without the cache file the workflow closes
+        # its sessions itself, so the session is forgotten here and not handed out again.
+        with self._lock:
+            self._load()
+            session = self._find(token)
+            if session is None:
+                return False
+            if self.cache_path:
+                session.last_used = time.time()
+                self._save()
+                return True
+            self._sessions.pop(session.key, None)
+            return False
+
+    def maintain(self):
+        # One refresher pass: extend sessions still in use, log out idle ones
+        now = time.time()
+        with self._lock:
+            self._load()
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            try:
+                if session.expires_at <= now or now - session.last_used > self.idle_timeout:
+                    if session.expires_at > now:
+                        logout(session)
+                        self.stats["logouts"] += 1
+                    with self._lock:
+                        self._sessions.pop(session.key, None)
+                elif session.expires_at - now <= self.refresh_margin + REFRESH_CHECK_INTERVAL:
+                    if keep_alive(session):
+                        self.stats["refreshes"] += 1
+                    else:
+                        with self._lock:
+                            self._sessions.pop(session.key, None)
+            except Exception as e:
+                print(f"Session maintenance failed for {session.key}: {str(e)}")
+        with self._lock:
+            self._save()
+
+    def _run_refresher(self):
+        while not self._stop.wait(REFRESH_CHECK_INTERVAL):
+            self.maintain()
+            with self._lock:
+                if not self._sessions:
+                    self._refresher = None
+                    return
+
+    def start_refresher(self):
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._run_refresher, name="vro-session-refresher", daemon=True)
+                self._refresher.start()
+
+    def close(self):
+        # At the end of the run: every session still held is logged out (the
+        # refresher that would have closed it once idle stops with the process)
+        # and dropped from the cache file
+        self._stop.set()
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+            if self.cache_path:
+                self._load()
+                for session in sessions:
+                    self._sessions.pop(session.key, None)
+                self._save()
+                self._sessions.clear()
+        for session in sessions:
+            try:
+                if session.expires_at > time.time() and logout(session):
+                    self.stats["logouts"] += 1
+            except Exception as e:
+                print(f"Logout failed for {session.key}: {str(e)}")
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = SessionManager()
+            http_pool.on_request(_manager.touch_headers)
+            atexit.register(_manager.close)
+        return _manager
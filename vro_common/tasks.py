@@ -0,0 +1,152 @@
+import heapq
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait as wait_futures
+
+from vro_common import http_pool
+
+DEFAULT_INITIAL_INTERVAL = 2.0  # seconds before the first poll of a task
+DEFAULT_MAX_INTERVAL = 30.0
+DEFAULT_BACKOFF = 1.5  # interval multiplier after each poll that finds the task still running
+DEFAULT_REQUEST_BUDGET = 1000  # GET /tasks/{id} allowed for the whole tracker
+DEFAULT_POLL_WORKERS = 4
+DEFAULT_TRACK_TIMEOUT = 3600
+
+FINISHED = "Finished"
+TIMEOUT = "Timeout"
+UNKNOWN = "Unknown"
+SESSION_STOPPED = "Stopped"
+SESSION_SUCCESS_RESULTS = ("Success", "Warning")
+
+
+def _is_true(value):
+    return value is True or str(value).lower() == "true"
+
+
+def restore_session_href(task):
+    # Link of a finished ?action=restore task to the RestoreSession doing the restore
+    links = task.get("Links") or []
+    if isinstance(links, dict):
+        links = links.get("Links") or []
+    return next((link.get("Href") for link in links if str(link.get("Type", "")).startswith("RestoreSession") or "/restoreSessions/" in str(link.get("Href", ""))), None)
+
+
+class TaskTracker:
+    # Polls many VEM /api/tasks/{id} from one scheduler: each task has its own
+    # next-poll time, starting fast and backing off while it keeps running, at
+    # most `max_workers` polls are in flight and `request_budget` caps the total
+    # number of polls. `on_complete(state)` is called once per task when it
+    # finishes, times out or can no longer be polled. With `follow_session`, a
+    # task that finished by starting a restore is only complete once the
+    # RestoreSession it links to has stopped.
+    def __init__(self, vem_origin, headers, initial_interval=DEFAULT_INITIAL_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL,
+                 backoff=DEFAULT_BACKOFF, request_budget=DEFAULT_REQUEST_BUDGET, max_workers=DEFAULT_POLL_WORKERS,
+                 timeout=DEFAULT_TRACK_TIMEOUT):
+        self.vem_origin = vem_origin
+        self.headers = headers
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.request_budget = request_budget
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.states = {}
+        self._callbacks = {}
+        self._follow = set()
+        self._sessions = {}
+        self._intervals = {}
+        self._schedule = []
+        self.stats = {"polls": 0, "errors": 0}
+
+    def add(self, task_id, context=None, on_complete=None, follow_session=False):
+        self.states[task_id] = {"task_id": task_id, "context": context, "state": "Running", "success": None, "message": None, "polls": 0, "session": None}
+        self._callbacks[task_id] = on_complete
+        if follow_session:
+            self._follow.add(task_id)
+        self._intervals[task_id] = self.initial_interval
+        heapq.heappush(self._schedule, (time.monotonic() + self.initial_interval, task_id))
+
+    def _finish(self, task_id, state, success, message):
+        task_state = self.states[task_id]
+        task_state.update(state=state, success=success, message=message)
+        callback = self._callbacks.pop(task_id, None)
+        if callback:
+            callback(task_state)
+
+    def _poll(self, task_id):
+        try:
+            url = self._sessions.get(task_id) or f"{self.vem_origin}/api/tasks/{task_id}"
+            response = http_pool.request("GET", url, headers=self.headers)
+            body = response.read().decode()
+            if response.status != 200:
+                return task_id, None, f"{response.status} - {body}"
+            return task_id, json.loads(body), None
+        except Exception as e:
+            return task_id, None, str(e)
+
+    def _handle(self, task_id, task, error):
+        self.states[task_id]["polls"] += 1
+        if error:
+            # Transient errors only push the next poll back
+            self.stats["errors"] += 1
+            self.states[task_id]["message"] = error
+        elif task_id in self._sessions:
+            if task.get("State") == SESSION_STOPPED:
+                result = task.get("Result")
+                self._finish(task_id, FINISHED, result in SESSION_SUCCESS_RESULTS, f"Restore session ended with result {result}")
+                return
+        elif task.get("State") == FINISHED:
+            result = task.get("Result") or {}
+            session_href = restore_session_href(task) if task_id in self._follow and _is_true(result.get("Success")) else None
+            if not session_href:
+                self._finish(task_id, FINISHED, _is_true(result.get("Success")), result.get("Message"))
+                return
+            # The task only accepted the restore: poll its session from now on
+            self._sessions[task_id] = session_href
+            self.states[task_id]["session"] = session_href
+            self._intervals[task_id] = self.initial_interval
+            heapq.heappush(self._schedule, (time.monotonic() + self.initial_interval, task_id))
+            return
+        interval = min(self.max_interval, self._intervals[task_id] * self.backoff)
+        self._intervals[task_id] = interval
+        heapq.heappush(self._schedule, (time.monotonic() + interval, task_id))
+
+    def wait(self):
+        # Blocks until every task is settled and returns {task_id: state}
+        deadline = time.monotonic() + self.timeout
+        executor = ThreadPoolExecutor(max_workers=max(1, int(self.max_workers)))
+        in_flight = set()
+        try:
+            while self._schedule or in_flight:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                while self._schedule and self._schedule[0][0] <= now and len(in_flight) < self.max_workers:
+                    if self.stats["polls"] >= self.request_budget:
+                        break
+                    _, task_id = heapq.heappop(self._schedule)
+                    self.stats["polls"] += 1
+                    in_flight.add(executor.submit(self._poll, task_id))
+                if self.stats["polls"] >= self.request_budget and not in_flight:
+                    break
+                sleep_for = deadline - now
+                if self._schedule and len(in_flight) < self.max_workers and self.stats["polls"] < self.request_budget:
+                    sleep_for = min(sleep_for, max(0.0, self._schedule[0][0] - now))
+                if in_flight:
+                    done, in_flight = wait_futures(in_flight, timeout=sleep_for, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._handle(*future.result())
+                elif sleep_for > 0:
+                    time.sleep(sleep_for)
+        finally:
+            executor.shutdown(wait=True)
+        # Polls still in flight at the deadline are accounted before settling the rest
+        for future in in_flight:
+            self._handle(*future.result())
+        for task_id in list(self._callbacks):
+            if self.stats["polls"] >= self.request_budget:
+                self._finish(task_id, UNKNOWN, None, "Polling budget exhausted before the task finished")
+            else:
+                self._finish(task_id, TIMEOUT, None, f"Task still running after {self.timeout} seconds")
+        self._schedule = []
+        return self.states
@@ -0,0 +1,135 @@
+import hashlib
+import http.client
+import os
+import socket
+import ssl
+import threading
+
+# Verification stays off unless a CA bundle is given or VRO_TLS_VERIFY=1, as
+# the vCD / VEM / VBR servers of the platform use self-signed certificates.
+# A pinned endpoint is trusted on its certificate fingerprint alone.
+_settings = {
+    "ca_bundle": os.environ.get("VRO_TLS_CA_BUNDLE") or None,
+    "verify": os.environ.get("VRO_TLS_VERIFY", "").lower() in ("1", "true", "yes"),
+}
+_endpoints = {}  # (host, port) -> {"ca_bundle", "verify", "pin"}
+_contexts = {}  # (verify, ca_bundle) -> SSLContext
+_sessions = {}  # (context id, host, port) -> last TLS session seen
+_lock = threading.Lock()
+stats = {"contexts": 0, "handshakes": 0, "resumed": 0}
+
+
+def _parse_pins(value):
+    # "host:port=sha256,host=sha256" -> {(host, port): fingerprint}
+    pins = {}
+    for entry in (value or "").split(","):
+        if "=" not in entry:
+            continue
+        endpoint, fingerprint = entry.strip().split("=", 1)
+        host, _, port = endpoint.partition(":")
+        pins[(host.lower(), int(port) if port else 443)] = fingerprint.replace(":", "").strip().lower()
+    return pins
+
+
+_endpoints.update({endpoint: {"pin": pin} for endpoint, pin in _parse_pins(os.environ.get("VRO_TLS_PINS")).items()})
+
+
+def configure(ca_bundle=None, verify=None):
+    # Default profile of every endpoint without its own settings
+    with _lock:
+        if ca_bundle is not None:
+            _settings["ca_bundle"] = ca_bundle or None
+        if verify is not None:
+            _settings["verify"] = bool(verify)
+
+
+def configure_endpoint(host, port=443, ca_bundle=None, verify=None, pin=None):
+    with _lock:
+        entry = _endpoints.setdefault((host.lower(), int(port)), {})
+        if ca_bundle is not None:
+            entry["ca_bundle"] = ca_bundle
+        if verify is not None:
+            entry["verify"] = bool(verify)
+        if pin is not None:
+            entry["pin"] = pin.replace(":", "").lower()
+
+
+def profile(host, port):
+    # (verify, ca_bundle, pin) used for one endpoint
+    with _lock:
+        entry = _endpoints.get((host.lower(), int(port)), {})
+        ca_bundle = entry.get("ca_bundle", _settings["ca_bundle"])
+        verify = entry.get("verify", _settings["verify"] or bool(ca_bundle))
+        return verify, ca_bundle, entry.get("pin")
+
+
+def get_context(host, port):
+    # One SSLContext per profile for the whole process instead of one per connection
+    verify, ca_bundle, _ = profile(host, port)
+    key = (verify, ca_bundle)
+    with _lock:
+        context = _contexts.get(key)
+        if context is None:
+            if verify:
+                context = ssl.create_default_context(cafile=ca_bundle)
+                context.minimum_version = ssl.TLSVersion.TLSv1_2
+            else:
+                context = ssl._create_unverified_context()
+            _contexts[key] = context
+            stats["contexts"] += 1
+        return context
+
+
+def fingerprint(sock):
+    return hashlib.sha256(sock.getpeercert(binary_form=True)).hexdigest()
+
+
+class ResumingHTTPSConnection(http.client.HTTPSConnection):
+    # HTTPSConnection that offers the last TLS session of its endpoint, so a new
+    # socket resumes it (abbreviated handshake) instead of negotiating a new one,
+    # and that checks the certificate pin of the endpoint when there is one.
+    def __init__(self, host, port=None, timeout=socket._GLOBAL_DEFAULT_TIMEOUT):
+        port = port or 443
+        super().__init__(host, port, timeout=timeout, context=get_context(host, port))
+        self._pin = profile(host, port)[2]
+        self._session_key = (id(self._context), host.lower(), int(port))
+        self._tls_sock = None
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host or self.host
+        with _lock:
+            session = _sessions.get(self._session_key)
+        try:
+            self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname, session=session)
+        except ssl.SSLError:
+            if session is None:
+                raise
+            # A session the server no longer accepts: forget it and negotiate a new one
+            with _lock:
+                _sessions.pop(self._session_key, None)
+            http.client.HTTPConnection.connect(self)
+            self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname)
+        stats["handshakes"] += 1
+        if self.sock.session_reused:
+            stats["resumed"] += 1
+        if self._pin and fingerprint(self.sock) != self._pin:
+            self.close()
+            raise ssl.SSLCertVerificationError(f"Certificate of {server_hostname}:{self.port} does not match its pin")
+        self._tls_sock = self.sock
+
+    def getresponse(self):
+        response = super().getresponse()
+        # TLS 1.3 tickets arrive after the handshake: keep the session once the server has answered
+        sock = self._tls_sock
+        session = sock.session if sock is not None else None
+        if session is not None:
+            with _lock:
+                _sessions[self._session_key] = session
+        return response
+
+
+def clear():
+    with _lock:
+        _contexts.clear()
+        _sessions.clear()
@@ -0,0 +1,134 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from vro_common import http_pool
+
+API_VERSION = "1.1-rev2"
+CLOUD_DIRECTOR_HOST = "portal-dr.focus-multicloud.com"
+DEFAULT_UPDATE_ATTEMPTS = 3
+DEFAULT_LOOKUP_WORKERS = 8
+# Another writer changed the job between our read and our write
+CONFLICT_STATUSES = (409, 412)
+
+
+def headers(token, content_type=False):
+    result = {"x-api-version": API_VERSION, "Authorization": f"Bearer {token}"}
+    if content_type:
+        result["Content-Type"] = "application/json"
+    return result
+
+
+def job_id_from_uid(job_uid):
+    # VEM "urn:veeam:Job:<id>" -> VBR "<id>"
+    return job_uid.split(":")[-1]
+
+
+def vm_include(vm):
+    return {
+        "type": "VirtualMachine",
+        "platform": "CloudDirector",
+        "hostName": CLOUD_DIRECTOR_HOST,
+        "name": vm["name"],
+        "objectId": vm["id"]
+    }
+
+
+def _include_key(include):
+    return (include.get("objectId") or "").lower()
+
+
+def get_job(vbr_url, token, job_id):
+    # Read for a read-modify-write: never served from the run cache, as VBR
+    # gives no ETag to detect a copy changed by another writer
+    response = http_pool.request("GET", f"{vbr_url}/api/v1/jobs/{job_id}", headers=headers(token), cached=False)
+    body = response.read().decode()
+    if response.status != 200:
+        raise Exception(f"Failed to read job {job_id}: {response.status} - {body}")
+    return json.loads(body), response.getheader("ETag")
+
+
+def update_job_includes(vbr_url, token, job_id, add_vms=(), remove_vm_ids=(), max_attempts=DEFAULT_UPDATE_ATTEMPTS):
+    # Reads the job once, merges the include set and writes the whole job back in a
+    # single PUT. VBR has no revision field on jobs: the ETag is sent as If-Match
+    # when the server gives one, and only then is a concurrent update detected
+    # (409/412) and the merge redone. Without it, a change made by another writer
+    # between the read and the PUT is overwritten: the includes echoed by the PUT
+    # only confirm that ours were saved.
+    # Returns (added VM ids, removed VM ids); raises when the job cannot be updated.
+    add_vms = list(add_vms)
+    remove_keys = {vm_id.lower() for vm_id in remove_vm_ids}
+    for _ in range(max_attempts):
+        job, etag = get_job(vbr_url, token, job_id)
+        includes = job.setdefault("virtualMachines", {}).get("includes") or []
+        present = {_include_key(include) for include in includes}
+        added = []
+        for vm in add_vms:
+            if vm["id"].lower() not in present:
+                present.add(vm["id"].lower())
+                added.append(vm)
+        removed = [include.get("objectId") for include in includes if _include_key(include) in remove_keys]
+        if not added and not removed:
+            return [], []
+        new_includes = [include for include in includes if _include_key(include) not in remove_keys]
+        new_includes.extend(vm_include(vm) for vm in added)
+        job["virtualMachines"]["includes"] = new_includes
+
+        put_headers = headers(token, content_type=True)
+        if etag:
+            put_headers["If-Match"] = etag
+        response = http_pool.request("PUT", f"{vbr_url}/api/v1/jobs/{job_id}", headers=put_headers, body=json.dumps(job))
+        body = response.read().decode()
+        if response.status in CONFLICT_STATUSES:
+            continue
+        if response.status not in (200, 201):
+            raise Exception(f"Failed to update job {job_id}: {response.status} - {body}")
+        saved = json.loads(body).get("virtualMachines", {}).get("includes") if body else None
+        if saved is not None:
+            saved_keys = {_include_key(include) for include in saved}
+            if any(vm["id"].lower() not in saved_keys for vm in added) or saved_keys & remove_keys:
+                continue
+        return [vm["id"] for vm in added], removed
+    raise Exception(f"Job {job_id} kept changing while updating its includes ({max_attempts} attempts)")
+
+
+def get_json(vbr_url, token, path, timeout=http_pool.DEFAULT_TIMEOUT):
+    response = http_pool.request("GET", f"{vbr_url}{path}", headers=headers(token), timeout=timeout)
+    body = response.read().decode()
+    if response.status != 200:
+        raise Exception(f"Failed to fetch {path}: {response.status} - {body}")
+    return json.loads(body)
+
+
+def mount_server_by_restore_point(vbr_url, token, restore_point_ids, max_workers=DEFAULT_LOOKUP_WORKERS):
+    # Restore point id -> the mount server (vPower NFS host) of its repository,
+    # falling back to the repository id when the repository has none. Points
+    # that cannot be resolved are left out.
+    repositories = {}
+    for repository in get_json(vbr_url, token, "/api/v1/backupInfrastructure/repositories").get("data") or []:
+        mount_server = (repository.get("mountServer") or {}).get("mountServerId")
+        repositories[repository.get("id")] = mount_server or repository.get("id")
+    backups = {backup.get("id"): backup.get("repositoryId") for backup in get_json(vbr_url, token, "/api/v1/backups").get("data") or []}
+
+    def backup_of(restore_point_id):
+        try:
+            return restore_point_id, get_json(vbr_url, token, f"/api/v1/restorePoints/{restore_point_id}").get("backupId")
+        except Exception:
+            return restore_point_id, None
+
+    restore_point_ids = list(dict.fromkeys(restore_point_ids))
+    if not restore_point_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(restore_point_ids)))) as executor:
+        points = list(executor.map(backup_of, restore_point_ids))
+    result = {}
+    for restore_point_id, backup_id in points:
+        group = repositories.get(backups.get(backup_id))
+        if group:
+            result[restore_point_id] = group
+    return result
+
+
+def instant_recovery_mounts(vbr_url, token):
+    # Session id -> vSphere instant recovery mount, all mounts in one call
+    mounts = get_json(vbr_url, token, "/api/v1/restore/instantRecovery/vSphere/vm").get("data") or []
+    return {mount.get("sessionId"): mount for mount in mounts}
@@ -0,0 +1,180 @@
+import json
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from vro_common import http_pool
+
+VCD_MAX_PAGE_SIZE = 128  # cloudapi rejects anything bigger
+MIN_PAGE_SIZE = 16
+DEFAULT_PREFETCH_WORKERS = 4
+DEFAULT_PREFETCH_PAGES = 8  # pages fetched ahead of the consumer, bounds peak memory
+TARGET_PAGE_LATENCY = 2.0  # seconds
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+QUERY_ACCEPT = "application/*+json;version=39.0"  # legacy /api/query service
+DEFAULT_QUERY_VDC_BATCH = 20  # VDCs OR-ed in one filter, keeps the URL short
+FIQL_RESERVED = "%,;()"  # characters of a filter value percent-encoded so they are not read as syntax
+
+# Page size learnt per collection path, reused by the next walk of the same collection
+_page_sizes = {}
+
+
+def page_url(base_url, page, page_size):
+    separator = "&" if "?" in base_url else "?"
+    return f"{base_url}{separator}page={page}&pageSize={page_size}"
+
+
+def _collection_key(base_url):
+    parsed = urllib.parse.urlparse(base_url)
+    query_type = urllib.parse.parse_qs(parsed.query).get("type")
+    return f"{parsed.path}?type={query_type[0]}" if query_type else parsed.path
+
+
+def _tune_page_size(key, page_size, latency, nbytes):
+    # Shrink pages that are slow or heavy, grow pages that come back fast
+    if latency > TARGET_PAGE_LATENCY or nbytes > MAX_PAGE_BYTES:
+        page_size = max(MIN_PAGE_SIZE, page_size // 2)
+    elif latency < TARGET_PAGE_LATENCY / 4 and nbytes < MAX_PAGE_BYTES / 4:
+        page_size = min(VCD_MAX_PAGE_SIZE, page_size * 2)
+    _page_sizes[key] = page_size
+
+
+def fetch_page(base_url, headers, page, page_size):
+    started = time.monotonic()
+    response = http_pool.request("GET", page_url(base_url, page, page_size), headers=headers)
+    if response.status != 200:
+        raise Exception(f"Failed to fetch data: {response.status} {response.reason}")
+    body = response.read()
+    return json.loads(body.decode()), time.monotonic() - started, len(body)
+
+
+def iter_pages(base_url, headers, log=None, page_size=None, max_workers=DEFAULT_PREFETCH_WORKERS, prefetch=DEFAULT_PREFETCH_PAGES):
+    # Yields the items of each page, in page order, as soon as that page has arrived.
+    # Page 1 gives resultTotal/pageCount; at most `prefetch` further pages are
+    # requested ahead of the consumer. `log(status, details)` receives the same
+    # progress messages as the old sequential loop.
+    key = _collection_key(base_url)
+    tuned = page_size is None
+    page_size = int(page_size or _page_sizes.get(key, VCD_MAX_PAGE_SIZE))
+
+    def fetch(page):
+        try:
+            return fetch_page(base_url, headers, page, page_size)
+        except Exception as e:
+            if log:
+                log("failure", f"Error fetching page {page}: {str(e)}")
+            raise
+
+    data, latency, nbytes = fetch(1)
+    # cloudapi pages carry "values"/"resultTotal", legacy query pages "record"/"total"
+    items_key = "record" if "record" in data else "values"
+    items = data.get(items_key) or []
+    total_items = data.get("resultTotal", data.get("total", len(items)))
+    page_count = data.get("pageCount") or -(-total_items // page_size)
+    total_so_far = len(items)
+    if log:
+        log("success", f"Fetched {len(items)} items on page 1, total so far: {total_so_far}")
+    yield items
+
+    if items and page_count > 1:
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, page_count - 1)))
+        pending = deque()
+        next_page = 2
+        try:
+            while next_page <= page_count and len(pending) < max(1, prefetch):
+                pending.append(executor.submit(fetch, next_page))
+                next_page += 1
+            page = 2
+            while pending:
+                page_data, page_latency, page_bytes = pending.popleft().result()
+                if next_page <= page_count:
+                    pending.append(executor.submit(fetch, next_page))
+                    next_page += 1
+                latency = max(latency, page_latency)
+                nbytes = max(nbytes, page_bytes)
+                page_items = page_data.get(items_key) or []
+                total_so_far += len(page_items)
+                if log:
+                    log("success", f"Fetched {len(page_items)} items on page {page}, total so far: {total_so_far}")
+                yield page_items
+                page += 1
+        finally:
+            # Consumer stopped early or a page failed: drop what was not started yet
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+    if tuned:
+        _tune_page_size(key, page_size, latency, nbytes)
+
+
+def iter_items(base_url, headers, log=None, page_size=None, max_workers=DEFAULT_PREFETCH_WORKERS, prefetch=DEFAULT_PREFETCH_PAGES):
+    for page_items in iter_pages(base_url, headers, log, page_size, max_workers, prefetch):
+        for item in page_items:
+            yield item
+
+
+def fetch_all_pages(base_url, headers, log=None, page_size=None, max_workers=DEFAULT_PREFETCH_WORKERS):
+    return list(iter_items(base_url, headers, log, page_size, max_workers))
+
+
+def query_url(vcd_host, query_type, query_filter=None):
+    params = {"type": query_type, "format": "records"}
+    if query_filter:
+        params["filter"] = query_filter
+    return f"https://{vcd_host}/api/query?{urllib.parse.urlencode(params, quote_via=urllib.parse.quote)}"
+
+
+def vdc_id_from_href(href):
+    # "https://<host>/api/admin/vdc/<uuid>" or ".../api/vdc/<uuid>" -> "<uuid>":
+    # adminOrgVdc and adminVM records do not give the same href form
+    return (href or "").rstrip("/").rsplit("/", 1)[-1].lower() or None
+
+
+def vm_id_from_href(href):
+    # "https://<host>/api/vApp/vm-<uuid>" -> "urn:vcloud:vm:<uuid>"
+    return "urn:vcloud:vm:" + href.rstrip("/").rsplit("/vm-", 1)[-1]
+
+
+def _fiql_value(value):
+    # vCD decodes a filter value once the expression is parsed
+    return "".join(f"%{ord(char):02X}" if char in FIQL_RESERVED else char for char in str(value))
+
+
+def _or_filter(field, values):
+    return "(" + ",".join(f"{field}=={_fiql_value(value)}" for value in values) + ")"
+
+
+def resolve_vdcs(vcd_host, headers, vdc_names, log=None, page_size=None):
+    # VDC name (as given) -> href, looked up with one adminOrgVdc query per batch of names
+    query_headers = dict(headers, Accept=QUERY_ACCEPT)
+    vdc_names = list(vdc_names)
+    requested = {name.lower(): name for name in vdc_names}
+    vdc_hrefs = {}
+    for start in range(0, len(vdc_names), DEFAULT_QUERY_VDC_BATCH):
+        url = query_url(vcd_host, "adminOrgVdc", _or_filter("name", vdc_names[start:start + DEFAULT_QUERY_VDC_BATCH]))
+        for record in iter_items(url, query_headers, log, page_size):
+            name = requested.get(record["name"].lower())
+            if name:
+                vdc_hrefs.setdefault(name, record["href"])
+    return vdc_hrefs
+
+
+def iter_vm_records(vcd_host, headers, field, values, log=None, page_size=None, max_workers=DEFAULT_PREFETCH_WORKERS, prefetch=DEFAULT_PREFETCH_PAGES):
+    # adminVM records (templates excluded) whose `field` is one of `values`, one query per batch of values
+    query_headers = dict(headers, Accept=QUERY_ACCEPT)
+    values = list(values)
+    for start in range(0, len(values), DEFAULT_QUERY_VDC_BATCH):
+        query_filter = "isVAppTemplate==false;" + _or_filter(field, values[start:start + DEFAULT_QUERY_VDC_BATCH])
+        url = query_url(vcd_host, "adminVM", query_filter)
+        for record in iter_items(url, query_headers, log, page_size, max_workers, prefetch):
+            yield record
+
+
+def iter_vdc_vms(vcd_host, headers, vdc_hrefs, log=None, page_size=None, max_workers=DEFAULT_PREFETCH_WORKERS, prefetch=DEFAULT_PREFETCH_PAGES):
+    # Yields {"name", "id", "VDC", "vApp"} for every VM of the given VDCs (name -> href),
+    # using one adminVM query per batch of VDCs instead of one walk per VDC.
+    # "VDC" is None for a record whose VDC is not one of them.
+    vdc_by_id = {vdc_id_from_href(href): name for name, href in vdc_hrefs.items()}
+    for record in iter_vm_records(vcd_host, headers, "vdc", vdc_hrefs.values(), log, page_size, max_workers, prefetch):
+        yield {"name": record["name"], "id": vm_id_from_href(record["href"]), "VDC": vdc_by_id.get(vdc_id_from_href(record.get("vdc"))), "vApp": record.get("container")}
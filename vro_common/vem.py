@@ -0,0 +1,73 @@
+import json
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from vro_common import http_pool
+
+DEFAULT_INCLUDES_CONCURRENCY = 8
+DEFAULT_INCLUDES_TIMEOUT = 10
+
+
+def fetch_job_includes(vem_origin, headers, job_ids, max_workers=DEFAULT_INCLUDES_CONCURRENCY, timeout=DEFAULT_INCLUDES_TIMEOUT):
+    # Returns [(job_id, ObjectInJobs or None, error or None)] in the order of job_ids.
+    # ObjectInJobs is None when VEM answered with a non-200 status.
+    def fetch(job_id):
+        try:
+            response = http_pool.request("GET", f"{vem_origin}/api/jobs/{job_id}/includes", headers=headers, timeout=timeout)
+            if response.status != 200:
+                return job_id, None, None
+            return job_id, json.loads(response.read().decode()).get("ObjectInJobs"), None
+        except Exception as e:
+            return job_id, None, e
+
+    if not job_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(job_ids)))) as executor:
+        return list(executor.map(fetch, job_ids))
+
+
+DEFAULT_QUERY_PAGE_SIZE = 100
+DEFAULT_QUERY_CONCURRENCY = 4
+DEFAULT_QUERY_BATCH = 20  # values OR-ed in one filter, keeps the URL short
+QUERY_FILTER_RESERVED = '%,;()"'  # characters of a filter value percent-encoded so they are not read as syntax
+# Answers meaning the query service or the filter is not available on this VEM
+QUERY_UNSUPPORTED_STATUSES = (400, 404, 501)
+
+
+def _filter_value(value):
+    # Same encoding as vcd._fiql_value, plus the quote closing the value
+    return "".join(f"%{ord(char):02X}" if char in QUERY_FILTER_RESERVED else char for char in str(value))
+
+
+def or_filter(field, values):
+    return "(" + ",".join(f'{field}=="{_filter_value(value)}"' for value in values) + ")"
+
+
+def query_refs(vem_origin, headers, query_type, query_filter=None, page_size=DEFAULT_QUERY_PAGE_SIZE, timeout=http_pool.DEFAULT_TIMEOUT):
+    # Walks /api/query?type=...&format=Refs page by page and returns (refs, None),
+    # or (None, status) when VEM rejects the query so the caller can fall back
+    # to the full collection.
+    params = {"type": query_type, "format": "Refs", "pageSize": page_size}
+    if query_filter:
+        params["filter"] = query_filter
+    refs = []
+    page = 1
+    while True:
+        params["page"] = page
+        url = f"{vem_origin}/api/query?{urllib.parse.urlencode(params, quote_via=urllib.parse.quote)}"
+        response = http_pool.request("GET", url, headers=headers, timeout=timeout)
+        if response.status in QUERY_UNSUPPORTED_STATUSES:
+            response.read()
+            return None, response.status
+        if response.status != 200:
+            raise Exception(f"Failed to query {query_type}: {response.status} - {response.read().decode()}")
+        data = json.loads(response.read().decode())
+        page_refs = data.get("Refs") or []
+        if isinstance(page_refs, dict):
+            page_refs = page_refs.get("Refs") or []
+        refs.extend(page_refs)
+        pages_count = (data.get("PagingInfo") or {}).get("PagesCount") or 1
+        if page >= pages_count or not page_refs:
+            return refs, None
+        page += 1
+
@@ -0,0 +1,162 @@
+import re
+import time
+import urllib.parse
+from datetime import datetime, timezone
+
+from vro_common import vcd
+
+EVENT_PREFIX = "com/vmware/cloud/event/"
+# Events after which the VM (or every VM of the vApp) is looked up again
+VM_EVENTS = ("vm/create", "vm/delete", "vm/modify", "vm/relocate", "vm/import")
+VAPP_EVENTS = ("vapp/create", "vapp/delete", "vapp/modify", "vapp/move", "vapp/import")
+DEFAULT_MAX_EVENTS = 5000  # beyond this a full listing is cheaper than replaying
+DEFAULT_FULL_RESYNC_INTERVAL = 7 * 24 * 3600  # safety net against events the sync does not know about
+
+FULL = "full"
+INCREMENTAL = "incremental"
+MIXED = "mixed"
+
+
+def _parse_timestamp(value):
+    # "2024-05-01T10:00:00.123Z" / "...+00:00" -> aware datetime
+    value = value.replace("Z", "+00:00")
+    match = re.match(r"^(.*T\d{2}:\d{2}:\d{2})(?:\.(\d+))?(.*)$", value)
+    fraction = (match.group(2) or "0")[:6].ljust(6, "0")
+    return datetime.fromisoformat(f"{match.group(1)}.{fraction}{match.group(3) or '+00:00'}")
+
+
+def _format_timestamp(moment):
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+def _audit_url(vcd_host, query_filter=None, sort="sortAsc"):
+    params = {sort: "timestamp"}
+    if query_filter:
+        params["filter"] = query_filter
+    return f"https://{vcd_host}/cloudapi/1.0.0/auditTrail?{urllib.parse.urlencode(params, quote_via=urllib.parse.quote)}"
+
+
+def _edge_event_timestamp(vcd_host, headers, sort):
+    # Timestamp of the oldest (sortAsc) or newest (sortDesc) event kept by vCD
+    data, _, _ = vcd.fetch_page(_audit_url(vcd_host, sort=sort), headers, 1, 1)
+    events = data.get("values") or []
+    return events[0]["timestamp"] if events else None
+
+
+def _vapp_href(vdc_href, entity_id):
+    # "urn:vcloud:vapp:<uuid>" -> "<vCD public address>/api/vApp/vapp-<uuid>". The
+    # address is taken from a VDC href returned by vCD, not from the vCloud_ip
+    # input, so the href matches the `container` of the adminVM records.
+    return f"{vdc_href.split('/api/', 1)[0]}/api/vApp/vapp-{entity_id.rsplit(':', 1)[-1]}"
+
+
+class VmSync:
+    # Keeps the VM list of each VDC in the inventory store up to date from the
+    # vCD audit trail: only the VMs and vApps named by an event since the last
+    # high-water mark are looked up again. A VDC is listed in full the first
+    # time, when the audit trail no longer reaches back to its mark, when the
+    # window holds too many events or after full_resync_interval.
+    def __init__(self, vcd_host, headers, store, log=None, page_size=None, max_events=DEFAULT_MAX_EVENTS,
+                 full_resync_interval=DEFAULT_FULL_RESYNC_INTERVAL):
+        self.vcd_host = vcd_host
+        self.headers = headers
+        self.store = store
+        self.log = log
+        self.page_size = page_size
+        self.max_events = max_events
+        self.full_resync_interval = full_resync_interval
+        self.stats = {"mode": None, "events": 0, "vms_looked_up": 0, "vapps_looked_up": 0, "full_vdcs": 0}
+        self.unresolved = []
+
+    def _log(self, status, details):
+        if self.log:
+            self.log(status, details)
+
+    def _read_events(self, since):
+        types = ",".join(f"eventType=={EVENT_PREFIX}{event}" for event in VM_EVENTS + VAPP_EVENTS)
+        url = _audit_url(self.vcd_host, f"timestamp=ge={since};({types})")
+        events = []
+        for event in vcd.iter_items(url, self.headers, page_size=self.page_size):
+            events.append(event)
+            if len(events) > self.max_events:
+                return None
+        return events
+
+    def _full_listing(self, vdc_hrefs, mark):
+        listed = {vdc_name.lower(): [] for vdc_name in vdc_hrefs}
+        for vm in vcd.iter_vdc_vms(self.vcd_host, self.headers, vdc_hrefs, page_size=self.page_size):
+            if vm["VDC"]:
+                listed[vm["VDC"].lower()].append(vm)
+        state = {"mark": mark, "full_at": time.time()}
+        for vdc_name, vms in listed.items():
+            self.store.replace_vms(vdc_name, vms, state)
+        self.stats["full_vdcs"] += len(listed)
+
+    def _apply(self, events, vdc_by_href):
+        vm_ids = set()
+        vapp_ids = set()
+        for event in events:
+            entity_id = (event.get("eventEntity") or {}).get("id")
+            if not entity_id:
+                continue
+            if event.get("eventType", "").startswith(EVENT_PREFIX + "vapp/"):
+                vapp_ids.add(entity_id)
+            else:
+                vm_ids.add(entity_id)
+        # Every VM named by an event is dropped and put back from its current
+        # record, so replaying an event twice or in any order is harmless
+        self.store.remove_vms(vdc_by_href.values(), vm_ids, vapp_ids)
+        vapp_hrefs = {_vapp_href(next(iter(vdc_by_href)), vapp_id) for vapp_id in vapp_ids}
+        records = list(vcd.iter_vm_records(self.vcd_host, self.headers, "container", vapp_hrefs, page_size=self.page_size))
+        records += vcd.iter_vm_records(self.vcd_host, self.headers, "id", vm_ids, page_size=self.page_size)
+        vdc_by_id = {vcd.vdc_id_from_href(href): vdc_name for href, vdc_name in vdc_by_href.items()}
+        for record in records:
+            vdc_name = vdc_by_id.get(vcd.vdc_id_from_href(record.get("vdc")))
+            if vdc_name:
+                self.store.upsert_vm(vcd.vm_id_from_href(record["href"]), record["name"], vdc_name, record.get("container"))
+        self.stats["vms_looked_up"] += len(vm_ids)
+        self.stats["vapps_looked_up"] += len(vapp_hrefs)
+
+    def sync(self, vdc_names):
+        # Returns {lower-cased VDC name: [{"name", "id"}]} for the VDCs found in vCD.
+        # A VDC the query service does not find is left out (and in self.unresolved),
+        # never returned with an empty list: callers must list its VMs another way.
+        vdc_hrefs = vcd.resolve_vdcs(self.vcd_host, self.headers, vdc_names, page_size=self.page_size)
+        self.unresolved = [vdc_name for vdc_name in vdc_names if vdc_name not in vdc_hrefs]
+        if not vdc_hrefs:
+            return {}
+        states = {vdc_name: self.store.get_meta(f"vms:{vdc_name.lower()}") or {} for vdc_name in vdc_hrefs}
+        # The new mark is taken before anything is read: events logged during the
+        # sync are read again next time, which the replay tolerates
+        mark = _edge_event_timestamp(self.vcd_host, self.headers, "sortDesc") or _format_timestamp(datetime.now(timezone.utc))
+
+        now = time.time()
+        full = {
+            vdc_name: href for vdc_name, href in vdc_hrefs.items()
+            if not states[vdc_name].get("mark") or now - states[vdc_name].get("full_at", 0) > self.full_resync_interval
+        }
+        incremental = {vdc_name: href for vdc_name, href in vdc_hrefs.items() if vdc_name not in full}
+        if incremental:
+            since = min((states[vdc_name]["mark"] for vdc_name in incremental), key=_parse_timestamp)
+            oldest = _edge_event_timestamp(self.vcd_host, self.headers, "sortAsc")
+            events = None
+            if not oldest or _parse_timestamp(oldest) > _parse_timestamp(since):
+                self._log("warning", f"Audit trail starts at {oldest or 'nothing'}, after the last sync mark {since}: full resync")
+            else:
+                events = self._read_events(since)
+                if events is None:
+                    self._log("warning", f"More than {self.max_events} VM events since {since}: full resync")
+            if events is None:
+                full.update(incremental)
+                incremental = {}
+            else:
+                self.stats["events"] = len(events)
+                self._apply(events, {href: vdc_name for vdc_name, href in incremental.items()})
+                for vdc_name in incremental:
+                    self.store.set_meta(f"vms:{vdc_name.lower()}", dict(states[vdc_name], mark=mark))
+                self._log("success", f"Applied {len(events)} VM events since {since} to {len(incremental)} VDCs")
+        if full:
+            self._full_listing(full, mark)
+            self._log("success", f"Listed all the VMs of {len(full)} VDCs")
+        self.stats["mode"] = INCREMENTAL if not full else FULL if not incremental else MIXED
+        return {vdc_name.lower(): [{"name": vm["name"], "id": vm["id"]} for vm in self.store.vms(vdc_name)] for vdc_name in vdc_hrefs}